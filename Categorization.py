@@ -1,10 +1,20 @@
+import os
 import random
+import shutil
+import tempfile
+import multiprocessing
 import csv
-from sklearn.cluster import DBSCAN
 from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 import scipy as sp
 from DatabaseWiki import databaseWiki
+from CentroidMatrix import CentroidMatrix
+from CentroidIndex import CentroidIndex
+from CentroidSums import CentroidSums
+from CategorySums import CategorySums
+from TfidfMatrix import TfidfMatrix
+from NeighbourGraph import NeighbourGraph
+from SphericalKMeans import SphericalKMeans
 from ParseDumpWiki import ParseDumpWiki
 import pickle
 import math
@@ -59,16 +69,14 @@ class Categorization:
         \return dict = Dictionary containing the vectors representaion of the pages.
         """
         vectors = dict()
-        i = 0
-        N = len(self.db.invertedIndex)
+        vocabulary = self.db.vocabulary
         for w, (idf, docs) in self.db.invertedIndex.items():
+            i = vocabulary[w]
             for doc, tf in docs.items():
                 try:
                     vectors[doc][i] = tf * idf
                 except KeyError as k:
                     vectors[doc] = {i: tf * idf}
-            i += 1
-        i = 0;
         return vectors
 
     def cosin_sim_pairs(a, b):
@@ -98,91 +106,306 @@ class Categorization:
     def getAllCentroids(self, inferior_limit = 5, withPrint = True, saveFile = True, test = []):
         """
         \brief The function create all the centroids of the categories with at least inferior_limit number of pages.
+        \details The centroids are computed by #getCentroidMatrix, and their rows are normalised.
         \param inferior_limit :int (Default = 5): Minimum number of pages such that a page is computed.
         \param withPrint :bool (Default = True): True if the function has to print the initial line, false otherwise.
-        \param saveFile :bool (Default = True): True if the function has to save the pickle file containing the centroids, false otherwise. 
+        \param saveFile :bool (Default = True): True if the function has to save the centroids in "centroids.pickle" and "centroids.npz" (see #saveCentroids), false otherwise.
         \param test :list (Default = []): List representing the test set.
         \return dict = Dictionary containing centroids vector for each category.
         """
-        i = 0
+        return self.getCentroidMatrix(inferior_limit, withPrint, saveFile, test).toDict()
+
+    def saveCentroids(self, centroids, precision = "float32"):
+        """
+        \brief The function saves the centroids in "centroids.pickle" and in "centroids.npz", so the two files always contain the same centroids.
+        \param centroids :CentroidMatrix = centroids, rows normalised.
+        \param precision :str (Default = "float32"): Precision of the weights in "centroids.npz" (see CentroidMatrix.save).
+        """
+        centroids.save(self.PATH + "centroids.npz", precision)
+        self.writeFile(centroids.toDict(), "centroids.pickle")
+
+    def getCentroidMatrix(self, inferior_limit = 5, withPrint = True, saveFile = True, test = [], topN = None, mass = None, precision = "float32"):
+        """
+        \brief The function computes the centroids of the categories with at least inferior_limit number of pages as one sparse
+         product between the category-page incidence matrix and the TF-IDF matrix (see CentroidMatrix).
+        \param inferior_limit :int (Default = 5): Minimum number of pages such that a centroid is computed.
+        \param withPrint :bool (Default = True): True if the function has to print the initial line, false otherwise.
+        \param saveFile :bool (Default = True): True if the function has to save the centroids in "centroids.pickle" and "centroids.npz" (see #saveCentroids)
+         and the sums of the TF of the categories in "centroids.sums.npz" (see #updateCentroids), false otherwise.
+        \param test :list (Default = []): List representing the test set, whose pages are not used.
+        \param topN :int (Default = None): If not None every centroid keeps only its topN heaviest words (see CentroidMatrix.compress).
+        \param mass :float (Default = None): If not None every centroid keeps only the heaviest words which cover this share of its length.
+        \param precision :str (Default = "float32"): Precision of the weights in "centroids.npz": "float32", "float16" or "uint8".
+        \return CentroidMatrix = centroids, categories x words, rows normalised.
+        """
         if(withPrint):
             print("I'm creating the page-categories dictionary")
         pageCat = self.db.getAllCategoriesGivenAllPages(inferior_limit)
-        if(len(test) > 0):
-            for p in test:
-                pageCat.pop(p, None)
+        for p in test:
+            pageCat.pop(p, None)
         if(withPrint):
             print("I'm creating the category-number of pages related dictionary")
         lenCategories = {c:float(n) for c, n in self.db.getCaregoriesNPages(inferior_limit)}
         if(withPrint):
             print("I'm creating the centroids")
+        centroids = CentroidMatrix.build(self.db.tfidf, pageCat, lenCategories)
+        if(topN is not None or mass is not None):
+            centroids = centroids.compress(topN, mass)
+        if(saveFile):
+            self.saveCentroids(centroids, precision)
+            tf = TfidfMatrix.build(self.db.invertedIndex, self.db.vocabulary, idf = False)
+            CategorySums.build(tf, pageCat, lenCategories).save(self.PATH + "centroids.sums.npz")
+        return centroids
+
+    def getAllCentroidsPostings(self, inferior_limit = 5, test = []):
+        """
+        \brief The function computes the centroids walking every posting of the inverted index, as the previous versions did.
+        It is the reference of #compareCentroids.
+        \details When a page belongs to a category with less than inferior_limit pages, the categories of the page which follow
+        it are skipped, as in the previous versions.
+        \param inferior_limit :int (Default = 5): Minimum number of pages such that a centroid is computed.
+        \param test :list (Default = []): List representing the test set.
+        \return dict = Dictionary containing centroids vector for each category, not normalised.
+        """
+        pageCat = self.db.getAllCategoriesGivenAllPages(inferior_limit)
+        for p in test:
+            pageCat.pop(p, None)
+        lenCategories = {c:float(n) for c, n in self.db.getCaregoriesNPages(inferior_limit)}
         centroids = {c:{} for c in lenCategories}
+        vocabulary = self.db.vocabulary
         for w, (idf, docs) in self.db.invertedIndex.items():
+            i = vocabulary[w]
             for doc, tf in docs.items():
                 try:
                     for cat in pageCat[doc]:
                         centroids[cat][i] = centroids[cat].get(i, 0) + tf * idf / lenCategories[cat]
                 except KeyError as k:
                     pass
-            i += 1
+        return centroids
+
+    def compareCentroids(self, inferior_limit = 5, tolerance = 1e-4):
+        """
+        \brief The function compares the time and the result of #getCentroidMatrix with the walk of the postings (#getAllCentroidsPostings).
+        \details The centroids of the walk are normalised before the comparison. The time of the sparse products includes
+        the construction of the TF-IDF matrix, if it is not cached yet.
+        \param inferior_limit :int (Default = 5): Minimum number of pages such that a centroid is computed.
+        \param tolerance :float (Default = 1e-4): Maximum difference of a weight such that two centroids agree.
+        \return (float, float, float, int, int) = (seconds of the walk, seconds of the products, maximum difference of a weight,
+         centroids which agree, centroids)
+        """
+        start = time.time()
+        old = self.getAllCentroidsPostings(inferior_limit)
+        oldTime = time.time() - start
+        start = time.time()
+        new = self.getCentroidMatrix(inferior_limit, withPrint = False, saveFile = False)
+        newTime = time.time() - start
+        maxDiff, agree = 0.0, 0
+        for cat, centre in old.items():
+            row = new.matrix[new.rows[cat]].toarray().ravel()
+            norm = math.sqrt(sum(v * v for v in centre.values())) or 1.0
+            diff = np.abs(row).max() if len(row) > 0 else 0.0
+            if len(centre) > 0:
+                expected = np.zeros(len(row))
+                expected[list(centre.keys())] = [v / norm for v in centre.values()]
+                diff = np.abs(row - expected).max()
+            maxDiff = max(maxDiff, diff)
+            agree += diff <= tolerance
+        databaseWiki.printResults(title="Centroids (%d categories)" % len(old), columns=["Postings (s)", "Sparse (s)", "Speed-up", "Max difference", "Agree"],
+                                  rows=[("%.3f" % oldTime, "%.3f" % newTime, "%.1fx" % (oldTime / max(newTime, 1e-9)), "%.2e" % maxDiff, "%d/%d" % (agree, len(old)))])
+        return oldTime, newTime, maxDiff, agree, len(old)
+
+    def updateCentroids(self, categories, inferior_limit = 5, sums = None, saveFile = True):
+        """
+        \brief The function recomputes only the sums of the TF of the given categories, and all the centroids with the current IDF.
+        \details The centroids are kept in "centroids.sums.npz" as the sums of the TF vectors of the pages of every category
+        (see CategorySums): a centroid of #getCentroidMatrix is the sum of the TF of its pages times the IDF, normalised, so
+        the sums do not depend on the IDF. Only the sums of the given categories are computed again, from the words of their
+        pages (databaseWiki.getDocumentTerms); the categories with less than inferior_limit pages are removed. Then all the
+        centroids are computed with the current IDF (databaseWiki.getIdfVector), so they are the centroids of #getCentroidMatrix
+        even if the IDF of the words has changed since it was run. If "centroids.sums.npz" does not exist the centroids are
+        computed by #getCentroidMatrix.
+        \param categories :set = names of the categories to be recomputed (see Categorization.refresh)
+        \param inferior_limit :int (Default = 5): Minimum number of pages such that a centroid is computed.
+        \param sums :CategorySums (Default = None): Sums of the TF of the categories, if None they are read from "centroids.sums.npz".
+        \param saveFile :bool (Default = True): True if the function has to save the centroids in "centroids.pickle" and "centroids.npz" (see #saveCentroids)
+         and the sums in "centroids.sums.npz", false otherwise.
+        \return CentroidMatrix = centroids, categories x words, rows normalised.
+        """
+        if(sums is None):
+            if(not os.path.exists(self.PATH + "centroids.sums.npz")):
+                return self.getCentroidMatrix(inferior_limit, withPrint = False, saveFile = saveFile)
+            sums = CategorySums.load(self.PATH + "centroids.sums.npz")
+        if(self.db.forwardIndex is None):
+            self.db.save()
+        changed = {}
+        for cat in categories:
+            pages = self.db.getPagesGivenCategory(cat)
+            if(len(pages) < inferior_limit):
+                changed[cat] = None
+                continue
+            centre = {}
+            for doc in pages:
+                positions, tfs = self.db.getDocumentTerms(doc)
+                for i, tf in zip(self.db.termIds(positions).tolist(), tfs.tolist()):
+                    centre[i] = centre.get(i, 0) + tf
+            changed[cat] = centre
+        sums = sums.update(changed, len(self.db.vocabulary))
+        centroids = sums.centroids(self.db.getIdfVector())
         if(saveFile):
-            self.writeFile(centroids, "centroids.pickle")
+            sums.save(self.PATH + "centroids.sums.npz")
+            self.saveCentroids(centroids)
         return centroids
 
-    def getCluster(self, eps = None, minPts = None):
-        """
-        \brief The function goes through the Wikipedia vectors and computes the clustering over them.
-        \param eps :float = Maximum distance between two points on the same cluster.
-        \param minPts :int = The number of samples (or total weight) in a neighborhood for a point to be considered as a core point. This includes the point itself.
-        \return list = List containing cluster labels.
-        """
-        #D = getDistanceMatrix()
-        #print("Distance matrix completed, clustering in process")
-        clusters = DBSCAN(metric=Categorization.cosin_sim_pairs).fit_predict(np.arange(186696).reshape(-1, 1))
-        print("Clustering completed, writing pickle file")
+    def refresh(self, path, deleted = (), fullDump = False, inferior_limit = 5):
+        """
+        \brief The function applies a newer dump, or an adds/changes file, to the database, to the inverted index and to the centroids.
+        \details Only the pages changed are processed (ParseDumpWiki.update), their changes are appended to the inverted index
+        as a delta (databaseWiki.updateInvertedIndex) and only the sums of the TF of their categories are recomputed (#updateCentroids),
+        so the time depends on the size of the changes; all the centroids are computed from the sums with the current IDF. When the delta has grown over databaseWiki.DELTA_LIMIT the index is
+        written again with it (databaseWiki.compactInvertedIndex) and all the centroids are computed again (#getCentroidMatrix):
+        this full pass is the only step whose time depends on the size of the corpus.
+        \param path :str = path of the xml (or bz2) file with the new version of the pages
+        \param deleted :list (default=()) = titles of the pages deleted
+        \param fullDump :bool (default=False) = True if path is a complete dump
+        \param inferior_limit :int (Default = 5): Minimum number of pages such that a centroid is computed.
+        """
+        changes, categories = ParseDumpWiki(db = self.db).update(path, deleted, fullDump)
+        self.db.updateInvertedIndex(changes)
+        if(self.db.compactInvertedIndex()):
+            self.getCentroidMatrix(inferior_limit, withPrint = False)
+            print("Updated %d pages, inverted index compacted and all the centroids computed again" % len(changes))
+            return
+        self.updateCentroids(categories, inferior_limit)
+        print("Updated %d pages and %d categories" % (len(changes), len(categories)))
+
+    def getCluster(self, nClusters = 100, nSteps = 1000, batchSize = 1024, processes = 1, resume = True):
+        """
+        \brief The function clusters the Wikipedia pages by the cosine similarity of their TF-IDF vectors, with mini-batch spherical k-means (see SphericalKMeans).
+        \details The state is saved in "clusters.npz" during the training, so a run interrupted is resumed from the last save;
+         at the end it contains the centres and the clusters of the pages, which are saved also in "clusters.pickle".
+        \param nClusters :int (Default = 100): Number of clusters.
+        \param nSteps :int (Default = 1000): Number of mini-batches of the training.
+        \param batchSize :int (Default = 1024): Number of pages of a mini-batch.
+        \param processes :int (Default = 1): Number of processes assigning the pages to the clusters.
+        \param resume :bool (Default = True): True if the training has to continue from "clusters.npz", if it exists with the same parameters.
+        \return dict = keys: title of the page values: cluster (-1 for the pages without words).
+        """
+        tfidf = self.db.tfidf
+        kmeans = SphericalKMeans(nClusters, batchSize)
+        if(resume and os.path.exists(self.PATH + "clusters.npz")):
+            saved, labels = SphericalKMeans.load(self.PATH + "clusters.npz")
+            if(saved.nClusters == nClusters and saved.batchSize == batchSize and saved.centers.shape[1] == tfidf.matrix.shape[1]):
+                kmeans = saved
+        kmeans.fit(tfidf.matrix, nSteps, self.PATH + "clusters.npz")
+        print("Clustering completed, assigning the pages")
+        labels, similarities = kmeans.predict(tfidf.matrix, processes = processes)
+        kmeans.save(self.PATH + "clusters.npz", labels)
+        clusters = dict(zip(tfidf.titles, labels.tolist()))
+        print("Mean cosine similarity with the centre: %.4f" % (similarities[labels >= 0].mean() if (labels >= 0).any() else 0.0))
         self.writeFile(clusters, "clusters.pickle")
         return clusters
     
     def getDistanceMatrix(self):
         """
         \brief The function computes the matrix containing the distances between the vector representations of the wikipedia pages.
+        \details The rows of the TF-IDF matrix (databaseWiki.tfidf) are normalised, so the cosine similarities are one sparse product.
+        The rows and the columns are in the order of databaseWiki.tfidf.titles.
         \return matrix = Matrix containing the Wikipedia pages distances.
         """
-        v = self.getVectors()
-        vLis = v.keys()
-        N = len(v.keys())
-        D = np.zeros([N, N], dtype=np.float32)
-        print(N)
-        for i in range(N):
-            print("%d/%d" %(i, N))
-            D[i, i] = 1
-            for j in range(i + 1, N):
-                dist = self.cosin_sim_pairs(v[vLis[i]], v[vLis[j]])
-                D[i, j] = dist
-                D[j, i] = dist
+        M = self.db.tfidf.matrix
+        D = (M @ M.T).toarray()
+        np.fill_diagonal(D, 1)
         return D
 
+    def getNeighbourGraph(self, k = 10, threshold = None, blockSize = 512, processes = 1):
+        """
+        \brief The function computes the k most similar pages of every Wikipedia page, without the whole matrix of #getDistanceMatrix.
+        \details The similarities are computed by blocks of pages and written in the directory "neighbours/" (see NeighbourGraph):
+         if the function is interrupted, calling it again with the same parameters computes only the missing blocks.
+        \param k :int (Default = 10): Number of neighbours kept for every page.
+        \param threshold :float (Default = None): If not None only the neighbours with at least this cosine similarity are kept.
+        \param blockSize :int (Default = 512): Number of pages of a block, the memory used is proportional to it.
+        \param processes :int (Default = 1): Number of processes computing the blocks.
+        \return (scipy.sparse.csr_matrix, list) = (kNN graph: pages x pages, values = cosine similarities; titles of the pages, indexed by row)
+        """
+        tfidf = self.db.tfidf
+        graph = NeighbourGraph(self.PATH + "neighbours/", tfidf.matrix, k, threshold, blockSize)
+        return graph.build(processes), tfidf.titles
+
     def getVector(self, p):
         """
         \brief The function receives as input #p which is a Wikipedia page name and it computes its vector representation.
+        \details The vector of a page of the dataset is read from the forward index (databaseWiki.getDocumentVector) in time
+         proportional to its number of words; only if the inverted index has not been saved yet it is found by #scanVector.
         \param p :string = Name of the Wikipedia page to be computed. 
         \return dict = Dictionary containing the vector representation of the given page.
         """
-        vector = {}
-        i = 0
         tr = ParseDumpWiki.normName(p)
         if(self.db.isInPage(tr)):
-            for w, (idf, docs) in self.db.invertedIndex.items():
-                if (p in docs):
-                    vector[i] = idf * docs[p]
-                i += 1
+            vector = self.db.getDocumentVector(p)
+            if vector is None:
+                vector = self.scanVector(p)
         else:
             freqDist = self.db.transformDocument(wikipedia.page(p).content)
-            indexesWords = list(self.db.invertedIndex.keys())
-            commonWords = set(indexesWords).intersection(freqDist.keys())
-            for w in commonWords:
-                idf, docs = self.db.invertedIndex[w]
-                vector[indexesWords.index(w)] = idf * freqDist[w]
+            vector = self.getQueryVector(freqDist)
+        return vector
+
+    def scanVector(self, p):
+        """
+        \brief The function computes the vector representation of a page of the dataset looking for it in the postings of all the words.
+        \param p :string = Name of the Wikipedia page.
+        \return dict = Dictionary containing the vector representation of the page: keys = id of the word in the vocabulary, values = weight.
+        """
+        vector = {}
+        vocabulary = self.db.vocabulary
+        for w, (idf, docs) in self.db.invertedIndex.items():
+            if (p in docs):
+                vector[vocabulary[w]] = idf * docs[p]
+        return vector
+
+    def compareVectorLookup(self, npages = 1000, nScan = 10):
+        """
+        \brief The function measures the latency of the lookup of the vector of a page of the dataset in the forward index
+         (databaseWiki.getDocumentVector) and compares it with the scan of the inverted index (#scanVector), checking that the vectors match.
+        \param npages :int (Default = 1000): Number of random pages looked up in the forward index.
+        \param nScan :int (Default = 10): Number of these pages looked up also with the scan, which is much slower.
+        \return (float, float, int) = (ms per page forward index, ms per page scan, pages with the same vector)
+        """
+        if self.db.forwardIndex is None:
+            self.db.save()
+        allPages = self.db.getPages()
+        pages = random.sample(allPages, min(npages, len(allPages)))
+        start = time.time()
+        vectors = [self.db.getDocumentVector(p) for p in pages]
+        forwardTime = 1000 * (time.time() - start) / len(pages)
+        start = time.time()
+        scanned = [self.scanVector(p) for p in pages[:nScan]]
+        scanTime = 1000 * (time.time() - start) / max(len(scanned), 1)
+        same = 0
+        for a, b in zip(vectors, scanned):
+            if a.keys() == b.keys() and np.allclose([a[i] for i in b], list(b.values()), rtol = 1e-5):
+                same += 1
+        databaseWiki.printResults(title="Vector of a page of the dataset", columns=["Lookup", "Pages", "ms/page"],
+                                  rows=[("Forward index", len(pages), "%.4f" % forwardTime), ("Scan", len(scanned), "%.3f" % scanTime)])
+        print("Same vectors: %d/%d" % (same, len(scanned)))
+        return forwardTime, scanTime, same
+
+    def getQueryVector(self, freqDist):
+        """
+        \brief The function computes the vector representation of a page which is not in the dataset, in time proportional to its number of words.
+        \param freqDist :dict = Frequency distribution of the page, as returned by databaseWiki.transformDocument.
+        \return dict = Dictionary containing the vector representation of the page: keys = id of the word in the vocabulary, values = weight.
+        """
+        vector = {}
+        vocabulary = self.db.vocabulary
+        for w, f in freqDist.items():
+            i = vocabulary.get(w)
+            if i is None:
+                continue
+            try:
+                vector[i] = self.db.invertedIndex[w][0] * f
+            except KeyError as k:
+                pass
         return vector
 
     def recommendCategory(self, page, randomWeb, centroids = None, nSugg = None, printRes = True):
@@ -233,6 +456,260 @@ class Categorization:
             Categorization.printStats(m2, m3, actual, top)
         return m1, m2, m3
 
+    def loadCentroidMatrix(self, centroids = None):
+        """
+        \brief The function returns the centroids as a CentroidMatrix.
+        \param centroids :CentroidMatrix or dict (Default = None): centroids; if None they are read from "centroids.npz" or, if the
+         file does not exist, computed by #getCentroidMatrix. A dict (see #getAllCentroids) is converted.
+        \return CentroidMatrix = centroids
+        """
+        if(isinstance(centroids, CentroidMatrix)):
+            return centroids
+        if(centroids is not None):
+            return CentroidMatrix.fromDict(centroids, len(self.db.vocabulary))
+        try:
+            return CentroidMatrix.load(self.PATH + "centroids.npz")
+        except IOError as e:
+            return self.getCentroidMatrix()
+
+    def recommendMany(self, pages, k = None, centroids = None, batchSize = 256):
+        """
+        \brief The function recommends the categories of many pages of the dataset at once.
+        \details The rows of the pages are taken from the TF-IDF matrix (databaseWiki.tfidf) and scored against all the centroids
+         with one sparse product per batch; the k best categories are chosen with a partial selection (see CentroidMatrix.top).
+         A page which is not in the matrix gets an empty row, i.e. every category scores 0.
+        \param pages :list = Names of the pages to be recommended.
+        \param k :int or list (Default = None): Number of categories to be recommended, for all the pages or for each page; if None
+         it is the number of actual categories of each page, as in #recommendCategory.
+        \param centroids :CentroidMatrix or dict (Default = None): centroids (see #loadCentroidMatrix).
+        \param batchSize :int (Default = 256): Number of pages scored by every product.
+        \return list = for every page the list of (category, cosine similarity) sorted by decreasing similarity.
+        """
+        centroids = self.loadCentroidMatrix(centroids)
+        if(k is None):
+            k = [len(self.db.getCategoriesGivenPage(p)) for p in pages]
+        return centroids.top(self.queryRows(pages), k, batchSize)
+
+    def queryRows(self, pages):
+        """
+        \brief The function returns the rows of the TF-IDF matrix (databaseWiki.tfidf) of some pages of the dataset.
+        \param pages :list = Names of the pages.
+        \return scipy.sparse.csr_matrix = pages x words, rows normalised; the pages which are not in the matrix get an empty row.
+        """
+        tfidf = self.db.tfidf
+        rows = [(r, tfidf.rows[p]) for r, p in enumerate(pages) if p in tfidf.rows]
+        select = sp.sparse.csr_matrix((np.ones(len(rows), dtype=np.float32), ([r for r, j in rows], [j for r, j in rows])),
+                                      shape=(len(pages), len(tfidf)))
+        return select @ tfidf.matrix
+
+    def recommendIndexed(self, pages, k = None, centroids = None):
+        """
+        \brief The function recommends the categories of many pages of the dataset through the index of the centroids (see CentroidIndex),
+         which scores only the centroids that can enter the k best ones. The result is the one of #recommendMany.
+        \param pages :list = Names of the pages to be recommended.
+        \param k :int or list (Default = None): Number of categories to be recommended, for all the pages or for each page; if None
+         it is the number of actual categories of each page.
+        \param centroids :CentroidIndex, CentroidMatrix or dict (Default = None): centroids (see #loadCentroidMatrix).
+        \return list = for every page the list of (category, cosine similarity) sorted by decreasing similarity.
+        """
+        index = centroids if isinstance(centroids, CentroidIndex) else CentroidIndex(self.loadCentroidMatrix(centroids))
+        if(k is None):
+            k = [len(self.db.getCategoriesGivenPage(p)) for p in pages]
+        elif(isinstance(k, int)):
+            k = [k] * len(pages)
+        tfidf = self.db.tfidf
+        result = []
+        for page, kp in zip(pages, k):
+            row = tfidf.row(page)
+            if(row is None):
+                result.append(index.top(np.zeros(0, dtype=np.int32), np.zeros(0), kp))
+            else:
+                result.append(index.top(row.indices, row.data, kp))
+        return result
+
+    def compareRetrieval(self, sizes = (100, 1000, 10000, 100000), npages = 50, k = 5):
+        """
+        \brief The function compares the latency of the exhaustive scoring of a page (CentroidMatrix.top) with the retrieval
+         through the index of the centroids (#recommendIndexed) as the number of categories grows, and checks that the results match.
+        \details For every size a random subset of the categories with at least 1 page is used; the sizes larger than the number
+         of categories are skipped.
+        \param sizes :tuple (Default = (100, 1000, 10000, 100000)): Numbers of categories to be tested.
+        \param npages :int (Default = 50): Number of random pages of the dataset to be recommended.
+        \param k :int (Default = 5): Number of categories recommended for every page.
+        \return dict = keys: number of categories values: (ms per page exhaustive, ms per page indexed, pages with the same scores)
+        """
+        allCentroids = self.getCentroidMatrix(inferior_limit = 1, withPrint = False, saveFile = False)
+        tfidf = self.db.tfidf
+        pages = random.sample([p for p in self.db.getPages() if p in tfidf.rows], npages)
+        results = dict()
+        for n in sizes:
+            if(n > len(allCentroids)):
+                continue
+            centroids = allCentroids.select(random.sample(allCentroids.categories, n))
+            index = CentroidIndex(centroids)
+            start = time.time()
+            exhaustive = [centroids.top(tfidf.row(p), k)[0] for p in pages]
+            exhaustiveTime = time.time() - start
+            start = time.time()
+            indexed = self.recommendIndexed(pages, k, index)
+            indexedTime = time.time() - start
+            same = sum(1 for a, b in zip(exhaustive, indexed) if np.allclose([s for c, s in a], [s for c, s in b], atol = 1e-6))
+            results[n] = (1000 * exhaustiveTime / npages, 1000 * indexedTime / npages, same)
+        databaseWiki.printResults(title="Top %d categories of %d pages" % (k, npages), columns=["Categories", "Exhaustive (ms/page)", "Indexed (ms/page)", "Same scores"],
+                                  rows=[(n, "%.3f" % e, "%.3f" % i, "%d/%d" % (same, npages)) for n, (e, i, same) in results.items()])
+        return results
+
+    def compareCompression(self, topN = (1000, 300, 100), mass = (0.95, 0.8), precision = ("float16", "uint8"), nPagesRacc = 500,
+                           inferior_limit = 5, percentageTest = 0.20):
+        """
+        \brief The function compares the centroids compressed by CentroidMatrix.compress and stored with reduced precision with
+         the full centroids: memory, time of the recommendation of nPagesRacc test pages and mean of the three measures.
+        \details The centroids are computed without the test pages. Every truncation (topN, then mass) is measured in float32,
+         then the first truncation is measured with every precision.
+        \param topN :tuple (Default = (1000, 300, 100)): Numbers of words kept by every centroid.
+        \param mass :tuple (Default = (0.95, 0.8)): Shares of the length kept by every centroid.
+        \param precision :tuple (Default = ("float16", "uint8")): Reduced precisions of the weights.
+        \param nPagesRacc :int (Default = 500): Number of test pages to be recommended.
+        \param inferior_limit :int (Default = 5): Minimum number of pages such that a centroid is computed.
+        \param percentageTest :float (Default = 0.2): Fraction of the dataset to use as test set.
+        \return list = tuples (variant, MB, memory saved, seconds, speed-up, mean Boolean, mean Fractional, mean Hierarchical)
+        """
+        allPages = self.db.getPages()
+        test = random.sample(allPages, int(len(allPages) * percentageTest))
+        pages = random.sample(test, min(nPagesRacc, len(test)))
+        full = self.getCentroidMatrix(inferior_limit, withPrint = False, saveFile = False, test = test)
+        variants = [("Full", full, "float32")]
+        variants += [("Top %d" % n, full.compress(topN = n), "float32") for n in topN]
+        variants += [("Mass %.2f" % m, full.compress(mass = m), "float32") for m in mass]
+        reference = variants[1][1] if len(variants) > 1 else full
+        variants += [("%s %s" % (variants[1][0] if len(variants) > 1 else "Full", p), reference.quantize(p), p) for p in precision]
+        rows = []
+        for name, centroids, p in variants:
+            start = time.time()
+            m1, m2, m3 = self.measureMany(pages, centroids)
+            elapsed = time.time() - start
+            rows.append((name, centroids.nbytes(p) / 1024.0 ** 2, elapsed, np.mean(m1), np.mean(m2), np.mean(m3)))
+        result = [(name, mb, 1 - mb / rows[0][1], t, rows[0][2] / max(t, 1e-9), a1, a2, a3) for name, mb, t, a1, a2, a3 in rows]
+        databaseWiki.printResults(title="Compression of %d centroids (%d pages)" % (len(full), len(pages)),
+                                  columns=["Variant", "MB", "Saved", "Seconds", "Speed-up", "Boolean", "Fractional", "Hierarchical"],
+                                  rows=[(n, "%.2f" % mb, "%.0f%%" % (100 * sv), "%.3f" % t, "%.2fx" % su, "%.3f (%+.3f)" % (a1, a1 - result[0][5]),
+                                         "%.3f (%+.3f)" % (a2, a2 - result[0][6]), "%.3f (%+.3f)" % (a3, a3 - result[0][7]))
+                                        for n, mb, sv, t, su, a1, a2, a3 in result])
+        return result
+
+    def measureMany(self, pages, centroids, printRes = False, processes = 1):
+        """
+        \brief The function recommends the categories of many pages with #recommendMany and computes their measures.
+        \details As in #recommendCategory the number of suggested categories of a page is the number of its actual categories.
+         With more than one process the pages are split in contiguous blocks measured by a pool of forked processes (see #measureParallel);
+         the results are the ones of the serial run, in the same order.
+        \param pages :list = Names of the pages to be recommended.
+        \param centroids :CentroidMatrix or dict = centroids (see #loadCentroidMatrix).
+        \param printRes :bool (Default = False): True if the function has to print the results of every page, false otherwise.
+        \param processes :int (Default = 1): Number of processes recommending the pages.
+        \return (list, list, list) = (Boolean measures, Fractional measures, Hierarchical measures) of the pages
+        """
+        centroids = self.loadCentroidMatrix(centroids)
+        if(processes > 1):
+            results = self.measureParallel(pages, centroids, processes)
+        else:
+            results = self.measureRows(pages, centroids, self.queryRows(pages))
+        m1, m2, m3 = [], [], []
+        for page, (m1p, m2p, m3p, actual, top) in zip(pages, results):
+            if(printRes):
+                print("\nI'm categorizing the '%s' page.." % page)
+                Categorization.printStats(m2p, m3p, actual, top)
+            m1.append(m1p)
+            m2.append(m2p)
+            m3.append(m3p)
+        return m1, m2, m3
+
+    def measureRows(self, pages, centroids, queries):
+        """
+        \brief The function recommends the categories of some pages and computes their measures (see #measureMany).
+        \param pages :list = Names of the pages to be recommended.
+        \param centroids :CentroidMatrix = centroids.
+        \param queries :scipy.sparse.csr_matrix = rows of the pages in the TF-IDF matrix (see #queryRows).
+        \return list = for every page (Boolean measure, Fractional measure, Hierarchical measure, actual categories, recommended categories)
+        """
+        actuals = [self.db.getCategoriesGivenPage(p) for p in pages]
+        nSuggs = [min(len(actual), len(centroids)) for actual in actuals]
+        return [self.measures(actual, top, nSugg) + (actual, top)
+                for actual, nSugg, top in zip(actuals, nSuggs, centroids.top(queries, nSuggs))]
+
+    def measureParallel(self, pages, centroids, processes, blocksPerProcess = 4):
+        """
+        \brief The function measures the pages with a pool of forked processes.
+        \details The centroids and the rows of the pages are written as raw files in a temporary directory under #PATH and every
+         process maps them read-only (see CentroidMatrix.dump), so they are shared through the page cache and never pickled.
+         The processes receive only the bounds of their blocks and return the measures; the hierarchy of the categories
+         (databaseWiki.categoryGraph) is built before the fork and shared as well.
+        \param pages :list = Names of the pages to be recommended.
+        \param centroids :CentroidMatrix = centroids.
+        \param processes :int = Number of processes.
+        \param blocksPerProcess :int (Default = 4): Number of blocks of pages for every process.
+        \return list = for every page (Boolean measure, Fractional measure, Hierarchical measure, actual categories, recommended categories)
+        """
+        self.db.categoryGraph
+        shared = tempfile.mkdtemp(prefix = "evaluation", dir = self.PATH)
+        try:
+            centroids.dump(os.path.join(shared, "centroids"))
+            CentroidMatrix.dumpCsr(self.queryRows(pages), os.path.join(shared, "queries"))
+            size = max(1, -(-len(pages) // (processes * blocksPerProcess)))
+            blocks = [(pages[start:start + size], start) for start in range(0, len(pages), size)]
+            with multiprocessing.get_context("fork").Pool(processes, initializer = initEvaluation, initargs = (self, shared)) as workers:
+                results = workers.map(measureWorker, blocks)
+        finally:
+            shutil.rmtree(shared, ignore_errors = True)
+        return [r for block in results for r in block]
+
+    def compareEvaluation(self, npages = 2000, processes = (1, 2, 4), inferior_limit = 5, seed = 0):
+        """
+        \brief The function measures the wall-clock time of #measureMany with an increasing number of processes, and checks
+         that the measures are the ones of the serial run.
+        \param npages :int (Default = 2000): Number of random pages of the dataset to be recommended.
+        \param processes :tuple (Default = (1, 2, 4)): Numbers of processes to be tested.
+        \param inferior_limit :int (Default = 5): Minimum number of pages such that a centroid is computed.
+        \param seed :int (Default = 0): Seed of the choice of the pages.
+        \return dict = keys: number of processes values: (seconds, speed-up, same measures)
+        """
+        centroids = self.getCentroidMatrix(inferior_limit, withPrint = False, saveFile = False)
+        allPages = sorted(self.db.getPages())
+        pages = random.Random(seed).sample(allPages, min(npages, len(allPages)))
+        results = dict()
+        serial = None
+        for n in processes:
+            start = time.time()
+            measures = self.measureMany(pages, centroids, processes = n)
+            elapsed = time.time() - start
+            serial = serial or (elapsed, measures)
+            results[n] = (elapsed, serial[0] / elapsed, measures == serial[1])
+        databaseWiki.printResults(title = "Evaluation of %d pages" % len(pages), columns = ["Processes", "Seconds", "Speed-up", "Same measures"],
+                                  rows = [(n, "%.2f" % t, "%.2fx" % x, same) for n, (t, x, same) in results.items()])
+        return results
+
+    def compareRecommend(self, npages = 100, centroids = None):
+        """
+        \brief The function compares the throughput of #recommendCategory, one page at a time, with #recommendMany.
+        \param npages :int (Default = 100): Number of random pages of the dataset to be recommended.
+        \param centroids :dict (Default = None): Dictionary containing the centroid vectors, if None they are computed by #getAllCentroids.
+        \return (float, float, int) = (pages per second one at a time, pages per second batched, pages with the same measures)
+        """
+        if(centroids is None):
+            centroids = self.getAllCentroids(withPrint = False, saveFile = False)
+        pages = random.sample(self.db.getPages(), npages)
+        start = time.time()
+        single = [self.recommendCategory(page = p, randomWeb = False, centroids = centroids, printRes = False) for p in pages]
+        singleTime = time.time() - start
+        matrix = self.loadCentroidMatrix(centroids)
+        start = time.time()
+        m1, m2, m3 = self.measureMany(pages, matrix)
+        batchTime = time.time() - start
+        same = sum(1 for a, b in zip(single, zip(m1, m2, m3)) if np.allclose(a, b))
+        databaseWiki.printResults(title="Recommendation of %d pages" % npages, columns=["One at a time (pages/s)", "Batched (pages/s)", "Speed-up", "Same measures"],
+                                  rows=[("%.1f" % (npages / singleTime), "%.1f" % (npages / batchTime), "%.1fx" % (singleTime / max(batchTime, 1e-9)), "%d/%d" % (same, npages))])
+        return npages / singleTime, npages / batchTime, same
+
     def measures(self, actual, top, nSugg):
         """
         \brief The function receives as input #actual, #top and #nSugg which are the real categories, the suggested categories and the number of suggested categories.
@@ -246,14 +723,15 @@ class Categorization:
         """
         m2 = 0.0
         m3 = 0.0
+        graph = self.db.categoryGraph
         for categorySug, count in top:
             if categorySug in actual:
                 m2 += 1.0
             else:
                 for cR in actual:
-                    if self.getFatherSon(cR, categorySug) != None:
+                    if graph.isFatherSon(cR, categorySug):
                         m3 += 0.5
-                    elif self.getBrothers(cR, categorySug) != None:
+                    elif graph.areBrothers(cR, categorySug):
                         m3 += 0.25
                 m3 /= len(actual)
         m2 /= nSugg
@@ -281,52 +759,48 @@ class Categorization:
         """
         \brief The function receives as input #catR and #catS which are the name of the real and suggested category respectively. 
          Then, it returns a list containing the brother categories.
+        \details The categories are read from the hierarchy in memory (databaseWiki.categoryGraph).
         \param catR :string = Name of the real category.
         \param catS :string = Name of the suggested category.
-        \return list = List containing the brother categories.
+        \return list = List containing the common father categories, empty if they are not brothers.
         """
-        c = self.db.db.cursor()
-        c.execute('SELECT * FROM catsub WHERE ? IN (SELECT cat_name FROM cat_name_sub WHERE cat_name_sub = ?)', [catS, catR])
-        return c.fetchall()
+        return self.db.categoryGraph.brothers(catR, catS)
 
     def getFatherSon(self, catR, catS):
         """
         \brief The function receives as input #catR and #catS which are the name of the real and suggested category respectively. 
          Then, it returns a list containing the father/son category.
+        \details The categories are read from the hierarchy in memory (databaseWiki.categoryGraph).
         \param catR :string = Name of the real category.
         \param catS :string = Name of the suggested category.
-        \return list = List containing the father/son category.
+        \return list = List containing the pairs (father, son), empty if no category is father of the other.
         """
-        c = self.db.db.cursor()
-        c.execute('SELECT * FROM catsub WHERE (cat_name_sub = ? AND cat_name = ?) OR (cat_name_sub = ? AND cat_name = ?)', [catS, catR, catR, catS])
-        return c.fetchall()
+        graph = self.db.categoryGraph
+        return [(f, s) for f, s in ((catR, catS), (catS, catR)) if graph.isFather(f, s)]
 
-    def evaluation(self, npages, centroids = None, randomWeb = False, pageWeb = None):
+    def evaluation(self, npages, centroids = None, randomWeb = False, pageWeb = None, processes = 1, seed = 0):
         """
         \brief The function receives as input #npages which is the number of Wikipedia pages to be evaluated and #pageWeb which is the page to be recommended. 
          It computes the boolean, fractional and hierarchical measures and prints them.
+        \details The pages of the dataset are recommended all together by #measureMany.
         \param npages :int = Number of pages used for the algorithm evaluation.
-        \param centroids :dict (Default = None): Dictionary containing the centroid vectors.
+        \param centroids :dict or CentroidMatrix (Default = None): Centroids, if None they are read from "centroids.npz" or computed.
         \param randomWeb :bool (Default = False): True if the #pageWeb is not None, false otherwise.
         \param pageWeb :string (Default = None): String containing the page to be recommended.
+        \param processes :int (Default = 1): Number of processes recommending the pages (see #measureMany).
+        \param seed :int (Default = 0): Seed of the choice of the pages, so that the results can be reproduced.
         """
-        if(centroids is None):
-            try:
-                centroids = self.readFile("centroids.pickle")
-            except:
-                centroids = self.getAllCentroids(5)
-        
         if(randomWeb):
-            pages = [pageWeb]
+            if(centroids is None):
+                try:
+                    centroids = self.readFile("centroids.pickle")
+                except:
+                    centroids = self.getAllCentroids(5)
+            m1, m2, m3 = self.recommendCategory(page=pageWeb,centroids=centroids,randomWeb=randomWeb)
+            m1, m2, m3 = [m1], [m2], [m3]
         else:
-            pages = random.sample(self.db.getPages(), npages)
-
-        m1, m2, m3 = [], [], []
-        for page in pages:
-            m1p, m2p, m3p = self.recommendCategory(page=page,centroids=centroids,randomWeb=randomWeb)
-            m1.append(m1p)
-            m2.append(m2p)
-            m3.append(m3p)
+            pages = random.Random(seed).sample(sorted(self.db.getPages()), npages)
+            m1, m2, m3 = self.measureMany(pages, centroids, printRes = True, processes = processes)
 
         avg1 = np.mean(m1)
         avg2 = np.mean(m2)
@@ -338,36 +812,35 @@ class Categorization:
         print("The fractional measure scored %0.2f" %(avg2))
         print("The hierarchical measure scored %0.2f" %(avg3))
 
-    def measurements(self, minPag = 4, maxPag = 50, nPagesRacc = 100, percentageTest = 0.20):
+    def measurements(self, minPag = 4, maxPag = 50, nPagesRacc = 100, percentageTest = 0.20, processes = 1, seed = 0, sweep = False):
         """
         \brief The function receives as input #nPageRacc and #percentageTest which are the number of pages to be recommended for each step and the dataset fraction
          to use as test set. It computes several test recommending every time #nPageRacc pages. For each step it considers a different number of categories. Specifically,
          it starts with the categories containing at least #minPag pages and iteratively considers the categories with a larger number of pages. In the final iteration, it 
          computes the categories with at least #maxPag pages. Finally, the function write the results obtained in a pickle called "avg.pickle" in which it is saved the list
          returned by the function.         
+        \details The pages of every step are recommended all together by #measureMany.
         \param minPag : int (default=4) : minimum number of pages for the first iteration (to construct the centroids).
         \param maxPag : int (default=4) : minimum number of pages for the last iteration (to construct the centroids).
         \param nPagesRacc :int (default=100)= Number of pages to be recommended.
         \param percentageTest :float (default =0.2)= Fraction of the dateset to use as test set.
+        \param processes :int (default=1)= Number of processes recommending the pages of every step (see #measureMany).
+        \param seed :int (default=0)= Seed of the choice of the test set and of the pages of every step, so that the results can be reproduced.
+        \param sweep :bool (default=False)= True if the same pages have to be recommended at every step, scoring them only once (see #measurementsSweep).
         \return list = The list cointaned tuples. Each tuple contains: (nPage, len(centroids), elapsed_time, mean(Boolean measure), std(Boolean measure),mean(Fractional measure), 
          std(Fractional measure),mean(Hierarchical measure), std(Hierarchical measure))
         """
-        allPages = self.db.getPages()
-        test = random.sample(allPages, int(len(allPages) * percentageTest))
+        if(sweep):
+            return self.measurementsSweep(minPag, maxPag, nPagesRacc, percentageTest, seed)
+        rnd = random.Random(seed)
+        allPages = sorted(self.db.getPages())
+        test = rnd.sample(allPages, int(len(allPages) * percentageTest))
         avg = []
-        centroids = self.getAllCentroids(inferior_limit = minPag, withPrint = False, saveFile = False, test = test)
+        centroids = self.getCentroidMatrix(inferior_limit = minPag, withPrint = False, saveFile = False, test = test)
         for nPage in tqdm(range(minPag, maxPag+1)):
-            c = self.db.db.cursor()
-            c.execute('SELECT cat_name FROM catpage GROUP BY cat_name HAVING COUNT(*)<?', [nPage]) 
-            for ex in {c[0] for c in c.fetchall()}.intersection(centroids.keys()):
-                centroids.pop(ex,None)
-            m1, m2, m3 = [], [], []
+            centroids = centroids.select(c for c, n in self.db.getCaregoriesNPages(nPage))
             start_time = time.time()
-            for page in random.sample(test, nPagesRacc):
-                m1p, m2p, m3p = self.recommendCategory(page = page, centroids = centroids, randomWeb = False, printRes = False)
-                m1.append(m1p)
-                m2.append(m2p)
-                m3.append(m3p)
+            m1, m2, m3 = self.measureMany(rnd.sample(test, nPagesRacc), centroids, processes = processes)
             elapsed_time = time.time() - start_time
             tuple = (nPage, len(centroids), elapsed_time, np.mean(m1), np.std(m1), np.mean(m2), np.std(m2), np.mean(m3), np.std(m3))
             print("\n", tuple)
@@ -375,6 +848,88 @@ class Categorization:
         self.writeFile(avg, "avg.pickle")
         return avg
 
+    def measurementsSweep(self, minPag = 4, maxPag = 50, nPagesRacc = 100, percentageTest = 0.20, seed = 0):
+        """
+        \brief The function computes the results of #measurements recommending the same nPagesRacc test pages at every step.
+        \details The pages are scored against all the centroids of the categories with at least minPag pages once; the numbers
+         of pages of the categories are read once too. At every step the categories with less than nPage pages are masked
+         (score -inf) in a copy of the scores and the best categories are chosen again (see CentroidMatrix.best), so the results
+         are the ones of the centroids selected by #measurements, without scoring the pages again. The time of every step does not
+         include the scoring, which is printed. The results are written in "avg.pickle".
+        \param minPag : int (default=4) : minimum number of pages for the first iteration (to construct the centroids).
+        \param maxPag : int (default=50) : minimum number of pages for the last iteration.
+        \param nPagesRacc :int (default=100)= Number of pages to be recommended.
+        \param percentageTest :float (default =0.2)= Fraction of the dateset to use as test set.
+        \param seed :int (default=0)= Seed of the choice of the test set and of the pages, so that the results can be reproduced.
+        \return list = tuples as in #measurements
+        """
+        rnd = random.Random(seed)
+        allPages = sorted(self.db.getPages())
+        test = rnd.sample(allPages, int(len(allPages) * percentageTest))
+        pages = rnd.sample(test, min(nPagesRacc, len(test)))
+        centroids = self.getCentroidMatrix(inferior_limit = minPag, withPrint = False, saveFile = False, test = test)
+        lenCategories = dict(self.db.getCaregoriesNPages(minPag))
+        sizes = np.array([lenCategories.get(c, 0) for c in centroids.categories])
+        actuals = [self.db.getCategoriesGivenPage(p) for p in pages]
+        start_time = time.time()
+        scores = centroids.scores(self.queryRows(pages))
+        print("%d pages scored against %d centroids in %.2fs" % (len(pages), len(centroids), time.time() - start_time))
+        avg = []
+        for nPage in tqdm(range(minPag, maxPag+1)):
+            start_time = time.time()
+            keep = sizes >= nPage
+            nCentroids = int(keep.sum())
+            nSuggs = [min(len(actual), nCentroids) for actual in actuals]
+            tops = centroids.best(np.where(keep, scores, -np.inf), nSuggs)
+            m1, m2, m3 = zip(*[self.measures(actual, top, nSugg) for actual, top, nSugg in zip(actuals, tops, nSuggs)]) if pages else ([], [], [])
+            elapsed_time = time.time() - start_time
+            tuple = (nPage, nCentroids, elapsed_time, np.mean(m1), np.std(m1), np.mean(m2), np.std(m2), np.mean(m3), np.std(m3))
+            print("\n", tuple)
+            avg.append(tuple)
+        self.writeFile(avg, "avg.pickle")
+        return avg
+
+    def crossValidation(self, k = 5, inferior_limit = 5, nPagesRacc = None, processes = 1, seed = 0):
+        """
+        \brief The function evaluates the recommendation with a k-fold cross-validation: the pages are split in k folds and
+         the pages of every fold are recommended with the centroids computed without them.
+        \details The sums of the pages of the categories are computed once (see CentroidSums) and the centroids of every fold are
+         obtained subtracting the pages of the fold, so the cost is about one computation of the centroids plus the work on the
+         held-out pages. The categories are the ones with at least inferior_limit pages in the whole dataset, as in #measurements.
+        \param k :int (Default = 5): Number of folds.
+        \param inferior_limit :int (Default = 5): Minimum number of pages such that a centroid is computed.
+        \param nPagesRacc :int (Default = None): If not None only this number of random pages of every fold is recommended.
+        \param processes :int (Default = 1): Number of processes recommending the pages (see #measureMany).
+        \param seed :int (Default = 0): Seed of the split in folds and of the choice of the pages, so that the results can be reproduced.
+        \return list = for every fold and then for all of them (fold, pages, seconds, mean(Boolean measure), mean(Fractional measure),
+         mean(Hierarchical measure)); the last tuple has fold "All" and the means over all the pages recommended.
+        """
+        rnd = random.Random(seed)
+        allPages = sorted(self.db.getPages())
+        rnd.shuffle(allPages)
+        folds = [allPages[i::k] for i in range(k)]
+        pageCat = self.db.getAllCategoriesGivenAllPages(inferior_limit)
+        lenCategories = {c:float(n) for c, n in self.db.getCaregoriesNPages(inferior_limit)}
+        start_time = time.time()
+        sums = CentroidSums(self.db.tfidf, pageCat, lenCategories)
+        print("Sums of %d categories computed in %.2fs" % (len(sums), time.time() - start_time))
+        results = []
+        m1, m2, m3 = [], [], []
+        for i, fold in enumerate(folds):
+            start_time = time.time()
+            centroids = sums.without(fold)
+            pages = fold if nPagesRacc is None else rnd.sample(fold, min(nPagesRacc, len(fold)))
+            m1f, m2f, m3f = self.measureMany(pages, centroids, processes = processes)
+            results.append((i + 1, len(pages), time.time() - start_time, np.mean(m1f), np.mean(m2f), np.mean(m3f)))
+            m1 += m1f
+            m2 += m2f
+            m3 += m3f
+        results.append(("All", len(m1), sum(r[2] for r in results), np.mean(m1), np.mean(m2), np.mean(m3)))
+        databaseWiki.printResults(title = "%d-fold cross-validation (%d centroids)" % (k, len(sums)),
+                                  columns = ["Fold", "Pages", "Seconds", "Boolean", "Fractional", "Hierarchical"],
+                                  rows = [(f, n, "%.2f" % t, "%.3f" % a1, "%.3f" % a2, "%.3f" % a3) for f, n, t, a1, a2, a3 in results])
+        return results
+
     def createGraph(self):
         """
         \brief The function reads a pickle file containing the results of a precomputed recommendation and creates a plot.
@@ -394,4 +949,29 @@ class Categorization:
         #sns.lmplot(x = "nPages", y = "Mean",  col = "Type", hue="Type", data = df)
         #sns.scatterplot(x = "nCentroids", y = "Mean", size = "Time", hue = "Type", sizes = (20, 200), data = df)
         #sns.scatterplot(x = "nPages", y = "Mean", size = "Time", hue = "Type", sizes = (20, 200), data = df)
-        plt.show()
\ No newline at end of file
+        plt.show()
+
+
+##type:(Categorization, CentroidMatrix, scipy.sparse.csr_matrix) = categorization, centroids and rows of the pages of the
+##worker processes of Categorization.measureParallel
+evaluationState = None
+
+def initEvaluation(categorization, path):
+    """
+    \brief Initializer of the worker processes of Categorization.measureParallel: it maps the centroids and the rows of the pages.
+    \param categorization :Categorization = categorization of the parent process
+    \param path :str = directory written by Categorization.measureParallel
+    """
+    global evaluationState
+    evaluationState = (categorization, CentroidMatrix.mapped(os.path.join(path, "centroids")),
+                       CentroidMatrix.mapCsr(os.path.join(path, "queries")))
+
+def measureWorker(block):
+    """
+    \brief The function executed by the worker processes of Categorization.measureParallel.
+    \param block :tuple = (names of the pages, row of the first page)
+    \return list = measures of the pages (see Categorization.measureRows)
+    """
+    categorization, centroids, queries = evaluationState
+    pages, start = block
+    return categorization.measureRows(pages, centroids, queries[start:start + len(pages)])
@@ -0,0 +1,135 @@
+import numpy as np
+
+class CategoryGraph:
+    """
+     \author Biasini Mirko s181753, Carmignani Vittorio s181755, Joao Alemao s182312
+     \version 1.0
+     \brief Library to answer the questions about the hierarchy of the categories without querying the database
+     \details The graph is built once from the pairs (father, son) of catsub. Every category has an integer id, and the fathers
+     and the sons of every category are two CSR arrays: the ids of the fathers of the category i are
+     parents[parentOffsets[i]:parentOffsets[i+1]], sorted, and the same for the sons. A father/son check is a binary search in
+     the sons of a category, a brothers check is the intersection of two sorted lists of fathers.
+    """
+
+    def __init__(self, pairs):
+        """
+        \brief Default constructor, it builds the graph.
+        \param pairs :iterable = (father, son) names of the categories, as the rows of catsub
+        """
+        ##type:dict = keys = name of the category, values = id
+        self.ids = dict()
+        fathers, sons = [], []
+        for father, son in pairs:
+            fathers.append(self.ids.setdefault(father, len(self.ids)))
+            sons.append(self.ids.setdefault(son, len(self.ids)))
+        ##type:list = names of the categories, indexed by id
+        self.names = list(self.ids)
+        fathers = np.array(fathers, dtype=np.int32)
+        sons = np.array(sons, dtype=np.int32)
+        parentOffsets, parents = self.adjacency(sons, fathers, len(self.names))
+        childOffsets, children = self.adjacency(fathers, sons, len(self.names))
+        ##type:numpy.array = start of the fathers of every category, and end of the last one
+        self.parentOffsets = parentOffsets
+        ##type:numpy.array = ids of the fathers, sorted for every category
+        self.parents = parents
+        ##type:numpy.array = start of the sons of every category, and end of the last one
+        self.childOffsets = childOffsets
+        ##type:numpy.array = ids of the sons, sorted for every category
+        self.children = children
+
+    @staticmethod
+    def adjacency(sources, targets, n):
+        """
+        \brief The function builds the CSR arrays of the edges source -> target, without duplicates.
+        \param sources :numpy.array = ids of the sources
+        \param targets :numpy.array = ids of the targets
+        \param n :int = number of nodes
+        \return (numpy.array, numpy.array) = (start of the targets of every source and end of the last one, targets sorted)
+        """
+        edges = np.unique(sources.astype(np.int64) * max(n, 1) + targets) if len(sources) > 0 else np.zeros(0, dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(edges // max(n, 1), minlength=n))]).astype(np.int64)
+        return offsets, (edges % max(n, 1)).astype(np.int32)
+
+    def parentIds(self, i):
+        """
+        \brief The function returns the fathers of a category.
+        \param i :int = id of the category
+        \return numpy.array = ids of the fathers, sorted
+        """
+        return self.parents[self.parentOffsets[i]:self.parentOffsets[i + 1]]
+
+    def childIds(self, i):
+        """
+        \brief The function returns the sons of a category.
+        \param i :int = id of the category
+        \return numpy.array = ids of the sons, sorted
+        """
+        return self.children[self.childOffsets[i]:self.childOffsets[i + 1]]
+
+    def isFather(self, father, son):
+        """
+        \brief The function returns True if a category is father of another one.
+        \param father :str = name of the first category
+        \param son :str = name of the second category
+        \return bool = True if (father, son) is in catsub
+        """
+        f, s = self.ids.get(father), self.ids.get(son)
+        if f is None or s is None:
+            return False
+        children = self.childIds(f)
+        position = np.searchsorted(children, s)
+        return bool(position < len(children) and children[position] == s)
+
+    def isFatherSon(self, catR, catS):
+        """
+        \brief The function returns True if one of the categories is father of the other (see databaseWiki.getFatherSon).
+        \param catR :str = name of the first category
+        \param catS :str = name of the second category
+        \return bool = True if catR is father of catS or catS is father of catR
+        """
+        return self.isFather(catR, catS) or self.isFather(catS, catR)
+
+    def brothers(self, catR, catS):
+        """
+        \brief The function returns the categories which are father of both the categories (see databaseWiki.getBrothers).
+        \param catR :str = name of the first category
+        \param catS :str = name of the second category
+        \return list = names of the common fathers, empty if the categories are not brothers
+        """
+        r, s = self.ids.get(catR), self.ids.get(catS)
+        if r is None or s is None:
+            return []
+        return [self.names[i] for i in np.intersect1d(self.parentIds(r), self.parentIds(s), assume_unique=True).tolist()]
+
+    def areBrothers(self, catR, catS):
+        """
+        \brief The function returns True if the categories have a common father.
+        \param catR :str = name of the first category
+        \param catS :str = name of the second category
+        \return bool = True if the categories are brothers
+        """
+        return len(self.brothers(catR, catS)) > 0
+
+    def getParents(self, category):
+        """
+        \brief The function returns the fathers of a category.
+        \param category :str = name of the category
+        \return list = names of the fathers
+        """
+        i = self.ids.get(category)
+        return [] if i is None else [self.names[j] for j in self.parentIds(i).tolist()]
+
+    def getChildren(self, category):
+        """
+        \brief The function returns the sons of a category.
+        \param category :str = name of the category
+        \return list = names of the sons
+        """
+        i = self.ids.get(category)
+        return [] if i is None else [self.names[j] for j in self.childIds(i).tolist()]
+
+    def __contains__(self, category):
+        return category in self.ids
+
+    def __len__(self):
+        return len(self.names)
@@ -0,0 +1,103 @@
+import numpy as np
+import scipy.sparse
+from TfidfMatrix import TfidfMatrix
+from CentroidMatrix import CentroidMatrix
+
+class CategorySums:
+    """
+     \author Biasini Mirko s181753, Carmignani Vittorio s181755, Joao Alemao s182312
+     \version 1.0
+     \brief Library to keep the centroids of the categories as sums of TF, to which the current IDF is applied
+     \details The TF-IDF vector of a page is its TF vector times the IDF of the words, so the centroid of a category (see
+     CentroidMatrix.build) is the sum of the TF vectors of its pages times the IDF, normalised: the number of pages is removed
+     by the normalisation. The sums (categories x words, float64) do not depend on the IDF, so they remain valid when the
+     inverted index changes: only the sums of the categories whose pages have changed are computed again (#update), and the
+     centroids are always computed with the current IDF (#centroids), all with the same one.
+    """
+
+    def __init__(self, sums, categories):
+        """
+        \brief Default constructor.
+        \param sums :scipy.sparse.csr_matrix = sum of the TF vectors of the pages of every category, categories x words
+        \param categories :list = names of the categories, indexed by row, sorted
+        """
+        ##type:scipy.sparse.csr_matrix = sum of the TF vectors of the pages of every category, categories x words (float64)
+        self.sums = sums
+        ##type:list = names of the categories, indexed by row, sorted
+        self.categories = categories
+        ##type:dict = keys = name of the category, values = row
+        self.rows = {c: i for i, c in enumerate(categories)}
+
+    @classmethod
+    def build(cls, tf, pageCat, lenCategories):
+        """
+        \brief The function computes the sums of all the categories with one sparse product.
+        \param tf :TfidfMatrix = TF matrix of the pages (see TfidfMatrix.build with idf=False)
+        \param pageCat :dict = keys: pages values: list of categories, without the pages of the test set
+        \param lenCategories :dict = keys: categories with a centroid values: number of pages of the category
+        \return CategorySums = sums
+        """
+        A, categories = CentroidMatrix.incidence(tf, pageCat, lenCategories)
+        A.data[:] = 1.0
+        return cls((A.astype(np.float64) @ tf.raw().astype(np.float64)).tocsr(), categories)
+
+    def update(self, sums, nTerms):
+        """
+        \brief The function returns the sums with the ones of some categories replaced, added or removed.
+        \param sums :dict = keys: categories values: dict = keys: id of the word values: sum of its TF in the pages of the
+        category, None to remove the category
+        \param nTerms :int = number of words, at least the number of columns of #sums
+        \return CategorySums = sums, categories sorted
+        """
+        nTerms = max(nTerms, self.sums.shape[1])
+        keep = [c for c in self.categories if c not in sums]
+        added = sorted(c for c, s in sums.items() if s is not None)
+        old = self.sums[[self.rows[c] for c in keep]]
+        old = scipy.sparse.csr_matrix((old.data, old.indices, old.indptr), shape=(len(keep), nTerms))
+        rows, columns, data = [], [], []
+        for i, c in enumerate(added):
+            rows.extend([i] * len(sums[c]))
+            columns.extend(sums[c].keys())
+            data.extend(sums[c].values())
+        new = scipy.sparse.csr_matrix((np.asarray(data, dtype=np.float64), (rows, columns)), shape=(len(added), nTerms))
+        categories = keep + added
+        order = sorted(range(len(categories)), key=categories.__getitem__)
+        return CategorySums(scipy.sparse.vstack([old, new]).tocsr()[order], [categories[i] for i in order])
+
+    def centroids(self, idf):
+        """
+        \brief The function computes the centroids with the given IDF.
+        \param idf :numpy.array = IDF of the words, indexed by id (see databaseWiki.getIdfVector)
+        \return CentroidMatrix = centroids, rows normalised, words = the longest of idf and of the columns of #sums
+        """
+        nTerms = max(len(idf), self.sums.shape[1])
+        sums = scipy.sparse.csr_matrix((self.sums.data, self.sums.indices, self.sums.indptr), shape=(len(self.categories), nTerms))
+        weights = np.zeros(nTerms)
+        weights[:len(idf)] = idf
+        matrix = (sums @ scipy.sparse.diags(weights)).tocsr()
+        matrix.eliminate_zeros()
+        return CentroidMatrix(TfidfMatrix.normalize(matrix), list(self.categories))
+
+    def save(self, path):
+        """
+        \brief The function saves the sums and the names of the categories in a .npz file.
+        \param path :str = path of the file
+        """
+        categories, categoryOffsets = TfidfMatrix.encode(self.categories)
+        with open(path, 'wb') as handle:
+            np.savez(handle, data=self.sums.data, indices=self.sums.indices, indptr=self.sums.indptr,
+                     shape=np.array(self.sums.shape), categories=categories, categoryOffsets=categoryOffsets)
+
+    @classmethod
+    def load(cls, path):
+        """
+        \brief The function reads the sums saved by #save.
+        \param path :str = path of the file
+        \return CategorySums = sums
+        """
+        with np.load(path) as f:
+            sums = scipy.sparse.csr_matrix((f["data"], f["indices"], f["indptr"]), shape=tuple(f["shape"]))
+            return cls(sums, TfidfMatrix.decode(f["categories"], f["categoryOffsets"]))
+
+    def __len__(self):
+        return len(self.categories)
@@ -0,0 +1,192 @@
+import numpy as np
+
+class CentroidIndex:
+    """
+     \author Biasini Mirko s181753, Carmignani Vittorio s181755, Joao Alemao s182312
+     \version 1.0
+     \brief Library to find the centroids most similar to a page without scoring all of them
+     \details The index is the transpose of a CentroidMatrix: for every word the postings are the ids of the centroids which
+     contain it (sorted) and their weights. The ids are split in ranges of BLOCK_SIZE centroids, and the postings of a word
+     in a range are a block whose largest weight is kept (block-max). The k best centroids are found with block-max
+     skipping over the ranges: a lower bound of the k-th best score is computed first from a few centroids, then the upper
+     bound of every range is the sum over the words of the page of the weight of the word times its block-max in the range.
+     The ranges are scored in order of decreasing bound, RANGES_PER_ROUND at a time, and the lower bound is raised after
+     every round; the search stops at the first range whose bound is below it, so the postings of the other ranges are never
+     read. The scores of a round are accumulated in an array of the size of the ranges read, so a page costs the blocks of
+     its words, one bound per range (the number of centroids / BLOCK_SIZE) and the postings of the ranges read, instead of
+     one score per centroid. The skipping works when the best centroids of the page stand out in a few ranges; when the
+     weights are spread evenly over all the centroids most ranges are read and the exhaustive product is faster. The scores
+     are the ones of the exhaustive product (CentroidMatrix.top) and the ties are ordered by id.
+    """
+
+    ##Number of words of the page whose best centroids are scored first, to get the initial lower bound of the k-th score
+    SEED_WORDS = 3
+    ##Number of consecutive centroid ids of a range
+    BLOCK_SIZE = 64
+    ##Number of ranges scored before the lower bound of the k-th score is raised
+    RANGES_PER_ROUND = 8
+    ##Relative slack of the comparison between the bound of a range and the k-th score
+    ROUNDING = 1e-9
+
+    def __init__(self, centroids):
+        """
+        \brief Default constructor, it builds the postings and the blocks of the words from the centroids.
+        \param centroids :CentroidMatrix = centroids, rows normalised
+        """
+        columns = centroids.matrix.tocsc()
+        columns.sort_indices()
+        ##type:numpy.array = start of the postings of every word, and end of the last one
+        self.offsets = columns.indptr.astype(np.int64)
+        ##type:numpy.array = ids of the centroids of the postings, sorted for every word
+        self.ids = columns.indices.astype(np.int64)
+        ##type:numpy.array = weights of the postings (float64)
+        self.weights = columns.data.astype(np.float64)
+        ##type:int = number of ranges of centroid ids
+        self.nRanges = max(1, -(-len(centroids.categories) // self.BLOCK_SIZE))
+        #a block starts where the word or the range of the postings changes
+        words = np.repeat(np.arange(len(self.offsets) - 1), np.diff(self.offsets))
+        keys = words * self.nRanges + self.ids // self.BLOCK_SIZE
+        starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]])) if len(keys) > 0 else np.zeros(0, dtype=np.int64)
+        ##type:numpy.array = start of the blocks of every word, and end of the last one
+        self.blockOffsets = np.searchsorted(words[starts], np.arange(len(self.offsets))).astype(np.int64)
+        ##type:numpy.array = range of every block
+        self.blockRanges = self.ids[starts] // self.BLOCK_SIZE
+        ##type:numpy.array = start of every block in the postings, and end of the last one
+        self.blockStarts = np.append(starts, len(self.ids)).astype(np.int64)
+        ##type:numpy.array = largest weight of every block
+        self.blockMax = np.maximum.reduceat(self.weights, starts) if len(starts) > 0 else np.zeros(0)
+        ##type:list = names of the categories, indexed by id
+        self.categories = centroids.categories
+
+    def top(self, terms, values, k):
+        """
+        \brief The function returns the k centroids with the highest cosine similarity with a page.
+        \details If less than k centroids share a word with the page, the list is completed with centroids of score 0, in order of id.
+        \param terms :numpy.array = ids of the words of the page
+        \param values :numpy.array = weights of the words, the vector has length 1 (e.g. a row of TfidfMatrix.matrix)
+        \param k :int = number of centroids
+        \return list = (category, cosine similarity) sorted by decreasing similarity, then by id
+        """
+        k = min(k, len(self.categories))
+        if k <= 0:
+            return []
+        terms = np.asarray(terms, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        keep = (terms < len(self.offsets) - 1) & (values > 0)
+        terms, values = terms[keep], values[keep]
+        keep = self.offsets[terms] < self.offsets[terms + 1]
+        terms, values = terms[keep], values[keep]
+        if len(terms) == 0:
+            return self.complete(np.zeros(0, dtype=np.int64), np.zeros(0), k)
+        #blocks of the words of the page, with the weight of their word
+        counts = self.blockOffsets[terms + 1] - self.blockOffsets[terms]
+        blocks = np.repeat(self.blockOffsets[terms] - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        blockValues = np.repeat(values, counts)
+        bounds = np.bincount(self.blockRanges[blocks], weights=blockValues * self.blockMax[blocks], minlength=self.nRanges)
+        #lower bound of the k-th score: the exact scores of the centroids with the k largest weights of the SEED_WORDS words
+        #with the highest weights in the page
+        seeds = []
+        for t in terms[np.argsort(-values, kind='stable')[:self.SEED_WORDS]]:
+            ids, weights = self.postings(t)
+            seeds.append(ids[np.argpartition(-weights, k - 1)[:k]] if len(ids) > k else ids)
+        candidates = np.unique(np.concatenate(seeds))
+        scores = self.score(candidates, terms, values)
+        threshold = self.kth(scores, k)
+        #ranges by decreasing bound, and the blocks grouped by the rank of their range
+        ranges = np.flatnonzero(bounds > 0)
+        ranges = ranges[np.argsort(-bounds[ranges], kind='stable')]
+        rank = np.zeros(self.nRanges, dtype=np.int64)
+        rank[ranges] = np.arange(len(ranges))
+        blockRanks = rank[self.blockRanges[blocks]]
+        order = np.argsort(blockRanks, kind='stable')
+        blocks, blockValues, blockRanks = blocks[order], blockValues[order], blockRanks[order]
+        first = 0
+        while first < len(ranges):
+            #the bounds are sums in another order than the scores: a rounding must not skip a centroid tied with the k-th one
+            n = int(np.count_nonzero(bounds[ranges[first:first + self.RANGES_PER_ROUND]] >= threshold * (1 - self.ROUNDING)))
+            if n == 0:
+                break
+            start, end = np.searchsorted(blockRanks, [first, first + n])
+            read = blocks[start:end]
+            lengths = self.blockStarts[read + 1] - self.blockStarts[read]
+            positions = np.repeat(self.blockStarts[read] - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+            #the scores of the n ranges read, the centroid i of a range at position (rank - first) * BLOCK_SIZE + i % BLOCK_SIZE
+            local = np.repeat(blockRanks[start:end] - first, lengths) * self.BLOCK_SIZE + self.ids[positions] % self.BLOCK_SIZE
+            read = np.bincount(local, weights=np.repeat(blockValues[start:end], lengths) * self.weights[positions],
+                               minlength=n * self.BLOCK_SIZE)
+            found = np.flatnonzero(read > 0)
+            foundScores = read[found]
+            found = ranges[first + found // self.BLOCK_SIZE] * self.BLOCK_SIZE + found % self.BLOCK_SIZE
+            #a centroid already scored (a seed) has the same exact score
+            new = ~np.isin(found, candidates)
+            candidates = np.concatenate([candidates, found[new]])
+            scores = np.concatenate([scores, foundScores[new]])
+            threshold = max(threshold, self.kth(scores, k))
+            keep = scores >= threshold
+            candidates, scores = candidates[keep], scores[keep]
+            first += n
+        return self.complete(candidates, scores, k)
+
+    @staticmethod
+    def kth(scores, k):
+        """
+        \brief The function returns the k-th highest score, a lower bound of the k-th score of the k best centroids.
+        \param scores :numpy.array = exact scores of some centroids
+        \param k :int = number of centroids
+        \return float = k-th highest score, 0 if there are less than k scores
+        """
+        return float(np.partition(scores, len(scores) - k)[len(scores) - k]) if len(scores) >= k else 0.0
+
+    def postings(self, t):
+        """
+        \brief The function returns the postings of a word.
+        \param t :int = id of the word
+        \return (numpy.array, numpy.array) = (ids of the centroids, sorted, weights)
+        """
+        return self.ids[self.offsets[t]:self.offsets[t + 1]], self.weights[self.offsets[t]:self.offsets[t + 1]]
+
+    def lookup(self, t, candidates):
+        """
+        \brief The function returns the weights of a word in some centroids, with a binary search in its postings.
+        \param t :int = id of the word
+        \param candidates :numpy.array = ids of the centroids, sorted
+        \return numpy.array = weights (0 where the centroid does not contain the word)
+        """
+        ids, weights = self.postings(t)
+        positions = np.minimum(np.searchsorted(ids, candidates), len(ids) - 1)
+        return np.where(ids[positions] == candidates, weights[positions], 0.0)
+
+    def score(self, candidates, terms, values):
+        """
+        \brief The function computes the exact cosine similarity between a page and some centroids.
+        \param candidates :numpy.array = ids of the centroids, sorted
+        \param terms :numpy.array = ids of the words of the page
+        \param values :numpy.array = weights of the words of the page
+        \return numpy.array = scores of the centroids
+        """
+        scores = np.zeros(len(candidates))
+        for t, q in zip(terms, values):
+            scores += q * self.lookup(t, candidates)
+        return scores
+
+    def complete(self, candidates, scores, k):
+        """
+        \brief The function chooses the k best centroids among the ones scored, completing them with centroids of score 0.
+        \param candidates :numpy.array = ids of the centroids scored
+        \param scores :numpy.array = their scores
+        \param k :int = number of centroids
+        \return list = (category, cosine similarity) sorted by decreasing similarity, then by id
+        """
+        order = np.lexsort((candidates, -scores))[:k]
+        result = [(self.categories[d], s) for d, s in zip(candidates[order].tolist(), scores[order].tolist())]
+        if len(result) < k:
+            seen = set(candidates.tolist())
+            for d in range(len(self.categories)):
+                if len(result) == k:
+                    break
+                if d not in seen:
+                    result.append((self.categories[d], 0.0))
+        return result
+
+    def __len__(self):
+        return len(self.categories)
@@ -0,0 +1,355 @@
+import os
+import numpy as np
+import scipy.sparse
+from TfidfMatrix import TfidfMatrix
+from CsrIndex import CsrIndex
+
+class CentroidMatrix:
+    """
+     \author Biasini Mirko s181753, Carmignani Vittorio s181755, Joao Alemao s182312
+     \version 1.0
+     \brief Library to compute the centroids of the categories with sparse matrix products
+     \details The centroid of a category is the mean of the TF-IDF vectors of its pages. All the centroids are computed at
+     once as A * X, where X is the TF-IDF matrix (pages x words, see TfidfMatrix.raw) and A is the incidence matrix
+     categories x pages, whose element (c, p) is 1 / number of pages of c if the page p belongs to c. The result is kept as
+     a scipy.sparse CSR matrix of float32 with the rows normalised to length 1, so the cosine similarity between a page and
+     all the centroids is one product.
+    """
+
+    def __init__(self, matrix, categories):
+        """
+        \brief Default constructor.
+        \param matrix :scipy.sparse.csr_matrix = centroids, categories x words, rows normalised
+        \param categories :list = names of the categories, indexed by row
+        """
+        ##type:scipy.sparse.csr_matrix = centroids, categories x words, rows normalised
+        self.matrix = matrix
+        ##type:list = names of the categories, indexed by row
+        self.categories = categories
+        ##type:dict = keys = name of the category, values = row
+        self.rows = {c: i for i, c in enumerate(categories)}
+        ##type:scipy.sparse.csr_matrix = transpose of #matrix (words x categories), computed by #columns the first time it is needed
+        self.transposed = None
+
+    def columns(self):
+        """
+        \brief The function returns the transpose of the centroids, used to score the pages (see #top).
+        \return scipy.sparse.csr_matrix = words x categories
+        """
+        if self.transposed is None:
+            self.transposed = self.matrix.T.tocsr()
+        return self.transposed
+
+    @staticmethod
+    def incidence(tfidf, pageCat, lenCategories):
+        """
+        \brief The function builds the incidence matrix categories x pages, weighted by 1 / number of pages of the category.
+        \param tfidf :TfidfMatrix = TF-IDF matrix, whose rows are the columns of the incidence matrix
+        \param pageCat :dict = keys: pages values: list of categories (see databaseWiki.getAllCategoriesGivenAllPages)
+        \param lenCategories :dict = keys: categories with a centroid values: number of pages of the category
+        \return (scipy.sparse.csr_matrix, list) = (incidence matrix, names of the categories indexed by row)
+        """
+        categories = sorted(lenCategories)
+        ids = {c: i for i, c in enumerate(categories)}
+        rows, columns, data = [], [], []
+        for page, cats in pageCat.items():
+            j = tfidf.rows.get(page)
+            if j is None:
+                continue
+            for cat in cats:
+                i = ids.get(cat)
+                if i is not None:
+                    rows.append(i)
+                    columns.append(j)
+                    data.append(1.0 / lenCategories[cat])
+        A = scipy.sparse.csr_matrix((np.asarray(data, dtype=np.float32), (rows, columns)),
+                                    shape=(len(categories), len(tfidf)), dtype=np.float32)
+        return A, categories
+
+    @classmethod
+    def build(cls, tfidf, pageCat, lenCategories):
+        """
+        \brief The function computes the centroids of the categories with one sparse product.
+        \param tfidf :TfidfMatrix = TF-IDF matrix of the pages
+        \param pageCat :dict = keys: pages values: list of categories, without the pages of the test set
+        \param lenCategories :dict = keys: categories with a centroid values: number of pages of the category
+        \return CentroidMatrix = centroids
+        """
+        A, categories = cls.incidence(tfidf, pageCat, lenCategories)
+        return cls(TfidfMatrix.normalize(A @ tfidf.raw()), categories)
+
+    @classmethod
+    def fromDict(cls, centroids, nTerms):
+        """
+        \brief The function converts the centroids returned by Categorization.getAllCentroids (or read from "centroids.pickle").
+        \param centroids :dict = keys: categories values: dict = keys: id of the word values: weight
+        \param nTerms :int = number of columns (words), at least the largest id + 1
+        \return CentroidMatrix = centroids, rows normalised
+        """
+        categories = sorted(centroids)
+        rows, columns, data = [], [], []
+        for i, c in enumerate(categories):
+            rows.extend([i] * len(centroids[c]))
+            columns.extend(centroids[c].keys())
+            data.extend(centroids[c].values())
+        nTerms = max([nTerms] + [j + 1 for j in columns])
+        matrix = scipy.sparse.csr_matrix((np.asarray(data, dtype=np.float32), (rows, columns)),
+                                         shape=(len(categories), nTerms), dtype=np.float32)
+        return cls(TfidfMatrix.normalize(matrix), categories)
+
+    def select(self, categories):
+        """
+        \brief The function returns the centroids of some of the categories, without copying the others.
+        \param categories :iterable = names of the categories to be kept (the ones without a centroid are ignored)
+        \return CentroidMatrix = centroids of the categories, in the order of this matrix
+        """
+        keep = sorted(self.rows[c] for c in set(categories) if c in self.rows)
+        return CentroidMatrix(self.matrix[keep], [self.categories[i] for i in keep])
+
+    def top(self, queries, k, batchSize = 256):
+        """
+        \brief The function scores many pages against all the centroids and returns the k best categories of each page.
+        \details The rows of the queries and of the centroids have length 1, so the cosine similarities of a batch are one sparse
+        product. The k best scores of every row are chosen with a partial selection (numpy.argpartition) and only they are sorted.
+        The queries are processed batchSize rows at a time, so the dense block of scores is batchSize x categories.
+        \param queries :scipy.sparse.csr_matrix = pages x words, rows normalised (e.g. rows of TfidfMatrix.matrix)
+        \param k :int or list = number of categories to be returned, for all the pages or for each page
+        \param batchSize :int (default=256) = number of pages scored by every product
+        \return list = for every page the list of (category, cosine similarity) sorted by decreasing similarity
+        """
+        n = queries.shape[0]
+        ks = [k] * n if isinstance(k, int) else list(k)
+        queries = self.resizeQueries(queries)
+        result = []
+        for start in range(0, n, batchSize):
+            result.extend(self.best((queries[start:start + batchSize] @ self.columns()).toarray(), ks[start:start + batchSize]))
+        return result
+
+    def resizeQueries(self, queries):
+        """
+        \brief The function gives the queries the columns of the centroids.
+        \param queries :scipy.sparse.csr_matrix = pages x words
+        \return scipy.sparse.csr_matrix = the queries, with the words added to the vocabulary after the centroids dropped
+        (they have weight 0 in every centroid) or the missing words added
+        """
+        if queries.shape[1] != self.matrix.shape[1]:
+            queries = scipy.sparse.csr_matrix(queries, copy=True)
+            queries.resize((queries.shape[0], self.matrix.shape[1]))
+        return queries
+
+    def scores(self, queries, batchSize = 256):
+        """
+        \brief The function returns the cosine similarities of many pages with all the centroids (see #top).
+        \param queries :scipy.sparse.csr_matrix = pages x words, rows normalised
+        \param batchSize :int (default=256) = number of pages scored by every product
+        \return numpy.array = pages x categories (float32)
+        """
+        queries = self.resizeQueries(queries)
+        result = np.zeros((queries.shape[0], len(self)), dtype=np.float32)
+        for start in range(0, queries.shape[0], batchSize):
+            result[start:start + batchSize] = (queries[start:start + batchSize] @ self.columns()).toarray()
+        return result
+
+    def best(self, scores, ks):
+        """
+        \brief The function chooses the k best categories of every row of a block of scores.
+        \details The k best scores of every row are chosen with a partial selection (numpy.argpartition) and only they are sorted.
+        The ties are broken by the id of the category, as in CentroidIndex.complete: the rows whose k-th score is shared with a
+        category left out by the partial selection are chosen again among all the categories with that score or a higher one.
+        A category whose score is -inf is never chosen, as long as k is at most the number of the other categories.
+        \param scores :numpy.array = pages x categories
+        \param ks :list = number of categories to be returned for each page
+        \return list = for every page the list of (category, cosine similarity) sorted by decreasing similarity
+        """
+        kmax = min(max(list(ks) + [0]), len(self))
+        if kmax == 0:
+            return [[] for _ in range(scores.shape[0])]
+        if kmax < len(self):
+            best = np.argpartition(-scores, kmax - 1, axis=1)[:, :kmax]
+        else:
+            best = np.tile(np.arange(len(self)), (scores.shape[0], 1))
+        bestScores = np.take_along_axis(scores, best, axis=1)
+        if kmax < len(self):
+            bound = bestScores.min(axis=1)
+            for r in np.flatnonzero((scores >= bound[:, None]).sum(axis=1) > kmax).tolist():
+                tied = np.flatnonzero(scores[r] >= bound[r])
+                best[r] = tied[np.lexsort((tied, -scores[r, tied]))[:kmax]]
+                bestScores[r] = scores[r, best[r]]
+        order = np.lexsort((best, -bestScores), axis=1)
+        best = np.take_along_axis(best, order, axis=1)
+        bestScores = np.take_along_axis(bestScores, order, axis=1)
+        result = []
+        for r in range(scores.shape[0]):
+            kr = min(ks[r], len(self))
+            result.append([(self.categories[j], s) for j, s in zip(best[r, :kr].tolist(), bestScores[r, :kr].tolist())])
+        return result
+
+    def toDict(self):
+        """
+        \brief The function returns the centroids as the dictionary used by Categorization.recommendCategory.
+        \return dict = keys: categories values: dict = keys: id of the word values: weight
+        """
+        M = self.matrix
+        return {c: dict(zip(M.indices[M.indptr[i]:M.indptr[i + 1]].tolist(), M.data[M.indptr[i]:M.indptr[i + 1]].tolist()))
+                for i, c in enumerate(self.categories)}
+
+    def compress(self, topN = None, mass = None):
+        """
+        \brief The function truncates every centroid to its heaviest words and normalises it again.
+        \details The words of a row are sorted by decreasing weight. With topN only the first topN are kept, with mass the
+        first words whose squared weights sum to at least mass (the rows have length 1, so mass is the share of the length
+        kept). If both are given a word must satisfy both.
+        \param topN :int (default=None) = maximum number of words of a centroid, if None it is not used
+        \param mass :float (default=None) = share (0-1] of the squared length kept, if None it is not used
+        \return CentroidMatrix = centroids compressed
+        """
+        M = self.matrix
+        rows = np.repeat(np.arange(M.shape[0]), np.diff(M.indptr))
+        order = np.lexsort((-M.data, rows))
+        rank = np.arange(len(order)) - M.indptr[rows[order]]
+        keep = np.ones(len(order), dtype=bool)
+        if topN is not None:
+            keep &= rank < topN
+        if mass is not None:
+            squares = M.data[order].astype(np.float64) ** 2
+            cumulative = np.cumsum(squares)
+            before = cumulative - squares - np.concatenate([[0.0], cumulative])[M.indptr[rows[order]]]
+            keep &= before < mass
+        kept = np.sort(order[keep])
+        matrix = scipy.sparse.csr_matrix((M.data[kept], M.indices[kept], np.concatenate([[0], np.cumsum(np.bincount(rows[kept], minlength=M.shape[0]))])),
+                                         shape=M.shape)
+        return CentroidMatrix(TfidfMatrix.normalize(matrix), self.categories)
+
+    @staticmethod
+    def encodeWeights(matrix, precision):
+        """
+        \brief The function converts the weights of a matrix to a reduced precision.
+        \param matrix :scipy.sparse.csr_matrix = matrix, float32
+        \param precision :str = "float32", "float16" or "uint8" (linear quantisation of every row between 0 and its largest weight)
+        \return (numpy.array, numpy.array) = (weights, scale of every row, None if precision is not "uint8")
+        """
+        if precision == "float32":
+            return matrix.data, None
+        if precision == "float16":
+            return matrix.data.astype(np.float16), None
+        if precision == "uint8":
+            rows = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+            scales = np.zeros(matrix.shape[0], dtype=np.float32)
+            nonEmpty = np.diff(matrix.indptr) > 0
+            if len(matrix.data) > 0:
+                scales[nonEmpty] = np.maximum.reduceat(matrix.data, matrix.indptr[:-1][nonEmpty]) / 255.0
+            scales[scales == 0] = 1.0
+            return np.rint(matrix.data / scales[rows]).astype(np.uint8), scales
+        raise ValueError("Unknown precision %s" % precision)
+
+    @staticmethod
+    def decodeWeights(weights, scales, indptr):
+        """
+        \brief The function converts the weights written by #encodeWeights back to float32.
+        \param weights :numpy.array = weights
+        \param scales :numpy.array = scale of every row, None if the weights are not quantised
+        \param indptr :numpy.array = start of every row, and end of the last one
+        \return numpy.array = weights, float32
+        """
+        if scales is None:
+            return weights.astype(np.float32)
+        return weights.astype(np.float32) * np.repeat(scales, np.diff(indptr))
+
+    def quantize(self, precision):
+        """
+        \brief The function returns the centroids with the weights rounded as they are stored with the given precision.
+        \param precision :str = "float32", "float16" or "uint8" (see #encodeWeights)
+        \return CentroidMatrix = centroids, float32
+        """
+        weights, scales = self.encodeWeights(self.matrix, precision)
+        data = self.decodeWeights(weights, scales, self.matrix.indptr)
+        return CentroidMatrix(scipy.sparse.csr_matrix((data, self.matrix.indices, self.matrix.indptr), shape=self.matrix.shape), self.categories)
+
+    def nbytes(self, precision = "float32"):
+        """
+        \brief The function returns the memory used by the centroids stored with the given precision.
+        \param precision :str (default="float32") = "float32", "float16" or "uint8" (see #encodeWeights)
+        \return int = bytes of the weights, of the word ids and of the offsets of the rows
+        """
+        weights, scales = self.encodeWeights(self.matrix, precision)
+        return weights.nbytes + (0 if scales is None else scales.nbytes) + self.matrix.indices.nbytes + self.matrix.indptr.nbytes
+
+    def save(self, path, precision = "float32"):
+        """
+        \brief The function saves the centroids and the names of the categories in a .npz file.
+        \param path :str = path of the file
+        \param precision :str (default="float32") = precision of the weights: "float32", "float16" or "uint8" (see #encodeWeights)
+        """
+        categories, categoryOffsets = TfidfMatrix.encode(self.categories)
+        weights, scales = self.encodeWeights(self.matrix, precision)
+        arrays = dict(data=weights, indices=self.matrix.indices, indptr=self.matrix.indptr, shape=np.array(self.matrix.shape),
+                      categories=categories, categoryOffsets=categoryOffsets)
+        if scales is not None:
+            arrays["scales"] = scales
+        with open(path, 'wb') as handle:
+            np.savez(handle, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """
+        \brief The function reads the centroids saved by #save. The weights are converted to float32.
+        \param path :str = path of the file
+        \return CentroidMatrix = centroids
+        """
+        with np.load(path) as f:
+            scales = f["scales"] if "scales" in f.files else None
+            data = cls.decodeWeights(f["data"], scales, f["indptr"])
+            matrix = scipy.sparse.csr_matrix((data, f["indices"], f["indptr"]), shape=tuple(f["shape"]))
+            return cls(matrix, TfidfMatrix.decode(f["categories"], f["categoryOffsets"]))
+
+    @staticmethod
+    def dumpCsr(matrix, path):
+        """
+        \brief The function writes the arrays of a sparse matrix as raw files, which can be memory-mapped by #mapCsr.
+        \param matrix :scipy.sparse.csr_matrix = matrix
+        \param path :str = directory of the files, created if it does not exist
+        """
+        os.makedirs(path, exist_ok=True)
+        np.asarray(matrix.data, dtype=np.float32).tofile(os.path.join(path, "data.bin"))
+        np.asarray(matrix.indices, dtype=np.int32).tofile(os.path.join(path, "indices.bin"))
+        np.asarray(matrix.indptr, dtype=np.int64).tofile(os.path.join(path, "indptr.bin"))
+        np.array(matrix.shape, dtype=np.int64).tofile(os.path.join(path, "shape.bin"))
+
+    @staticmethod
+    def mapCsr(path):
+        """
+        \brief The function maps read-only a sparse matrix written by #dumpCsr: the processes which map it share its pages.
+        \param path :str = directory of the files
+        \return scipy.sparse.csr_matrix = matrix, whose arrays are numpy.memmap
+        """
+        shape = tuple(np.fromfile(os.path.join(path, "shape.bin"), dtype=np.int64).tolist())
+        arrays = [CsrIndex.mapArray(os.path.join(path, name + ".bin"), dtype)
+                  for name, dtype in (("data", np.float32), ("indices", np.int32), ("indptr", np.int64))]
+        return scipy.sparse.csr_matrix(tuple(arrays), shape=shape, copy=False)
+
+    def dump(self, path):
+        """
+        \brief The function writes the centroids, their transpose and the names of the categories as raw files (see #mapped).
+        \param path :str = directory of the files, created if it does not exist
+        """
+        self.dumpCsr(self.matrix, os.path.join(path, "rows"))
+        self.dumpCsr(self.columns(), os.path.join(path, "columns"))
+        categories, categoryOffsets = TfidfMatrix.encode(self.categories)
+        categories.tofile(os.path.join(path, "categories.bin"))
+        categoryOffsets.tofile(os.path.join(path, "categoryOffsets.bin"))
+
+    @classmethod
+    def mapped(cls, path):
+        """
+        \brief The function maps read-only the centroids written by #dump, e.g. by the worker processes of an evaluation.
+        \param path :str = directory of the files
+        \return CentroidMatrix = centroids, whose matrices are memory-mapped
+        """
+        categories = TfidfMatrix.decode(np.fromfile(os.path.join(path, "categories.bin"), dtype=np.uint8),
+                                        np.fromfile(os.path.join(path, "categoryOffsets.bin"), dtype=np.int64))
+        centroids = cls(cls.mapCsr(os.path.join(path, "rows")), categories)
+        centroids.transposed = cls.mapCsr(os.path.join(path, "columns"))
+        return centroids
+
+    def __len__(self):
+        return self.matrix.shape[0]
@@ -0,0 +1,60 @@
+import numpy as np
+import scipy.sparse
+from TfidfMatrix import TfidfMatrix
+from CentroidMatrix import CentroidMatrix
+
+class CentroidSums:
+    """
+     \author Biasini Mirko s181753, Carmignani Vittorio s181755, Joao Alemao s182312
+     \version 1.0
+     \brief Library to compute the centroids of the categories without some pages, without computing them again
+     \details The sum of the TF-IDF vectors of the pages of every category (S = B * X, where B is the incidence matrix categories
+     x pages with elements 1, and X the TF-IDF matrix, see TfidfMatrix.raw) and the number of its pages are computed once, in
+     float64. The centroids without a set of held-out pages (e.g. a fold of a cross-validation) are S - B[:, H] * X[H, :],
+     normalised: the work depends on the held-out pages and on the size of the centroids, not on all the pages. The centroids
+     are the ones of CentroidMatrix.build without the held-out pages.
+    """
+
+    ##Entries of the sums whose absolute value is below this after a subtraction are the rounding of a word of the held-out pages only
+    TOLERANCE = 1e-10
+
+    def __init__(self, tfidf, pageCat, lenCategories):
+        """
+        \brief Default constructor, it computes the sums and the numbers of pages of the categories.
+        \param tfidf :TfidfMatrix = TF-IDF matrix of the pages
+        \param pageCat :dict = keys: pages values: list of categories (see databaseWiki.getAllCategoriesGivenAllPages)
+        \param lenCategories :dict = keys: categories with a centroid values: number of pages of the category
+        """
+        A, categories = CentroidMatrix.incidence(tfidf, pageCat, lenCategories)
+        A.data[:] = 1.0
+        ##type:TfidfMatrix = TF-IDF matrix of the pages
+        self.tfidf = tfidf
+        ##type:list = names of the categories, indexed by row
+        self.categories = categories
+        ##type:scipy.sparse.csc_matrix = incidence matrix categories x pages (elements 1), by column
+        self.incidence = A.astype(np.float64).tocsc()
+        ##type:scipy.sparse.csr_matrix = TF-IDF weights of the pages, pages x words (float64)
+        self.raw = tfidf.raw().astype(np.float64)
+        ##type:scipy.sparse.csr_matrix = sum of the TF-IDF vectors of the pages of every category, categories x words
+        self.sums = (A.astype(np.float64) @ self.raw).tocsr()
+        ##type:numpy.array = number of pages of every category
+        self.counts = np.asarray(A.sum(axis=1)).ravel().astype(np.int64)
+
+    def without(self, pages):
+        """
+        \brief The function returns the centroids of the categories without some pages.
+        \details The categories left without pages get an empty centroid, whose similarity with every page is 0.
+        \param pages :list = titles of the held-out pages (the ones which are not in the TF-IDF matrix are ignored)
+        \return CentroidMatrix = centroids, rows normalised
+        """
+        rows = sorted(set(self.tfidf.rows[p] for p in pages if p in self.tfidf.rows))
+        held = self.incidence[:, rows]
+        sums = (self.sums - held @ self.raw[rows]).tocsr()
+        counts = self.counts - np.asarray(held.sum(axis=1)).ravel().astype(np.int64)
+        sums = scipy.sparse.diags((counts > 0).astype(np.float64)) @ sums
+        sums.data[np.abs(sums.data) < self.TOLERANCE] = 0.0
+        sums.eliminate_zeros()
+        return CentroidMatrix(TfidfMatrix.normalize(sums.tocsr()), self.categories)
+
+    def __len__(self):
+        return len(self.categories)
@@ -0,0 +1,58 @@
+import os
+import sqlite3
+import threading
+from urllib.request import pathname2url
+
+class ConnectionPool:
+    """
+     \author Biasini Mirko s181753, Carmignani Vittorio s181755, Joao Alemao s182312
+     \version 1.0
+     \brief Library to read the database from many threads and processes
+     \details The class opens one read-only connection (URI with mode=ro) for every thread which asks for it. A connection
+     opened by a process is never used by the processes forked from it: the pool keeps the id of the process which opened
+     each connection, so after a fork the child opens its own. The writes are not done through the pool, but through a
+     single writer connection (databaseWiki.db).
+    """
+
+    def __init__(self, path, timeout = 30.0):
+        """
+        \brief Default constructor, the connections are opened only when they are requested.
+        \param path :str = path of the database file
+        \param timeout :float (default=30.0) = seconds a reader waits while the database is locked by the writer
+        """
+        ##type:str = URI of the database file, read-only
+        self.uri = "file:%s?mode=ro" % pathname2url(os.path.abspath(path))
+        ##type:float = seconds a reader waits while the database is locked
+        self.timeout = timeout
+        ##type:threading.local = connection of the current thread and id of the process which opened it
+        self.local = threading.local()
+        ##type:list = connections opened by this process, closed by #close
+        self.connections = []
+        ##type:threading.Lock = lock of #connections
+        self.lock = threading.Lock()
+
+    def connection(self):
+        """
+        \brief The function returns the read-only connection of the current thread, opening it the first time.
+        \return sqlite3.Connection = connection which can be used only by the current thread
+        """
+        if getattr(self.local, "pid", None) != os.getpid():
+            self.local.connection = sqlite3.connect(self.uri, uri=True, timeout=self.timeout, check_same_thread=False)
+            self.local.pid = os.getpid()
+            with self.lock:
+                if len(self.connections) > 0 and self.connections[0][0] != os.getpid():
+                    self.connections = []
+                self.connections.append((os.getpid(), self.local.connection))
+        return self.local.connection
+
+    def close(self):
+        """
+        \brief The function closes all the connections opened by the threads of the current process.
+        \details A thread which uses the pool after #close opens a new connection.
+        """
+        with self.lock:
+            for pid, connection in self.connections:
+                if pid == os.getpid():
+                    connection.close()
+            self.connections = []
+        self.local = threading.local()
@@ -0,0 +1,491 @@
+import os
+import math
+import pickle
+import shutil
+from array import array
+import numpy as np
+from collections.abc import Mapping
+
+class CsrIndex(Mapping):
+    """
+     \author Biasini Mirko s181753, Carmignani Vittorio s181755, Joao Alemao s182312
+     \version 1.0
+     \brief Library to read the inverted index from memory-mapped arrays
+     \details The inverted index is saved in compressed sparse row format: for every word (row) the postings are the slice
+     offsets[i]:offsets[i+1] of the arrays docs (int32 ids of the documents, sorted) and tfs (float32). The words and the
+     titles of the documents are saved as utf-8 blobs with their offsets, and a sorted permutation is used to find them
+     with a binary search. All the arrays are memory-mapped, so opening the index does not read it and many processes share
+     one copy through the page cache. The class can be used like the dict it replaces: keys = word,
+     values = (IDF, postings), where the postings are a mapping document title -> TF (see CsrPostings).
+     The documents added, changed or deleted after the index has been written are appended as delta segments (see
+     #appendDelta), small pickle files in the same directory, and merged with the arrays when the postings are read: the
+     postings of a changed document are hidden and its new ones are read from the delta. The delta keeps the number of
+     documents (see #documentCount) and, for the words of the changed documents only, the number of documents containing
+     them; with a delta the IDF of a word is computed from them when it is read, so the arrays do not depend on the number
+     of documents.
+    """
+
+    ##Name of a delta segment, formatted with its number
+    DELTA_NAME = "delta_%06d.pickle"
+
+    ##Files of the index: name -> dtype
+    FILES = {"terms": np.uint8, "termOffsets": np.int64, "termOrder": np.int32, "idf": np.float64,
+             "offsets": np.int64, "docs": np.int32, "tfs": np.float32,
+             "titles": np.uint8, "titleOffsets": np.int64, "titleOrder": np.int32}
+
+    def __init__(self, path):
+        """
+        \brief Default constructor, it maps the arrays saved by #write.
+        \param path :str = directory of the index
+        """
+        ##type:str = directory of the index
+        self.path = path
+        for name, dtype in self.FILES.items():
+            setattr(self, name, self.mapArray(os.path.join(path, name + ".bin"), dtype))
+        ##type:list = words decoded, filled by #termList
+        self.termCache = None
+        ##type:list = titles decoded, filled by #titleList
+        self.titleCache = None
+        ##type:int = number of documents of the last delta segment, None if there is no delta (the IDF is read from #idf)
+        self.nDocs = None
+        ##type:dict = keys = title of a document changed after the index was written, values = its freqDist (None if deleted)
+        self.deltaDocs = dict()
+        ##type:dict = keys = word of the changed documents, values = dict = keys = title of a changed document, value = TF
+        self.deltaPostings = dict()
+        ##type:dict = keys = word whose number of documents has changed, values = number of documents containing it
+        self.deltaDf = dict()
+        ##type:numpy.array = ids of the documents of the arrays changed or deleted, whose postings are hidden, sorted
+        self.hidden = np.zeros(0, dtype=np.int32)
+        ##type:list = words of the delta which are not in the arrays, after them in #termList
+        self.newTerms = []
+        ##type:dict = keys = word of #newTerms, values = its position in #newTerms
+        self.newTermIds = dict()
+        ##type:(numpy.array, numpy.array) = (positions in #termList of the words of #deltaDf, sorted, their numbers of documents)
+        self.changedDf = (np.zeros(0, dtype=np.int64), np.zeros(0))
+        ##type:int = number of documents of #deltaDocs which contain at least one word
+        self.deltaLive = 0
+        ##type:int = number of delta segments
+        self.segments = 0
+        for name in sorted(f for f in os.listdir(path) if f.startswith("delta_") and f.endswith(".pickle")):
+            with open(os.path.join(path, name), 'rb') as handle:
+                self.mergeDelta(*pickle.load(handle))
+            self.segments += 1
+
+    @staticmethod
+    def mapArray(name, dtype):
+        """
+        \brief The function maps a file read-only as a one-dimensional array.
+        \param name :str = path of the file
+        \param dtype :numpy.dtype = type of the elements
+        \return numpy.memmap = array (an empty array if the file is empty)
+        """
+        if os.path.getsize(name) == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(name, dtype=dtype, mode='r')
+
+    @staticmethod
+    def exists(path):
+        """
+        \brief The function returns True if a complete index has been written in path.
+        \param path :str = directory of the index
+        \return bool = True if all the files of the index exist
+        """
+        return all(os.path.exists(os.path.join(path, name + ".bin")) for name in CsrIndex.FILES)
+
+    @classmethod
+    def write(cls, path, records):
+        """
+        \brief The function writes an inverted index in path, replacing the one already there.
+        \details The records are read one at a time and their postings are appended to the files, so only the words, the
+        titles and the postings of one word (as compact arrays, 8 bytes per posting) are kept in memory. The index is written
+        in a temporary directory which is then renamed.
+        \param path :str = directory of the index
+        \param records :iterator = tuples (word, IDF, iterable of (document title, TF)), e.g. SpimiIndex.merge
+        \return int = number of words written
+        """
+        tmp = path.rstrip("/\\") + ".tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        handles = {name: open(os.path.join(tmp, name + ".bin"), 'wb') for name in cls.FILES}
+        words, idfs, titles = [], [], dict()
+        termOffset, offset = 0, 0
+        handles["termOffsets"].write(np.zeros(1, dtype=np.int64).tobytes())
+        handles["offsets"].write(np.zeros(1, dtype=np.int64).tobytes())
+        for word, idf, postings in records:
+            encoded = word.encode('utf-8')
+            handles["terms"].write(encoded)
+            termOffset += len(encoded)
+            handles["termOffsets"].write(np.array([termOffset], dtype=np.int64).tobytes())
+            words.append(encoded)
+            idfs.append(idf)
+            docs, tfs = array('i'), array('f')
+            for title, tf in postings:
+                try:
+                    docs.append(titles[title])
+                except KeyError:
+                    titles[title] = len(titles)
+                    docs.append(titles[title])
+                tfs.append(tf)
+            docs = np.frombuffer(docs, dtype=np.int32) if len(docs) > 0 else np.zeros(0, dtype=np.int32)
+            order = np.argsort(docs, kind='stable')
+            handles["docs"].write(docs[order].tobytes())
+            handles["tfs"].write((np.frombuffer(tfs, dtype=np.float32) if len(tfs) > 0 else np.zeros(0, dtype=np.float32))[order].tobytes())
+            offset += len(docs)
+            handles["offsets"].write(np.array([offset], dtype=np.int64).tobytes())
+        handles["idf"].write(np.array(idfs, dtype=np.float64).tobytes())
+        handles["termOrder"].write(np.array(sorted(range(len(words)), key=words.__getitem__), dtype=np.int32).tobytes())
+        encoded = [t.encode('utf-8') for t in titles]
+        handles["titles"].write(b"".join(encoded))
+        handles["titleOffsets"].write(np.cumsum([0] + [len(t) for t in encoded], dtype=np.int64).tobytes())
+        handles["titleOrder"].write(np.array(sorted(range(len(encoded)), key=encoded.__getitem__), dtype=np.int32).tobytes())
+        for handle in handles.values():
+            handle.close()
+        shutil.rmtree(path, ignore_errors=True)
+        os.rename(tmp, path)
+        return len(words)
+
+    def appendDelta(self, docs, df):
+        """
+        \brief The function appends a delta segment to the index and merges it with the delta already read.
+        \details The arrays are not modified, so the time depends only on the size of the segment. The number of documents
+        after the changes is computed from the index (see #documentCount) and saved in the segment, which is written in a
+        temporary file and then renamed.
+        \param docs :dict = keys: title of a document added, changed or deleted values: its new freqDist, None if it has been deleted
+        \param df :dict = keys: words whose number of documents has changed values: number of documents containing them
+        """
+        self.mergeDelta(None, docs, df)
+        name = os.path.join(self.path, self.DELTA_NAME % self.segments)
+        with open(name + ".tmp", 'wb') as handle:
+            pickle.dump((self.nDocs, docs, df), handle, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(name + ".tmp", name)
+        self.segments += 1
+
+    def mergeDelta(self, nDocs, docs, df):
+        """
+        \brief The function merges a delta segment with the delta read so far (see #appendDelta).
+        \param nDocs :int = number of documents after the changes, None to compute it (see #documentCount)
+        \param docs :dict = keys: title of a document values: its new freqDist, None if it has been deleted
+        \param df :dict = keys: words values: number of documents containing them
+        """
+        for title, freqDist in docs.items():
+            self.deltaLive += bool(freqDist) - bool(self.deltaDocs.get(title))
+            for word in self.deltaDocs.get(title) or ():
+                self.deltaPostings[word].pop(title, None)
+            self.deltaDocs[title] = freqDist
+            if freqDist:
+                tot_lenght = float(sum(freqDist.values()))
+                for word, tf in freqDist.items():
+                    self.deltaPostings.setdefault(word, dict())[title] = tf / tot_lenght
+        ids = [i for i in (self.docId(title) for title in docs) if i >= 0]
+        self.hidden = np.union1d(self.hidden, np.array(ids, dtype=np.int32)).astype(np.int32)
+        self.nDocs = self.documentCount() if nDocs is None else nDocs
+        for word, n in df.items():
+            if word not in self.deltaDf and self.termId(word) < 0:
+                self.newTermIds[word] = len(self.newTerms)
+                self.newTerms.append(word)
+            self.deltaDf[word] = n
+        changed = sorted((self.position(word), n) for word, n in self.deltaDf.items())
+        self.changedDf = (np.array([i for i, n in changed], dtype=np.int64), np.array([n for i, n in changed], dtype=np.float64))
+
+    def documentCount(self):
+        """
+        \brief The function returns the number of documents of the index, with the delta merged, in constant time.
+        \details They are the documents of the arrays which are not hidden plus the documents of the delta which contain at
+        least one word: every hidden document is in the delta, with its new version or deleted.
+        \return int = number of documents
+        """
+        return len(self.titleOrder) - len(self.hidden) + self.deltaLive
+
+    def deltaSize(self):
+        """
+        \brief The function returns the size of the delta, to decide when the index has to be written again with it.
+        \return int = number of postings of the changed documents plus number of hidden documents
+        """
+        return sum(len(postings) for postings in self.deltaPostings.values()) + len(self.hidden)
+
+    def position(self, word):
+        """
+        \brief The function returns the position of a word in #termList.
+        \param word :str = word
+        \return int = position of the word, -1 if it is not present
+        """
+        i = self.termId(word)
+        if i < 0 and word in self.deltaDf:
+            i = len(self.idf) + self.newTermIds[word]
+        return i
+
+    def term(self, i):
+        """
+        \brief The function returns the word in a position of #termList, without decoding the others.
+        \param i :int = position of the word
+        \return str = word
+        """
+        if i >= len(self.idf):
+            return self.newTerms[i - len(self.idf)]
+        return self.termCache[i] if self.termCache is not None else self.decode(self.terms, self.termOffsets, i)
+
+    def documentFrequency(self, word):
+        """
+        \brief The function returns the number of documents which contain a word.
+        \param word :str = word
+        \return int = number of documents, 0 if the word is not present
+        """
+        if word in self.deltaDf:
+            return self.deltaDf[word]
+        i = self.termId(word)
+        return int(self.offsets[i + 1] - self.offsets[i]) if i >= 0 else 0
+
+    def inverseFrequency(self, word):
+        """
+        \brief The function returns the current IDF of a word.
+        \param word :str = word
+        \return float = IDF, 0 if the word is not present or not contained in any document
+        """
+        if self.nDocs is None:
+            i = self.termId(word)
+            return float(self.idf[i]) if i >= 0 else 0.0
+        df = self.documentFrequency(word)
+        return math.log(self.nDocs / float(df)) if df > 0 else 0.0
+
+    def idfAt(self, positions):
+        """
+        \brief The function returns the current IDF of some words, in time proportional to their number.
+        \param positions :numpy.array = positions of the words in #termList
+        \return numpy.array = IDF of the words (float64)
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        if self.nDocs is None:
+            return np.asarray(self.idf[positions], dtype=np.float64)
+        df = np.zeros(len(positions))
+        inside = positions < len(self.idf)
+        df[inside] = self.offsets[positions[inside] + 1] - self.offsets[positions[inside]]
+        changed, counts = self.changedDf
+        if len(changed) > 0:
+            j = np.minimum(np.searchsorted(changed, positions), len(changed) - 1)
+            match = changed[j] == positions
+            df[match] = counts[j[match]]
+        return np.where(df > 0, np.log(self.nDocs / np.maximum(df, 1.0)), 0.0)
+
+    def idfArray(self):
+        """
+        \brief The function returns the current IDF of all the words, in the order of #termList.
+        \return numpy.array = IDF of the words (float64)
+        """
+        return self.idfAt(np.arange(len(self)))
+
+    def matrixArrays(self):
+        """
+        \brief The function returns all the postings, with the delta merged, as the coordinates of a documents x words matrix.
+        \details The documents changed or deleted are removed from the arrays and the current version of the changed ones
+        is appended, so the rows are renumbered when there is a delta. The documents without words have no row.
+        \return (numpy.array, numpy.array, numpy.array, list) = (position in #termList of the word of every posting, row of its
+        document, TF, titles of the documents indexed by row)
+        """
+        counts = np.diff(self.offsets)
+        positions = np.repeat(np.arange(len(counts), dtype=np.int64), counts)
+        docs = np.asarray(self.docs, dtype=np.int64)
+        tfs = np.asarray(self.tfs, dtype=np.float32)
+        titles = self.titleList()
+        if self.nDocs is None:
+            return positions, docs, tfs, titles
+        live = np.ones(len(titles), dtype=bool)
+        live[self.hidden] = False
+        keep = live[docs]
+        rows = np.cumsum(live) - 1
+        titles = [t for t, l in zip(titles, live.tolist()) if l]
+        extraPositions, extraRows, extraTfs = [], [], []
+        for title, freqDist in self.deltaDocs.items():
+            if not freqDist:
+                continue
+            tot_lenght = float(sum(freqDist.values()))
+            for word, tf in freqDist.items():
+                extraPositions.append(self.position(word))
+                extraRows.append(len(titles))
+                extraTfs.append(tf / tot_lenght)
+            titles.append(title)
+        return (np.concatenate([positions[keep], np.array(extraPositions, dtype=np.int64)]),
+                np.concatenate([rows[docs[keep]], np.array(extraRows, dtype=np.int64)]),
+                np.concatenate([tfs[keep], np.array(extraTfs, dtype=np.float32)]), titles)
+
+    @staticmethod
+    def decode(blob, offsets, i):
+        """
+        \brief The function returns the i-th string of a blob.
+        \param blob :numpy.array = utf-8 strings concatenated
+        \param offsets :numpy.array = start of every string, and end of the last one
+        \param i :int = position of the string
+        \return str = string decoded
+        """
+        return blob[offsets[i]:offsets[i + 1]].tobytes().decode('utf-8')
+
+    @staticmethod
+    def find(blob, offsets, order, key):
+        """
+        \brief The function searches a string with a binary search on the sorted permutation of a blob.
+        \param blob :numpy.array = utf-8 strings concatenated
+        \param offsets :numpy.array = start of every string, and end of the last one
+        \param order :numpy.array = positions of the strings sorted by their utf-8 bytes
+        \param key :str = string to be found
+        \return int = position of the string, -1 if it is not present
+        """
+        encoded = key.encode('utf-8')
+        lo, hi = 0, len(order)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            i = order[mid]
+            if blob[offsets[i]:offsets[i + 1]].tobytes() < encoded:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(order):
+            i = int(order[lo])
+            if blob[offsets[i]:offsets[i + 1]].tobytes() == encoded:
+                return i
+        return -1
+
+    def termId(self, word):
+        """
+        \brief The function returns the position of a word in the index.
+        \param word :str = word
+        \return int = position of the word, -1 if it is not present
+        """
+        return self.find(self.terms, self.termOffsets, self.termOrder, word)
+
+    def docId(self, title):
+        """
+        \brief The function returns the id of a document.
+        \param title :str = title of the document
+        \return int = id of the document, -1 if it is not present
+        """
+        return self.find(self.titles, self.titleOffsets, self.titleOrder, title)
+
+    def termList(self):
+        """
+        \brief The function returns all the words, in the order of the index, followed by the new words of the delta. They are decoded the first time.
+        \return list = words
+        """
+        if self.termCache is None:
+            self.termCache = [self.decode(self.terms, self.termOffsets, i) for i in range(len(self.idf))]
+        return self.termCache + self.newTerms if self.newTerms else self.termCache
+
+    def titleList(self):
+        """
+        \brief The function returns the titles of all the documents, indexed by id. They are decoded the first time.
+        \return list = titles
+        """
+        if self.titleCache is None:
+            self.titleCache = [self.decode(self.titles, self.titleOffsets, i) for i in range(len(self.titleOrder))]
+        return self.titleCache
+
+    def __getitem__(self, word):
+        i = self.termId(word)
+        if i < 0 and word not in self.deltaDf:
+            raise KeyError(word)
+        return self.inverseFrequency(word), CsrPostings(self, i, self.deltaPostings.get(word))
+
+    def __contains__(self, word):
+        return word in self.deltaDf or self.termId(word) >= 0
+
+    def __iter__(self):
+        return iter(self.termList())
+
+    def __len__(self):
+        return len(self.idf) + len(self.newTerms)
+
+    def items(self):
+        """
+        \brief The function returns the words with their (IDF, postings), in the order of #termList, without searching them.
+        \return iterator = tuples (word, (IDF, CsrPostings))
+        """
+        idf = self.idfArray() if self.nDocs is not None else self.idf
+        for i, word in enumerate(self.termList()):
+            yield word, (float(idf[i]), CsrPostings(self, i if i < len(self.idf) else -1, self.deltaPostings.get(word)))
+
+    def toDict(self):
+        """
+        \brief The function returns the index as the dict used by databaseWiki: keys = word, values = [IDF, dict = keys = page title, value = TF].
+        \return dict = inverted index
+        """
+        return {word: [idf, dict(postings.items())] for word, (idf, postings) in self.items()}
+
+
+class CsrPostings(Mapping):
+    """
+     \author Biasini Mirko s181753, Carmignani Vittorio s181755, Joao Alemao s182312
+     \version 1.0
+     \brief Postings of a word of a CsrIndex
+     \details Mapping document title -> TF which reads the slices of the memory-mapped arrays, without copying them. The
+     documents hidden by the delta of the index are skipped and the postings of the delta are added.
+    """
+
+    def __init__(self, index, i, extra = None):
+        """
+        \brief Default constructor.
+        \param index :CsrIndex = index of the word
+        \param i :int = position of the word in the arrays, -1 for a word which is only in the delta
+        \param extra :dict (default=None) = postings of the word in the delta: keys = title, values = TF
+        """
+        ##type:numpy.array = ids of the documents, sorted
+        self.docs = index.docs[index.offsets[i]:index.offsets[i + 1]] if i >= 0 else np.zeros(0, dtype=np.int32)
+        ##type:numpy.array = TF of the documents
+        self.tfs = index.tfs[index.offsets[i]:index.offsets[i + 1]] if i >= 0 else np.zeros(0, dtype=np.float32)
+        ##type:CsrIndex = index of the word
+        self.index = index
+        ##type:dict = postings of the word in the delta: keys = title, values = TF
+        self.extra = extra or dict()
+        ##type:bool = True when the hidden documents have been removed from #docs and #tfs
+        self.filtered = len(index.hidden) == 0
+
+    def live(self):
+        """
+        \brief The function removes the hidden documents from #docs and #tfs, the first time it is called.
+        \return (numpy.array, numpy.array) = (#docs, #tfs)
+        """
+        if not self.filtered:
+            keep = ~np.isin(self.docs, self.index.hidden)
+            self.docs, self.tfs = self.docs[keep], self.tfs[keep]
+            self.filtered = True
+        return self.docs, self.tfs
+
+    def position(self, title):
+        """
+        \brief The function returns the position of a document in the arrays of the postings.
+        \param title :str = title of the document
+        \return int = position, -1 if the document does not contain the word or its postings are hidden
+        """
+        doc = self.index.docId(title)
+        hidden = self.index.hidden
+        h = int(np.searchsorted(hidden, doc))
+        if doc < 0 or (h < len(hidden) and hidden[h] == doc):
+            return -1
+        j = int(np.searchsorted(self.docs, doc))
+        return j if j < len(self.docs) and self.docs[j] == doc else -1
+
+    def __getitem__(self, title):
+        if title in self.extra:
+            return self.extra[title]
+        j = self.position(title)
+        if j < 0:
+            raise KeyError(title)
+        return float(self.tfs[j])
+
+    def __contains__(self, title):
+        return title in self.extra or self.position(title) >= 0
+
+    def __iter__(self):
+        return (title for title, tf in self.items())
+
+    def __len__(self):
+        return len(self.live()[0]) + len(self.extra)
+
+    def items(self):
+        """
+        \brief The function returns the documents with their TF, sorted by id, followed by the ones of the delta.
+        \return iterator = tuples (document title, TF)
+        """
+        titles = self.index.titleList()
+        docs, tfs = self.live()
+        for d, tf in zip(docs.tolist(), tfs.tolist()):
+            yield titles[d], tf
+        for item in self.extra.items():
+            yield item
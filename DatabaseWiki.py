@@ -1,3 +1,4 @@
+import os
 import sqlite3
 import pickle
 import nltk
@@ -5,8 +6,22 @@ from nltk.tokenize import sent_tokenize, word_tokenize
 from nltk.corpus import stopwords
 import re
 import math
+import time
 import codecs
+import itertools
+from operator import itemgetter
+import numpy as np
 from MapReduce import return_output
+from SpimiIndex import SpimiIndex
+from CsrIndex import CsrIndex
+from ForwardIndex import ForwardIndex
+from Vocabulary import Vocabulary
+from TfidfMatrix import TfidfMatrix
+from CategoryGraph import CategoryGraph
+from ConnectionPool import ConnectionPool
+import threading
+import multiprocessing
+import resource
 
 class databaseWiki:
     """
@@ -23,66 +38,544 @@ class databaseWiki:
     DB_NAME = 'database.db'
     ##Name of the dictionary of documents: keys = documents title, values = freqDist of the document.
     DICT_NAME = 'documents.pickle'
-    ##Name of the inverted index
+    ##Name of the inverted index pickle written by the previous versions, it is read only if #CSR_NAME does not exist
     INVERTED_NAME = 'inverted.pickle'
+    ##Name of the inverted index written by the previous versions of the SPIMI mode, read as #INVERTED_NAME
+    POSTINGS_NAME = 'inverted.postings'
+    ##Name of the directory of the memory-mapped inverted index (see CsrIndex), which contains also the forward index (see ForwardIndex)
+    CSR_NAME = 'inverted.csr'
+    ##Name of the vocabulary: one word per line, the line number is the id of the word (see Vocabulary)
+    VOCABULARY_NAME = 'vocabulary.txt'
+    ##Name of the TF-IDF matrix of the documents (see TfidfMatrix), built from #invertedIndex
+    TFIDF_NAME = 'tfidf.npz'
+    ##Size of the delta of #invertedIndex (see CsrIndex.deltaSize), as a share of its postings, over which #compactInvertedIndex writes it again
+    DELTA_LIMIT = 0.1
+    ##Name of the directory of the SPIMI shards
+    SHARDS_NAME = 'shards/'
     ##English stopwords
     STOPWORDS = set(stopwords.words('english'))
     ##Porter stemmer
     stemmer = nltk.stem.PorterStemmer()
+    ##If True #createDatabase creates the integer schema: pages and categories have an integer id and the link tables
+    ##(catpage_ids, catsub_ids) contain only ids. catpage and catsub become views with the same columns of the text schema.
+    INTEGER_IDS = False
+    ##Tables filled by #inserCatPagList: (name, columns, order of the primary key, conflict resolution)
+    BULK_TABLES = [("pages", "title", "title", "IGNORE"),
+                   ("categories", "name", "name", "IGNORE"),
+                   ("catpage", "cat_name,pag_title", "cat_name,pag_title", "IGNORE"),
+                   ("catsub", "cat_name,cat_name_sub", "cat_name,cat_name_sub", "IGNORE"),
+                   ("pagehash", "title,hash", "title,rowid", "REPLACE")]
+
+    ##Integer schema (see #INTEGER_IDS): the link tables are WITHOUT ROWID, so their primary key is the table itself. The views
+    ##catpage and catsub expose the columns of the text schema, and their INSTEAD OF triggers translate inserts and deletes.
+    INTEGER_SCHEMA = '''
+            CREATE TABLE pages(id INTEGER PRIMARY KEY, title TEXT NOT NULL UNIQUE);
+            CREATE TABLE pagehash(title TEXT PRIMARY KEY, hash TEXT);
+            CREATE TABLE categories(id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+            CREATE TABLE catpage_ids(
+                cat_id INTEGER NOT NULL REFERENCES categories(id),
+                pag_id INTEGER NOT NULL REFERENCES pages(id),
+                PRIMARY KEY (cat_id,pag_id)
+            ) WITHOUT ROWID;
+            CREATE TABLE catsub_ids(
+                cat_id INTEGER NOT NULL REFERENCES categories(id),
+                sub_id INTEGER NOT NULL REFERENCES categories(id),
+                PRIMARY KEY (cat_id,sub_id),
+                CHECK (cat_id!=sub_id)
+            ) WITHOUT ROWID;
+            CREATE VIEW catpage AS
+                SELECT c.name AS cat_name, p.title AS pag_title
+                FROM catpage_ids AS l JOIN categories AS c ON c.id=l.cat_id JOIN pages AS p ON p.id=l.pag_id;
+            CREATE VIEW catsub AS
+                SELECT c.name AS cat_name, s.name AS cat_name_sub
+                FROM catsub_ids AS l JOIN categories AS c ON c.id=l.cat_id JOIN categories AS s ON s.id=l.sub_id;
+            CREATE TRIGGER catpage_insert INSTEAD OF INSERT ON catpage BEGIN
+                INSERT OR IGNORE INTO categories(name) VALUES (NEW.cat_name);
+                INSERT OR IGNORE INTO pages(title) VALUES (NEW.pag_title);
+                INSERT OR IGNORE INTO catpage_ids(cat_id,pag_id)
+                    SELECT c.id, p.id FROM categories AS c, pages AS p WHERE c.name=NEW.cat_name AND p.title=NEW.pag_title;
+            END;
+            CREATE TRIGGER catpage_delete INSTEAD OF DELETE ON catpage BEGIN
+                DELETE FROM catpage_ids
+                WHERE cat_id=(SELECT id FROM categories WHERE name=OLD.cat_name) AND pag_id=(SELECT id FROM pages WHERE title=OLD.pag_title);
+            END;
+            CREATE TRIGGER catsub_insert INSTEAD OF INSERT ON catsub BEGIN
+                INSERT OR IGNORE INTO categories(name) VALUES (NEW.cat_name);
+                INSERT OR IGNORE INTO categories(name) VALUES (NEW.cat_name_sub);
+                INSERT OR IGNORE INTO catsub_ids(cat_id,sub_id)
+                    SELECT c.id, s.id FROM categories AS c, categories AS s WHERE c.name=NEW.cat_name AND s.name=NEW.cat_name_sub;
+            END;
+            CREATE TRIGGER catsub_delete INSTEAD OF DELETE ON catsub BEGIN
+                DELETE FROM catsub_ids
+                WHERE cat_id=(SELECT id FROM categories WHERE name=OLD.cat_name) AND sub_id=(SELECT id FROM categories WHERE name=OLD.cat_name_sub);
+            END;
+        '''
+    ##Statements which fill the integer schema from the tables of #BULK_TABLES (%(src)s = prefix of the source tables):
+    ##the titles are inserted sorted, then the pairs are translated into ids with a join.
+    INTEGER_BULK = {"pages": """INSERT OR IGNORE INTO pages(title)
+                                SELECT title FROM %(src)spages UNION SELECT pag_title FROM %(src)scatpage ORDER BY 1""",
+                    "categories": """INSERT OR IGNORE INTO categories(name)
+                                     SELECT name FROM %(src)scategories UNION SELECT cat_name FROM %(src)scatpage
+                                     UNION SELECT cat_name FROM %(src)scatsub UNION SELECT cat_name_sub FROM %(src)scatsub ORDER BY 1""",
+                    "catpage": """INSERT OR IGNORE INTO catpage_ids(cat_id,pag_id)
+                                  SELECT c.id, p.id FROM %(src)scatpage AS b JOIN categories AS c ON c.name=b.cat_name
+                                  JOIN pages AS p ON p.title=b.pag_title ORDER BY 1,2""",
+                    "catsub": """INSERT OR IGNORE INTO catsub_ids(cat_id,sub_id)
+                                 SELECT c.id, s.id FROM %(src)scatsub AS b JOIN categories AS c ON c.name=b.cat_name
+                                 JOIN categories AS s ON s.name=b.cat_name_sub ORDER BY 1,2""",
+                    "pagehash": """INSERT OR REPLACE INTO pagehash(title,hash) SELECT title,hash FROM %(src)spagehash ORDER BY title,rowid"""}
+
+    ##Secondary indexes of the text schema: the link tables are searched also by page and by sub category (covering indexes)
+    TEXT_INDEXES = ["CREATE INDEX IF NOT EXISTS catpage_page ON catpage(pag_title,cat_name)",
+                    "CREATE INDEX IF NOT EXISTS catsub_sub ON catsub(cat_name_sub,cat_name)"]
+    ##Secondary indexes of the integer schema, with the same names of #TEXT_INDEXES
+    INTEGER_INDEXES = ["CREATE INDEX IF NOT EXISTS catpage_page ON catpage_ids(pag_id,cat_id)",
+                       "CREATE INDEX IF NOT EXISTS catsub_sub ON catsub_ids(sub_id,cat_id)"]
+
+    ##Model artifacts (#invertedIndex and #documents) of the process: keys = absolute #PATH, values = dict keys = name of
+    ##the artifact, values = artifact. They are loaded on first access and shared by all the instances (see #model).
+    MODELS = dict()
+    ##Lock which prevents two threads from loading the same artifact (reentrant: an artifact can be loaded from another one)
+    MODELS_LOCK = threading.RLock()
 
     """
     \brief Class to access to the database
     """
-    def __init__(self):
+    def __init__(self, dbName = None):
         """
         \brief Default constructor, it initializes db with the file "database" if exists, otherwise, it creates it.      
+        \param dbName :str (default=None) = name of the database file, if None #DB_NAME is used.
+        """
+        ##type:str = name of the database file
+        self.dbName = dbName or self.DB_NAME
+        ##type:database sqlite3 = access to the database file, the only connection which writes
+        self.db = sqlite3.connect(self.PATH+self.dbName)
+        ##type:ConnectionPool = read-only connections used by the getters, one for every thread and process (see #reader)
+        self.pool = ConnectionPool(self.PATH+self.dbName)
+        ##type:bool = True if the database uses the integer schema (see #INTEGER_IDS)
+        self.integerIds = self.isIntegerSchema()
+        #invertedIndex, #documents, #vocabulary and #tfidf are not read here: they are loaded on first access and shared (see #MODELS)
+
+        ##type: int = Number of documents to be analyzed by the mapreducer if it is used
+        self.tempDocuments = 0
+
+        ##type:SpimiIndex = index which receives the documents in the SPIMI mode, None otherwise (see #useSpimi)
+        self.spimi = None
+
+        ##type:dict = keys = title, values = freqDist of the documents saved by ParseDumpWiki.update, which receives them
+        ##instead of #documents (see #updateInvertedIndex). None otherwise
+        self.pending = None
+
+        ##type:bool = True between #beginBulkLoad and #endBulkLoad
+        self.bulkLoad = False
+        ##type:int = rows inserted by #inserCatPagList since #beginBulkLoad
+        self.loadedRows = 0
+        ##type:float = seconds spent in #inserCatPagList since #beginBulkLoad
+        self.loadTime = 0.0
+
+    def useSpimi(self, memoryBudget = 1024):
         """
-        ##type:database sqlite3 = access to the database file
-        self.db = sqlite3.connect(self.PATH+self.DB_NAME)
+        \brief The function switches to the SPIMI mode: the documents are indexed as they are saved, using at most memoryBudget MB,
+        and the inverted index is written in #CSR_NAME by #createInvertedIndex (or by #close).
+        \details In this mode #documents is not kept: ParseDumpWiki.update and #updateInvertedIndex do not need it.
+        \param memoryBudget :int (default=1024) = memory in MB used by the SPIMI block before being flushed to disk
+        """
+        self.spimi = SpimiIndex(self.PATH+self.SHARDS_NAME, memoryBudget)
 
-        
-        ##type:dict = keys = word, values = [dict = keys = page title, value = TF] .
-        self.invertedIndex = dict()
+    def addDocument(self, title, freqDist):
+        """
+        \brief The function saves the frequency distribution of a document in #documents or, in the SPIMI mode, in the SPIMI
+        block. During ParseDumpWiki.update it is saved in #pending.
+        \param title :str = title of the document
+        \param freqDist :dict = keys: words values: frequencies
+        """
+        if self.pending is not None:
+            self.pending[title] = freqDist
+        elif self.spimi is not None:
+            self.spimi.addDocument(title, freqDist)
+        else:
+            self.documents[title] = freqDist
+
+    def model(self):
+        """
+        \brief The function returns the model artifacts loaded in this process for #PATH, shared by all the instances (see #MODELS).
+        \return dict = keys: "invertedIndex", "documents", "vocabulary", "tfidf", "forwardIndex", "categoryGraph:" + #dbName values: the artifacts loaded (or set) so far
+        """
+        return self.MODELS.setdefault(os.path.abspath(self.PATH), dict())
+
+    def getModel(self, name, load):
+        """
+        \brief The function returns a model artifact, loading it the first time it is requested in the process.
+        \param name :str = name of the artifact in #model
+        \param load :function = function without arguments which reads the artifact
+        \return object = the artifact
+        """
+        model = self.model()
+        if name not in model:
+            with self.MODELS_LOCK:
+                if name not in model:
+                    model[name] = load()
+        return model[name]
+
+    @property
+    def invertedIndex(self):
+        """
+        \brief The inverted index, read by #loadInvertedIndex the first time it is accessed in the process.
+        \details type:dict or CsrIndex = keys = word, values = [IDF, dict = keys = page title, value = TF]. It is a CsrIndex
+        when it is read from #CSR_NAME, and a dict when it is built. The changes of #updateInvertedIndex are appended to the
+        CsrIndex as delta segments.
+        """
+        return self.getModel("invertedIndex", self.loadInvertedIndex)
+
+    @invertedIndex.setter
+    def invertedIndex(self, value):
+        self.model()["invertedIndex"] = value
+
+    @property
+    def documents(self):
+        """
+        \brief The documents, read from #DICT_NAME the first time they are accessed in the process.
+        \details type:dict = keys = documents title, values = freqDist of the document.
+        """
+        return self.getModel("documents", self.readDocuments)
+
+    @documents.setter
+    def documents(self, value):
+        self.model()["documents"] = value
+
+    @property
+    def vocabulary(self):
+        """
+        \brief The vocabulary, read by #loadVocabulary the first time it is accessed in the process.
+        \details type:Vocabulary = keys = word, values = stable id of the word, used as position in the vectors of the pages
+        and of the centroids.
+        """
+        return self.getModel("vocabulary", self.loadVocabulary)
+
+    @property
+    def tfidf(self):
+        """
+        \brief The TF-IDF matrix of the documents, read by #loadTfidf the first time it is accessed in the process.
+        \details type:TfidfMatrix = documents x words, rows normalised, columns = ids of #vocabulary.
+        """
+        return self.getModel("tfidf", self.loadTfidf)
+
+    def loadTfidf(self):
+        """
+        \brief The function reads the TF-IDF matrix from #TFIDF_NAME or, if it does not exist, builds it from #invertedIndex and saves it.
+        \return TfidfMatrix = TF-IDF matrix
+        """
+        if os.path.exists(self.PATH+self.TFIDF_NAME):
+            return TfidfMatrix.load(self.PATH+self.TFIDF_NAME)
+        tfidf = TfidfMatrix.build(self.invertedIndex, self.vocabulary)
+        self.vocabulary.save()
+        tfidf.save(self.PATH+self.TFIDF_NAME)
+        return tfidf
+
+    @property
+    def forwardIndex(self):
+        """
+        \brief The forward index of the documents, read by #loadForwardIndex the first time it is accessed in the process.
+        \details type:ForwardIndex = for every document of #invertedIndex its words and their TF (see #getDocumentVector).
+        It is None while #invertedIndex is a dict, i.e. until it is saved in #CSR_NAME.
+        """
+        return self.getModel("forwardIndex", self.loadForwardIndex)
+
+    def loadForwardIndex(self):
+        """
+        \brief The function maps the forward index written in #CSR_NAME or, if it does not exist, writes it from #invertedIndex.
+        \return ForwardIndex = forward index, None if #invertedIndex is not a CsrIndex
+        """
+        if not isinstance(self.invertedIndex, CsrIndex):
+            return None
+        if not ForwardIndex.exists(self.PATH+self.CSR_NAME):
+            return self.writeForwardIndex()
+        return ForwardIndex(self.PATH+self.CSR_NAME)
+
+    def writeForwardIndex(self):
+        """
+        \brief The function writes the forward index of #invertedIndex (a CsrIndex) in #CSR_NAME, next to the inverted index,
+        and makes it #forwardIndex.
+        \return ForwardIndex = forward index
+        """
+        vocabulary = self.vocabulary
+        ForwardIndex.write(self.invertedIndex, [vocabulary[w] for w in self.invertedIndex.termList()])
+        vocabulary.save()
+        forward = ForwardIndex(self.PATH+self.CSR_NAME)
+        self.model()["forwardIndex"] = forward
+        return forward
+
+    def getDocumentTerms(self, title):
+        """
+        \brief The function returns the words of a document of the index and their TF, in time proportional to its number of words.
+        \details The words are read from #forwardIndex; a document changed after #invertedIndex was written is read from its delta.
+        \param title :str = title of the document
+        \return (numpy.array, numpy.array) = (positions of the words in CsrIndex.termList, TF). None if #forwardIndex is not
+        available (#invertedIndex not saved yet), empty if the document is not in the index.
+        """
+        forward = self.forwardIndex
+        if forward is None:
+            return None
+        index = self.invertedIndex
+        if title in index.deltaDocs:
+            freqDist = index.deltaDocs[title] or dict()
+            tot_lenght = float(sum(freqDist.values()))
+            return (np.array([index.position(w) for w in freqDist], dtype=np.int64),
+                    np.array([f / tot_lenght for f in freqDist.values()], dtype=np.float32))
+        doc = index.docId(title)
+        if doc < 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        return forward.vector(doc)
+
+    def termIds(self, positions):
+        """
+        \brief The function returns the ids in #vocabulary of some words of #invertedIndex, a CsrIndex with its #forwardIndex.
+        \param positions :numpy.array = positions of the words in CsrIndex.termList
+        \return numpy.array = ids of the words
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        known = self.forwardIndex.forwardVocabulary
+        ids = np.zeros(len(positions), dtype=np.int64)
+        inside = positions < len(known)
+        ids[inside] = known[positions[inside]]
+        vocabulary, index = self.vocabulary, self.invertedIndex
+        ids[~inside] = [vocabulary[index.term(i)] for i in positions[~inside].tolist()]
+        return ids
+
+    def getDocumentVector(self, title):
+        """
+        \brief The function returns the TF-IDF vector of a document of the index, in time proportional to its number of words.
+        \param title :str = title of the document
+        \details The TF are read by #getDocumentTerms and multiplied by the current IDF.
+        \return dict = keys = id of the word in #vocabulary, values = TF-IDF weight. None if #forwardIndex is not available
+        (#invertedIndex not saved yet), empty if the document is not in the index.
+        """
+        terms = self.getDocumentTerms(title)
+        if terms is None:
+            return None
+        positions, tfs = terms
+        weights = tfs * self.invertedIndex.idfAt(positions).astype(np.float32)
+        return dict(zip(self.termIds(positions).tolist(), weights.tolist()))
+
+    def getIdfVector(self):
+        """
+        \brief The function returns the current IDF of all the words of #vocabulary.
+        \return numpy.array = IDF indexed by the id of the word, 0 for the words which are not in #invertedIndex (float64)
+        """
+        index = self.invertedIndex
+        idf = np.zeros(len(self.vocabulary))
+        if isinstance(index, CsrIndex):
+            idf[self.termIds(np.arange(len(index)))] = index.idfArray()
+        else:
+            vocabulary = self.vocabulary
+            for w, (value, docs) in index.items():
+                idf[vocabulary[w]] = value
+        return idf
+
+    @property
+    def categoryGraph(self):
+        """
+        \brief The hierarchy of the categories, read from catsub by #loadCategoryGraph the first time it is accessed in the process.
+        \details type:CategoryGraph = fathers and sons of every category. It is shared by the instances on the same database
+        file and it is built again after catsub is modified.
+        """
+        return self.getModel("categoryGraph:" + self.dbName, self.loadCategoryGraph)
+
+    def loadCategoryGraph(self):
+        """
+        \brief The function builds the hierarchy of the categories from the rows of catsub.
+        \return CategoryGraph = hierarchy of the categories
+        """
+        c = self.reader().cursor()
+        c.execute("SELECT cat_name, cat_name_sub FROM catsub")
+        return CategoryGraph(c)
+
+    def clearCategoryGraph(self):
+        """
+        \brief The function deletes the hierarchy of the categories, after catsub has changed: it is built again when it is requested.
+        """
+        self.model().pop("categoryGraph:" + self.dbName, None)
+
+    def clearTfidf(self, forwardIndex = True):
+        """
+        \brief The function deletes the TF-IDF matrix and the forward index, after #invertedIndex has changed: the matrix
+        is built again when it is requested, the forward index when #invertedIndex is written in #CSR_NAME.
+        \param forwardIndex :bool (default=True) = False to keep the forward index, which a delta of #invertedIndex does not change
+        """
+        self.model().pop("tfidf", None)
+        if forwardIndex:
+            self.model().pop("forwardIndex", None)
+        if os.path.exists(self.PATH+self.TFIDF_NAME):
+            os.remove(self.PATH+self.TFIDF_NAME)
+
+    def loadVocabulary(self):
+        """
+        \brief The function reads the vocabulary from #VOCABULARY_NAME.
+        \details If the file does not exist the words get the ids in the order of #invertedIndex, which are the positions
+        used by the previous versions, so the centroids already computed remain valid.
+        \return Vocabulary = vocabulary
+        """
+        vocabulary = Vocabulary(self.PATH+self.VOCABULARY_NAME)
+        if len(vocabulary) == 0:
+            vocabulary.update(self.invertedIndex)
+        return vocabulary
+
+    def loadInvertedIndex(self):
+        """
+        \brief The function reads the inverted index from #CSR_NAME or, if it does not exist, from the files of the previous versions.
+        \return dict or CsrIndex = inverted index, empty if no file exists
+        """
+        if CsrIndex.exists(self.PATH+self.CSR_NAME):
+            return CsrIndex(self.PATH+self.CSR_NAME)
+        invertedIndex = dict()
         try:
             with open(self.PATH+self.INVERTED_NAME, 'rb') as handle:
-                self.invertedIndex = pickle.load(handle)
+                invertedIndex = pickle.load(handle)
         except IOError as e:
             pass
+        if len(invertedIndex) == 0 and os.path.exists(self.PATH+self.POSTINGS_NAME):
+            invertedIndex = self.loadPostings()
+        return invertedIndex
 
-        ##type:dict = keys = documents title, values = freqDist of the document.
-        self.documents = dict()
-        if(len(self.invertedIndex))==0:
-            try:
-                with open(self.PATH+self.DICT_NAME, 'rb') as handle:
-                    self.documents = pickle.load(handle)
-            except IOError as e:
-                pass
+    def loadPostings(self):
+        """
+        \brief The function reads the inverted index from the file written by the previous versions of the SPIMI mode.
+        \return dict = inverted index
+        """
+        invertedIndex = dict()
+        for word, idf, postings in SpimiIndex.iterRecords(self.PATH+self.POSTINGS_NAME):
+            invertedIndex[word] = [idf, dict(postings)]
+        return invertedIndex
 
-        ##type: int = Number of documents to be analyzed by the mapreducer if it is used
-        self.tempDocuments = 0
+    def readDocuments(self):
+        """
+        \brief The function reads the documents from their pickle file, and applies the changes saved in the delta of #invertedIndex.
+        \return dict = keys = documents title, values = freqDist of the document (empty if the file does not exist)
+        """
+        documents = dict()
+        try:
+            with open(self.PATH+self.DICT_NAME, 'rb') as handle:
+                documents = pickle.load(handle)
+        except IOError as e:
+            pass
+        if CsrIndex.exists(self.PATH+self.CSR_NAME) and isinstance(self.invertedIndex, CsrIndex):
+            for title, freqDist in self.invertedIndex.deltaDocs.items():
+                if freqDist is None:
+                    documents.pop(title, None)
+                else:
+                    documents[title] = freqDist
+        return documents
+
+    def loadDocuments(self):
+        """
+        \brief The function loads #documents from its pickle file, if it has not been loaded yet.
+        """
+        if len(self.documents) == 0:
+            self.documents = self.readDocuments()
+
+    def isLoaded(self, name):
+        """
+        \brief The function returns True if a model artifact has already been loaded (or set) in this process.
+        \param name :str = "invertedIndex", "documents", "vocabulary", "tfidf" or "forwardIndex"
+        \return bool = True if the artifact is in #model
+        """
+        return name in self.model()
+
+    def reader(self):
+        """
+        \brief The function returns the read-only connection of the current thread (see ConnectionPool).
+        \details The getters read through this connection, so they can be called at the same time by many threads and by
+        the processes forked after the construction. The insert/delete operations use only #db.
+        \return sqlite3.Connection = read-only connection
+        """
+        return self.pool.connection()
 
     def close(self):
         """
-        \brief Close the connection with the database. And save the #documents and #invertedIndex into pickles files
+        \brief Close the connection with the database. And save the #documents and #invertedIndex (see #save)
         """
+        self.pool.close()
         self.db.close()
-        with open(self.PATH+self.DICT_NAME, 'wb') as handle:
-            pickle.dump(self.documents, handle, protocol=pickle.HIGHEST_PROTOCOL)
-        with open(self.PATH+self.INVERTED_NAME, 'wb') as handle:
-            pickle.dump(self.invertedIndex, handle, protocol=pickle.HIGHEST_PROTOCOL)
+        self.save()
+
+    def save(self):
+        """
+        \brief Save the #documents into a pickle file and #invertedIndex in #CSR_NAME. In the SPIMI mode the shards are merged instead (see #createInvertedIndex).
+        \details Only the artifacts loaded in this process are written, so a process which has used only the database does not
+        rewrite them. The inverted index is written only if it is a dict, i.e. if it has been built: a CsrIndex is already on disk,
+        and its changes are in its delta (see #updateInvertedIndex). The documents are written with it, or if #CSR_NAME does not
+        exist: otherwise their changes are in the delta too. After it is written the index is mapped from #CSR_NAME and its
+        forward index is written (see #writeForwardIndex).
+        """
+        if self.spimi is not None:
+            self.createInvertedIndex()
+            return
+        built = self.isLoaded("invertedIndex") and isinstance(self.invertedIndex, dict)
+        if self.isLoaded("documents") and (built or not CsrIndex.exists(self.PATH+self.CSR_NAME)):
+            with open(self.PATH+self.DICT_NAME, 'wb') as handle:
+                pickle.dump(self.documents, handle, protocol=pickle.HIGHEST_PROTOCOL)
+        if built:
+            CsrIndex.write(self.PATH+self.CSR_NAME, ((w, idf, docs.items()) for w, (idf, docs) in self.invertedIndex.items()))
+            for name in (self.INVERTED_NAME, self.POSTINGS_NAME):
+                if os.path.exists(self.PATH+name):
+                    os.remove(self.PATH+name)
+            self.invertedIndex = CsrIndex(self.PATH+self.CSR_NAME)
+            self.writeForwardIndex()
+        if self.isLoaded("vocabulary"):
+            self.vocabulary.save()
+
+
+    def isIntegerSchema(self):
+        """
+        \brief The function returns True if the database uses the integer schema, i.e. catpage is a view.
+        \return bool = True for the integer schema, False for the text schema (or an empty database)
+        """
+        c = self.db.cursor()
+        c.execute("SELECT type FROM sqlite_master WHERE name='catpage'")
+        row = c.fetchone()
+        return row is not None and row[0] == 'view'
 
+    def createIndexes(self):
+        """
+        \brief The function creates the secondary indexes (#TEXT_INDEXES or #INTEGER_INDEXES) if they do not exist yet.
+        \details It is called by #createDatabase and #endBulkLoad, not when the database is opened, so a database opened during a bulk
+        load does not build the indexes dropped by #beginBulkLoad. A database created by the previous versions, without the
+        indexes, is migrated calling it once.
+        """
+        c = self.db.cursor()
+        try:
+            for sql in (self.INTEGER_INDEXES if self.integerIds else self.TEXT_INDEXES):
+                c.execute(sql)
+            self.db.commit()
+        except sqlite3.OperationalError:
+            pass
+
+    def dropIndexes(self):
+        """
+        \brief The function drops the secondary indexes, so that a large insert does not have to maintain them (see #endBulkLoad).
+        """
+        c = self.db.cursor()
+        c.execute("DROP INDEX IF EXISTS catpage_page")
+        c.execute("DROP INDEX IF EXISTS catsub_sub")
+        self.db.commit()
 
-    def createDatabase(self):
+    def createDatabase(self, integerIds = None):
         """
         \brief The function delete all the exisisting tables (if there are) and creates the new ones.
+        \param integerIds :bool (default=None) = True for the integer schema, False for the text schema, if None #INTEGER_IDS is used.
         """
+        if integerIds is None:
+            integerIds = self.INTEGER_IDS
         c = self.db.cursor()
-        c.executescript('''
-            DROP TABLE IF EXISTS pages;
-            DROP TABLE IF EXISTS categories;
-            DROP TABLE IF EXISTS catpage;
-            DROP TABLE IF EXISTS catsub;
+        c.execute("""SELECT type, name FROM sqlite_master WHERE type IN ('table', 'view')
+                     AND name IN ('pages', 'categories', 'catpage', 'catsub', 'pagehash', 'catpage_ids', 'catsub_ids')
+                     ORDER BY type DESC""")
+        for kind, name in c.fetchall():
+            c.execute("DROP %s %s" % (kind.upper(), name))
+        self.integerIds = integerIds
+        c.executescript(self.INTEGER_SCHEMA if integerIds else '''
             CREATE TABLE pages(title TEXT PRIMARY KEY);
+            CREATE TABLE pagehash(title TEXT PRIMARY KEY, hash TEXT);
             CREATE TABLE categories(name TEXT PRIMARY KEY);
             CREATE TABLE catpage(
                 cat_name text, 
@@ -109,11 +602,208 @@ class databaseWiki:
             );
         ''')
         self.db.commit()
+        self.createIndexes()
         self.documents = dict()
         self.invertedIndex = dict()
+        self.clearTfidf()
+        self.clearCategoryGraph()
         self.tempDocuments = 0
-        print("Database created")
-    
+        self.spimi = None
+        print("Database created%s" % (" (integer ids)" if integerIds else ""))
+
+    def copyToIntegerSchema(self, dbName):
+        """
+        \brief The function copies the content of the database in a new database file which uses the integer schema.
+        \details The rows are copied with set operations (see #INTEGER_BULK), sorted by primary key.
+        \param dbName :str = name of the new database file (in #PATH), it is overwritten if it exists.
+        """
+        start = time.time()
+        if os.path.exists(self.PATH+dbName):
+            os.remove(self.PATH+dbName)
+        dest = sqlite3.connect(self.PATH+dbName)
+        c = dest.cursor()
+        c.executescript(self.INTEGER_SCHEMA)
+        c.execute("ATTACH DATABASE ? AS src", [self.PATH+self.dbName])
+        c.execute("BEGIN TRANSACTION")
+        for table, columns, order, conflict in self.BULK_TABLES:
+            c.execute(self.INTEGER_BULK[table] % {"src": "src."})
+        for sql in self.INTEGER_INDEXES:
+            c.execute(sql)
+        dest.commit()
+        c.execute("DETACH DATABASE src")
+        dest.close()
+        print("Database copied in {} in {:.1f}s".format(dbName, time.time() - start))
+
+    def compareSchemas(self, dbName = 'database_ids.db', inferior_limit = 500, repeat = 3):
+        """
+        \brief The function compares the size of the database and the time of the main getters with the text and the integer schema.
+        \details If the file dbName does not exist it is created by #copyToIntegerSchema. The best time of repeat runs is taken.
+        \param dbName :str (default='database_ids.db') = name of the database file with the integer schema
+        \param inferior_limit :int (default=500) = inferior_limit passed to the getters
+        \param repeat :int (default=3) = number of runs of every getter
+        \return dict = keys: "Size (MB)" and the getters' name values: (text schema, integer schema)
+        """
+        if not os.path.exists(self.PATH+dbName):
+            self.copyToIntegerSchema(dbName)
+        getters = self.queryGetters(inferior_limit)
+        results = {"Size (MB)": []}
+        main = (self.db, self.pool, self.integerIds)
+        try:
+            for name in (self.dbName, dbName):
+                results["Size (MB)"].append(os.path.getsize(self.PATH+name) / 1024.0 / 1024.0)
+                self.db = sqlite3.connect(self.PATH+name)
+                self.pool = ConnectionPool(self.PATH+name)
+                self.integerIds = self.isIntegerSchema()
+                for getter, function in getters:
+                    best = float('inf')
+                    for _ in range(repeat):
+                        start = time.time()
+                        function()
+                        best = min(best, time.time() - start)
+                    results.setdefault(getter, []).append(best)
+                self.pool.close()
+                self.db.close()
+        finally:
+            self.db, self.pool, self.integerIds = main
+        rows = [(k, "%.3f" % t, "%.3f" % i, "%.2fx" % (t / i if i > 0 else float('inf'))) for k, (t, i) in results.items()]
+        self.printResults(title="Text schema vs integer schema (seconds)", columns=["Text", "Integer", "Ratio"], rows=rows)
+        return results
+
+    def queryGetters(self, inferior_limit = 500):
+        """
+        \brief The function returns the public getters which query the database, with the arguments used by #compareSchemas and #profileQueries.
+        \details The page and the category passed to the getters are taken from the database.
+        \param inferior_limit :int (default=500) = inferior_limit passed to the getters
+        \return list = pairs (name of the getter, function without arguments which calls it)
+        """
+        pages = self.getPages(1)
+        page = pages[0] if pages else ""
+        categories = self.getCategoriesGivenPage(page)
+        category = categories[0] if categories else ""
+        return [("getPages", lambda: self.getPages()),
+                ("getCategories", lambda: self.getCategories()),
+                ("getCatPag", lambda: self.getCatPag()),
+                ("getCatSub", lambda: self.getCatSub()),
+                ("getNCat", lambda: self.getNCat()),
+                ("getNPag", lambda: self.getNPag()),
+                ("getHashes", lambda: self.getHashes()),
+                ("getTopCategories", lambda: self.getTopCategories()),
+                ("isInPage", lambda: self.isInPage(page)),
+                ("getCaregoriesNPages", lambda: self.getCaregoriesNPages()),
+                ("getBiggestCaregories", lambda: self.getBiggestCaregories(inferior_limit)),
+                ("getAllCategoriesGivenAllPages", lambda: self.getAllCategoriesGivenAllPages(inferior_limit)),
+                ("getAverageCateForPage", lambda: self.getAverageCateForPage()),
+                ("getCategoriesGivenPage", lambda: self.getCategoriesGivenPage(page)),
+                ("getPagesGivenCategory", lambda: self.getPagesGivenCategory(category)),
+                ("getBrothers", lambda: self.getBrothers(category, category)),
+                ("getFatherSon", lambda: self.getFatherSon(category, category))]
+
+    def profileQueries(self, inferior_limit = 500, repeat = 3):
+        """
+        \brief The function prints, for every public getter, its time and the query plan of the SQL statements it executes.
+        \details The statements are captured with the trace callback of the reader connection and explained with EXPLAIN QUERY PLAN.
+        The best time of repeat runs is taken.
+        \param inferior_limit :int (default=500) = inferior_limit passed to the getters
+        \param repeat :int (default=3) = number of runs of every getter
+        \return dict = keys: getters' name values: (seconds, list of (SQL statement, list of steps of the plan))
+        """
+        report = dict()
+        c = self.reader().cursor()
+        for getter, function in self.queryGetters(inferior_limit):
+            statements = []
+            self.reader().set_trace_callback(statements.append)
+            try:
+                function()
+            finally:
+                self.reader().set_trace_callback(None)
+            best = float('inf')
+            for _ in range(repeat):
+                start = time.time()
+                function()
+                best = min(best, time.time() - start)
+            plans = []
+            for sql in statements:
+                if sql.lstrip().upper().startswith("SELECT"):
+                    plans.append((" ".join(sql.split()), [row[-1] for row in c.execute("EXPLAIN QUERY PLAN " + sql)]))
+            report[getter] = (best, plans)
+            print("%s: %.4fs" % (getter, best))
+            for sql, plan in plans:
+                print("    " + sql)
+                for step in plan:
+                    print("        " + step)
+        return report
+
+    def lookupPages(self, pages):
+        """
+        \brief The function looks up the pages passed as parameter: existence, categories and hierarchy of the first category.
+        It is the unit of work of #benchmarkReaders.
+        \param pages :list = titles of the pages
+        \return int = number of lookups done
+        """
+        n = 0
+        for page in pages:
+            if self.isInPage(page):
+                categories = self.getCategoriesGivenPage(page)
+                if categories:
+                    self.getFatherSon(categories[0], categories[-1])
+                    self.getBrothers(categories[0], categories[-1])
+                    n += 2
+                n += 1
+            n += 1
+        return n
+
+    def benchmarkReaders(self, nReaders = (1, 2, 4, 8), nPages = 20000, processes = False):
+        """
+        \brief The function measures the throughput of the lookups (#lookupPages) with an increasing number of concurrent readers.
+        \details The pages are split among the readers, which are threads or forked processes. Every reader uses its own
+        read-only connection of #pool.
+        \param nReaders :tuple (default=(1, 2, 4, 8)) = numbers of readers to be tested
+        \param nPages :int (default=20000) = number of pages looked up in every test
+        \param processes :bool (default=False) = if True the readers are processes, otherwise threads
+        \return dict = keys: number of readers values: lookups per second
+        """
+        pages = self.getPages(nPages)
+        pages = (pages * (nPages // max(len(pages), 1) + 1))[:nPages]
+        results = dict()
+        for n in nReaders:
+            parts = [pages[i::n] for i in range(n)]
+            start = time.time()
+            if processes:
+                with multiprocessing.get_context("fork").Pool(n, initializer=initReader, initargs=(self,)) as workers:
+                    lookups = sum(workers.map(lookupWorker, parts))
+            else:
+                counts = [0] * n
+                def run(i):
+                    counts[i] = self.lookupPages(parts[i])
+                threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+                for t in threads:
+                    t.start()
+                for t in threads:
+                    t.join()
+                lookups = sum(counts)
+            results[n] = lookups / (time.time() - start)
+        rows = [(n, "{:,.0f}".format(r), "%.2fx" % (r / results[nReaders[0]])) for n, r in results.items()]
+        self.printResults(title="Lookups with concurrent %s" % ("processes" if processes else "threads"), columns=["Readers", "Lookups/s", "Scaling"], rows=rows)
+        return results
+
+    @classmethod
+    def measureStartup(cls, nInstances = 3):
+        """
+        \brief The function measures the cold start of nInstances databases followed by one access to the model, with the
+        artifacts loaded eagerly by every constructor (as the previous versions did) and lazily, shared by the instances.
+        \details Every measure runs in a forked process with an empty #MODELS (see #startupWorker). The peak memory is the
+        increase of the peak resident size of that process.
+        \param nInstances :int (default=3) = number of databases created, e.g. 3 in Demo2 (ParseDumpWiki, databaseWiki and Categorization)
+        \return dict = keys: "Eager", "Lazy" values: (seconds to create the instances, seconds of the first access, peak memory in MB)
+        """
+        results = dict()
+        for mode, eager in (("Eager", True), ("Lazy", False)):
+            with multiprocessing.get_context("fork").Pool(1) as worker:
+                results[mode] = worker.apply(startupWorker, (eager, nInstances))
+        rows = [(mode, "%.3f" % t, "%.3f" % a, "%.1f" % m) for mode, (t, a, m) in results.items()]
+        cls.printResults(title="Startup of %d instances" % nInstances, columns=["Startup (s)", "First access (s)", "Peak RSS (MB)"], rows=rows)
+        return results
+
     @staticmethod
     def printResults(title="",columns=[],rows=[]):
         """
@@ -140,7 +830,7 @@ class databaseWiki:
         \param offset :int (default=0): number of initial rows to be skipped.
         \return list of pages' title
         """
-        c = self.db.cursor()
+        c = self.reader().cursor()
         if(nrows is None):
             c.execute("SELECT title FROM pages;")
         else:
@@ -163,7 +853,7 @@ class databaseWiki:
         \param offset :int (default=0): number of initial rows to be skipped.
         \return list of categories' name.
         """
-        c = self.db.cursor()
+        c = self.reader().cursor()
         if(nrows is None):
             c.execute("SELECT name FROM categories;")
         else:
@@ -186,7 +876,7 @@ class databaseWiki:
         \param offset :int (default=0): number of initial rows to be skipped.
         \return :list = rows of the content of catpage's table.
         """
-        c = self.db.cursor()
+        c = self.reader().cursor()
         if(nrows is None):
             c.execute('''SELECT * FROM catpage''')
         else:
@@ -209,7 +899,7 @@ class databaseWiki:
         \param offset :int (default=0): number of initial rows to be skipped.
         \return :list = rows of the content of catsub's table.
         """
-        c = self.db.cursor()
+        c = self.reader().cursor()
         if(nrows is None):
             c.execute('''SELECT * FROM catsub ORDER BY cat_name_sub''')
         else:
@@ -236,7 +926,7 @@ class databaseWiki:
         \brief The function returns the number of rows in categories's table.
         \return :int = number of categories saved.
         """
-        c = self.db.cursor()
+        c = self.reader().cursor()
         c.execute('SELECT count(*) FROM categories')
         return int(c.fetchone()[0])
 
@@ -251,7 +941,7 @@ class databaseWiki:
         \brief The function returns the number of rows in pages's table.
         \return :int = number of pages saved.
         """
-        c = self.db.cursor()
+        c = self.reader().cursor()
         c.execute('SELECT count(*) FROM pages')
         return int(c.fetchone()[0])
 
@@ -288,7 +978,7 @@ class databaseWiki:
         c.execute('INSERT OR IGNORE INTO catpage(cat_name,pag_title) VALUES (?,?)',[cat,page])
         self.db.commit()
 
-    def inserCatPagList(self,listCatPag=set(),listCat=set(),listPag=set(), listCatSub=set()):
+    def inserCatPagList(self,listCatPag=set(),listCat=set(),listPag=set(), listCatSub=set(), listHash=set()):
         """
         \brief This function should be used to boost the insert operations in the database.
         \details The function starts a transaction. It executes (or ignore if there are exceptions) all the insert operations taking every 
@@ -297,18 +987,121 @@ class databaseWiki:
         \param listCat :set or list (default empty set) = set of string with categories' title.
         \param listPag :set or list (default empty set) = set of string with pages' title.
         \param listCatSub :set or list (default empty set) = set of pair (category's name,sub_category's name)
+        \param listHash :set or list (default empty set) = set of pair (page's title,hash of the page's text)
+        \return float = rows inserted per second
+        """
+        start = time.time()
+        prefix = "temp.bulk_" if self.bulkLoad else ""
+        c = self.db.cursor()
+        c.execute("BEGIN TRANSACTION")
+        c.executemany("INSERT OR IGNORE INTO %spages(title) VALUES (?);" % prefix, [(pag,) for pag in listPag])
+        c.executemany("INSERT OR IGNORE INTO %scategories(name) VALUES (?);" % prefix, [(cat,) for cat in listCat])
+        c.executemany("INSERT OR IGNORE INTO %scatpage(cat_name,pag_title) VALUES (?,?);" % prefix, listCatPag)
+        c.executemany("INSERT OR IGNORE INTO %scatsub(cat_name,cat_name_sub) VALUES (?,?);" % prefix, listCatSub)
+        c.executemany("INSERT OR REPLACE INTO %spagehash(title,hash) VALUES (?,?);" % prefix, listHash)
+        self.db.commit()
+        if len(listCatSub) > 0:
+            self.clearCategoryGraph()
+        elapsed = time.time() - start
+        rows = len(listPag) + len(listCat) + len(listCatPag) + len(listCatSub) + len(listHash)
+        self.loadedRows += rows
+        self.loadTime += elapsed
+        return rows / elapsed if elapsed > 0 else 0.0
+
+    def beginBulkLoad(self, cacheSize = 512):
+        """
+        \brief The function prepares the database for a large number of #inserCatPagList.
+        \details The durability is relaxed (WAL journal, synchronous OFF) and the page cache is enlarged. Until #endBulkLoad the rows
+        are appended to temporary tables without any index, so the primary keys are not maintained at each insert.
+        \param cacheSize :int (default=512) = size of the page cache in MB
         """
         c = self.db.cursor()
+        ##type:dict = keys: pragma values: value before #beginBulkLoad
+        self.savedPragmas = {p: c.execute("PRAGMA %s" % p).fetchone()[0] for p in ("journal_mode", "synchronous", "cache_size")}
+        c.execute("PRAGMA journal_mode=WAL")
+        c.execute("PRAGMA synchronous=OFF")
+        c.execute("PRAGMA cache_size=%d" % (-cacheSize * 1024))
+        for table, columns, order, conflict in self.BULK_TABLES:
+            c.execute("DROP TABLE IF EXISTS temp.bulk_%s" % table)
+            c.execute("CREATE TEMP TABLE bulk_%s(%s)" % (table, columns))
+        self.bulkLoad = True
+        self.loadedRows = 0
+        self.loadTime = 0.0
+
+    def endBulkLoad(self):
+        """
+        \brief The function moves the rows loaded since #beginBulkLoad in the actual tables and restores the previous settings.
+        \details The rows are inserted sorted by primary key, so the indexes are built appending to them, and the duplicates
+        are removed. The secondary indexes are dropped during the insert and built at the end. It prints the rows per second of the load and the time spent to build the indexes.
+        \return float = rows inserted per second by #inserCatPagList
+        """
+        start = time.time()
+        self.dropIndexes()
+        c = self.db.cursor()
         c.execute("BEGIN TRANSACTION")
-        for pag in listPag:
-            c.execute("INSERT OR IGNORE INTO pages(title) VALUES (?);",[pag])
-        for cat in listCat:
-            c.execute("INSERT OR IGNORE INTO categories(name) VALUES (?);",[cat])
-        for cat,pag in listCatPag:
-            c.execute("INSERT OR IGNORE INTO catpage(cat_name,pag_title) VALUES (?,?);",[cat,pag])
-        for cat,sub in listCatSub:
-            c.execute("INSERT OR IGNORE INTO catsub(cat_name,cat_name_sub) VALUES (?,?);",[cat,sub])
+        for table, columns, order, conflict in self.BULK_TABLES:
+            if self.integerIds:
+                c.execute(self.INTEGER_BULK[table] % {"src": "temp.bulk_"})
+            else:
+                c.execute("INSERT OR %s INTO %s(%s) SELECT %s FROM temp.bulk_%s ORDER BY %s" % (conflict, table, columns, columns, table, order))
+        for table, columns, order, conflict in self.BULK_TABLES:
+            c.execute("DROP TABLE temp.bulk_%s" % table)
         self.db.commit()
+        self.clearCategoryGraph()
+        self.createIndexes()
+        for pragma, value in self.savedPragmas.items():
+            c.execute("PRAGMA %s=%s" % (pragma, value))
+        self.bulkLoad = False
+        rate = self.loadedRows / self.loadTime if self.loadTime > 0 else 0.0
+        print("Loaded {:,} rows in {:.1f}s ({:,.0f} rows/s), indexes built in {:.1f}s".format(self.loadedRows, self.loadTime, rate, time.time() - start))
+        return rate
+
+    def getHash(self,title):
+        """
+        \brief The function returns the hash of the text saved for the page passed as parameter.
+        \param title :str = title of the page (or of the category page)
+        \return str = hash of the text, None if the page has not been saved
+        """
+        c = self.reader().cursor()
+        c.execute("SELECT hash FROM pagehash WHERE title=?",[title])
+        row = c.fetchone()
+        return None if row is None else row[0]
+
+    def getHashes(self):
+        """
+        \brief The function returns the hashes of the texts of all the pages saved.
+        \return dict = keys: page's title values: hash of the text
+        """
+        c = self.reader().cursor()
+        c.execute("SELECT title,hash FROM pagehash")
+        return dict(c.fetchall())
+
+    def removePage(self,title):
+        """
+        \brief The function deletes a page, its pairs (category, page) and its hash from the database.
+        \param title :str = title of the page
+        \return list = categories' name the page belonged to
+        """
+        categories = self.getCategoriesGivenPage(title)
+        c = self.db.cursor()
+        c.execute("BEGIN TRANSACTION")
+        c.execute("DELETE FROM catpage WHERE pag_title=?",[title])
+        c.execute("DELETE FROM pages WHERE title=?",[title])
+        c.execute("DELETE FROM pagehash WHERE title=?",[title])
+        self.db.commit()
+        return categories
+
+    def removeCategoryPage(self,title):
+        """
+        \brief The function deletes the pairs (category, sub_category) saved from a category page and its hash.
+        \param title :str = title of the category page (Category:name)
+        """
+        c = self.db.cursor()
+        c.execute("BEGIN TRANSACTION")
+        c.execute("DELETE FROM catsub WHERE cat_name_sub=?",[title[9:]])
+        c.execute("DELETE FROM pagehash WHERE title=?",[title])
+        self.db.commit()
+        self.clearCategoryGraph()
             
     def insertCatSub(self,cat,cat_sub):
         """
@@ -328,6 +1121,31 @@ class databaseWiki:
             pass
         c.execute('INSERT INTO catsub VALUES (?,?)',[cat,cat_sub])
         self.db.commit()
+        self.clearCategoryGraph()
+
+    def getBrothers(self, catR, catS):
+        """
+        \brief The function returns the categories which are father of both the categories passed as parameter.
+        \param catR :str = name of the first category
+        \param catS :str = name of the second category
+        \return list = rows (father's name,) resulted by the "fetchall", empty if the categories are not brothers
+        """
+        c = self.reader().cursor()
+        c.execute("""SELECT a.cat_name FROM catsub AS a JOIN catsub AS b ON b.cat_name=a.cat_name
+                     WHERE a.cat_name_sub=? AND b.cat_name_sub=?""",[catR,catS])
+        return c.fetchall()
+
+    def getFatherSon(self, catR, catS):
+        """
+        \brief The function returns the pairs (father, son) between the categories passed as parameter, in both directions.
+        \param catR :str = name of the first category
+        \param catS :str = name of the second category
+        \return list = rows resulted by the "fetchall", empty if no category is father of the other
+        """
+        c = self.reader().cursor()
+        c.execute("""SELECT * FROM catsub WHERE cat_name_sub=? AND cat_name=?
+                     UNION ALL SELECT * FROM catsub WHERE cat_name_sub=? AND cat_name=?""",[catS,catR,catR,catS])
+        return c.fetchall()
 
     def getTopCategories(self, nrows = None, offset = 0):
         """
@@ -336,7 +1154,7 @@ class databaseWiki:
         \param offset :int (default=0): number of initial rows to be skipped.
         \return :list = rows resulted by the "fetchall"
         """
-        c = self.db.cursor()
+        c = self.reader().cursor()
         if(nrows is None):
             c.execute('''SELECT DISTINCT(cat_name) FROM catsub WHERE cat_name NOT IN (SELECT DISTINCT(cat_name_sub) FROM catsub)''')
         else:
@@ -358,7 +1176,7 @@ class databaseWiki:
         \param title :str = page's table to be checked
         \return bool = True if title is in pages's table, False otherwise
         """
-        c = self.db.cursor()
+        c = self.reader().cursor()
         c.execute("SELECT COUNT(title) FROM pages where title=?",[title])
         return bool(c.fetchone()[0])
 
@@ -369,7 +1187,18 @@ class databaseWiki:
         \param inferior_limit :int (default 500)= min number of pages
         \return :list = rows resulted by the "fetchall"
         """
-        c = self.db.cursor()
+        c = self.reader().cursor()
+        if self.integerIds:
+            c.execute("""
+                        SELECT name, c
+                        FROM (SELECT cat_id, count(*) as c FROM catpage_ids GROUP BY cat_id HAVING c >= ?) JOIN categories ON id=cat_id
+                        WHERE name NOT LIKE '%birth%' AND name NOT LIKE '%death%' AND NOT cat_id IN (
+                            SELECT DISTINCT(cat_id)
+                            FROM catsub_ids
+                        )
+                        ORDER BY c DESC
+                    """,[inferior_limit])
+            return c.fetchall()
         c.execute("""
                         SELECT cat_name, count(*) as c
                         FROM catpage
@@ -389,8 +1218,11 @@ class databaseWiki:
         \brief The function returns the average number of category per page
         \return float = average
         """
-        c = self.db.cursor()
-        c.execute('SELECT AVG(S.C) FROM (SELECT COUNT(*) as C FROM catpage GROUP BY pag_title) as S')
+        c = self.reader().cursor()
+        if self.integerIds:
+            c.execute('SELECT AVG(S.C) FROM (SELECT COUNT(*) as C FROM catpage_ids GROUP BY pag_id) as S')
+        else:
+            c.execute('SELECT AVG(S.C) FROM (SELECT COUNT(*) as C FROM catpage GROUP BY pag_title) as S')
         return float(c.fetchone()[0])
 
     def viewBiggestCategories(self,inferior_limit=500):
@@ -408,7 +1240,7 @@ class databaseWiki:
         \param category :str = name of the category
         \return :list = list of pages' title
         """
-        c = self.db.cursor()
+        c = self.reader().cursor()
         c.execute("""SELECT pag_title FROM catpage WHERE cat_name=?""",[category])
         return [r[0] for r in c.fetchall()]
 
@@ -418,7 +1250,7 @@ class databaseWiki:
         \param page :str = title of the page
         \return :list = list of categories' name
         """
-        c = self.db.cursor()
+        c = self.reader().cursor()
         c.execute("""SELECT cat_name FROM catpage WHERE pag_title=?""",[page])
         return [r[0] for r in c.fetchall()]
 
@@ -427,7 +1259,16 @@ class databaseWiki:
         \brief The function return the all the categories and the relative number of pages associated.
         \return :list = rows resulted by the "fetchall"
         """
-        c = self.db.cursor()
+        c = self.reader().cursor()
+        if self.integerIds:
+            c.execute("""
+                        SELECT name, count(*) as c
+                        FROM categories JOIN catpage_ids ON cat_id=id
+                        GROUP BY name
+                        HAVING COUNT(*) >= ?
+                        ORDER BY name
+                    """,[inferior_limit])
+            return c.fetchall()
         c.execute("""
                         SELECT cat_name, count(*) as c
                         FROM catpage
@@ -440,52 +1281,26 @@ class databaseWiki:
     def getAllCategoriesGivenAllPages(self, inferior_limit):
         """
         \brief This function returns a dictionary where the keys are the pages and the values are: list of the categories associated.
-        The relative SQL function should be: SELECT pag_title,GROUP_CONCAT(cat_name,SEPARATOR) FROM catpage GROUP BY pag_title HAVING COUNT(*)>= inferior_limit. The problem
-        with SQLLIte3 is that does not allow to choose the separator but must be the comma. Because of that, and since there are many categories in
-        which the comma is appear, we had to structure a more complicated SQL query.
+        Only the pages which belong to at least one category with inferior_limit pages are returned.
+        \details The pairs (page, category) are read in a single pass, sorted by page through the index catpage_page, and grouped
+        while they are read. In this way no GROUP_CONCAT is needed (SQLite3 does not allow to choose its separator, and the comma
+        appears in many categories' name).
         \param inferior_limit :int = number of minimum pages so that a category appear in the returned dictionary.
         \return dict = keys: pages values: list of categories associated
         """
-        c = self.db.cursor()
-        c.execute("""   SELECT pag_title,GROUP_CONCAT(cat_name) 
-                        FROM catpage as princ
-                        WHERE NOT cat_name LIKE '%,%' AND pag_title IN 
-                            (SELECT pag_title
-                            FROM catpage
-                            WHERE cat_name IN 
-                                (
-                                SELECT cat_name
-                                FROM catpage
-                                GROUP BY cat_name
-                                HAVING COUNT(*)>=?
-                                )
-                            )
-                        GROUP BY pag_title """,[inferior_limit])
+        big = set(cat for cat, n in self.getCaregoriesNPages(inferior_limit))
+        c = self.reader().cursor()
+        if self.integerIds:
+            c.execute("""SELECT p.title, c.name
+                         FROM catpage_ids AS l JOIN pages AS p ON p.id=l.pag_id JOIN categories AS c ON c.id=l.cat_id
+                         ORDER BY l.pag_id""")
+        else:
+            c.execute("SELECT pag_title, cat_name FROM catpage ORDER BY pag_title")
         pagesCat = {}
-        results = c.fetchall()
-        for page,concat in results:
-            pagesCat[page]=concat.split(',')
-        c.execute("""SELECT pag_title,
-                     GROUP_CONCAT(REPLACE(cat_name,',','|')) 
-                     FROM catpage 
-                     WHERE cat_name LIKE '%,%' AND pag_title IN 
-                            (SELECT pag_title
-                            FROM catpage
-                            WHERE cat_name IN 
-                                (
-                                SELECT cat_name
-                                FROM catpage
-                                GROUP BY cat_name
-                                HAVING COUNT(*)>=?
-                                )
-                            )
-                     GROUP BY pag_title""",[inferior_limit])
-        results = c.fetchall()
-        for page,concat in results:
-            try:
-                pagesCat[page]+=[p.replace("|",u"\u002C") for p in concat.split(',')]
-            except:
-                pagesCat[page]=[p.replace("|",u"\u002C") for p in concat.split(',')]
+        for page, rows in itertools.groupby(c, key=itemgetter(0)):
+            categories = [r[1] for r in rows]
+            if not big.isdisjoint(categories):
+                pagesCat[page] = categories
         return pagesCat
 
     def saveDocument(self,text="",title="",mapreduce=False):
@@ -498,7 +1313,7 @@ class databaseWiki:
         if 
         """
         if(not mapreduce):
-            self.documents[title] = self.transformDocument(text)
+            self.addDocument(title, self.transformDocument(text))
         else:
             with codecs.open("TempDoc/%s.txt" % title,"w",encoding="utf-8") as file:
                 file.write(text)
@@ -506,10 +1321,11 @@ class databaseWiki:
             if(self.tempDocuments>500):
                 results = return_output("TempDoc/*.txt")
                 for r in results:
-                    self.documents[r[0]] =r[1]
+                    self.addDocument(r[0], r[1])
                 self.tempDocuments=0
     
-    def transformDocument(self,text):
+    @classmethod
+    def transformDocument(cls,text):
         """
         \brief The function execute the different transformation on text and returns its "freqDist"
         \param text :str = text to be transformer
@@ -519,14 +1335,31 @@ class databaseWiki:
         res = list()
         for word in listWords:
             word = word.lower()
-            if(not bool(re.search(r"[^A-Za-z]", word)) and word not in self.STOPWORDS):
-                res.append(self.stemmer.stem(word))
+            if(not bool(re.search(r"[^A-Za-z]", word)) and word not in cls.STOPWORDS):
+                res.append(cls.stemmer.stem(word))
         return nltk.FreqDist(res)
 
     def createInvertedIndex(self):
         """
-        \brief The function create the inverted index: keys = word, values = [dict: keys = page title, value = TF].
-        """
+        \brief The function create the inverted index: keys = word, values = [dict: keys = page title, value = TF]. The new
+        words are added to #vocabulary.
+        \details In the SPIMI mode the shards are merged directly in #CSR_NAME, which becomes #invertedIndex together with its
+        forward index, and the old pickles are deleted.
+        """
+        if self.spimi is not None:
+            if self.spimi.nDocuments > 0:
+                self.clearTfidf()
+                n = CsrIndex.write(self.PATH+self.CSR_NAME, self.spimi.merge())
+                self.spimi.clear()
+                for name in (self.DICT_NAME, self.INVERTED_NAME, self.POSTINGS_NAME):
+                    if os.path.exists(self.PATH+name):
+                        os.remove(self.PATH+name)
+                self.invertedIndex = CsrIndex(self.PATH+self.CSR_NAME)
+                self.vocabulary.update(self.invertedIndex)
+                self.writeForwardIndex()
+                print("Inverted index created: {:,} words".format(n))
+            return
+        self.clearTfidf()
         self.invertedIndex = dict()
         for doc,freqDist in self.documents.items():
             tot_lenght = float(sum(freqDist.values()))
@@ -537,4 +1370,123 @@ class databaseWiki:
                     self.invertedIndex[word] = [None,{doc:tf/tot_lenght}]        
         N_DOCS = float(len(self.documents))
         for word, pair in self.invertedIndex.items():
-            pair[0] = math.log(N_DOCS/len(pair[1]))
\ No newline at end of file
+            pair[0] = math.log(N_DOCS/len(pair[1]))
+        self.vocabulary.update(self.invertedIndex)
+
+    def updateInvertedIndex(self, changes):
+        """
+        \brief The function applies to the inverted index the documents added, changed or deleted by ParseDumpWiki.update.
+        \details The changes are appended to the index as a delta segment (see CsrIndex.appendDelta), which is merged with its
+        postings when they are read, so the time depends on the changed documents and not on the size of the index. The old
+        words of a changed document are read from the index (see #getDocumentTerms) and the number of documents containing
+        a word is recomputed only for the words of the changed documents. The number of documents is kept by the index, so
+        #documents is not read. The IDF of a word is computed from them when it is read, so a change of the number of
+        documents does not touch the other words. The words which are not contained in any document anymore are kept, with
+        IDF 0, and the new words are added to #vocabulary. An empty index is built from #documents first (a parse without the
+        SPIMI mode does not build it) and an index which is still a dict is written in #CSR_NAME (see #save): these steps
+        happen only once. The delta is merged in the index by #compactInvertedIndex.
+        \param changes :dict = keys: document's title values: new freqDist, None if the document has been deleted
+        \return dict = keys: words of the changed documents values: previous IDF (None for new words)
+        """
+        if len(self.invertedIndex) == 0:
+            self.createInvertedIndex()
+        if not isinstance(self.invertedIndex, CsrIndex):
+            self.save()
+        index = self.invertedIndex
+        vocabulary = self.vocabulary
+        counts = dict()
+        for doc, new in changes.items():
+            positions, tfs = self.getDocumentTerms(doc)
+            for word in (index.term(i) for i in positions.tolist()):
+                counts[word] = counts.get(word, 0) - 1
+            for word in new or ():
+                counts[word] = counts.get(word, 0) + 1
+            vocabulary.update(new or ())
+        oldIdf = {word: index.inverseFrequency(word) if word in index else None for word in counts}
+        df = {word: index.documentFrequency(word) + n for word, n in counts.items() if n != 0}
+        index.appendDelta(changes, df)
+        if self.isLoaded("documents"):
+            for doc, new in changes.items():
+                if new is None:
+                    self.documents.pop(doc, None)
+                else:
+                    self.documents[doc] = new
+        vocabulary.save()
+        self.clearTfidf(forwardIndex = False)
+        return oldIdf
+
+    def compactInvertedIndex(self, force = False):
+        """
+        \brief The function writes the inverted index again in #CSR_NAME with its delta merged, once the delta has grown over #DELTA_LIMIT.
+        \details This is the only step of the incremental updates whose time depends on the size of the index: all the
+        postings and the forward index are written again, and the IDF stored in the index becomes the current one. The
+        documents are written again with the changes of the delta only if #DICT_NAME exists (it does not in the SPIMI mode).
+        It runs when the delta reaches #DELTA_LIMIT times the postings of the index, so its cost is spread over the updates
+        which have made the delta grow.
+        \param force :bool (default=False) = True to write the index even if the delta is below the limit
+        \return bool = True if the index has been written again
+        """
+        index = self.invertedIndex
+        if not isinstance(index, CsrIndex) or index.nDocs is None:
+            return False
+        if not force and index.deltaSize() <= self.DELTA_LIMIT * len(index.docs):
+            return False
+        if os.path.exists(self.PATH+self.DICT_NAME):
+            documents = self.documents if self.isLoaded("documents") else self.readDocuments()
+            with open(self.PATH+self.DICT_NAME, 'wb') as handle:
+                pickle.dump(documents, handle, protocol=pickle.HIGHEST_PROTOCOL)
+        CsrIndex.write(self.PATH+self.CSR_NAME, ((w, idf, postings.items()) for w, (idf, postings) in index.items()))
+        self.invertedIndex = CsrIndex(self.PATH+self.CSR_NAME)
+        self.clearTfidf()
+        self.writeForwardIndex()
+        return True
+
+
+##type:databaseWiki = database used by the worker processes of databaseWiki.benchmarkReaders
+readerDb = None
+
+def initReader(db):
+    """
+    \brief Initializer of the worker processes of databaseWiki.benchmarkReaders: the forked process opens its own connection on first use.
+    \param db :databaseWiki = database of the parent process
+    """
+    global readerDb
+    readerDb = db
+
+def lookupWorker(pages):
+    """
+    \brief The function executed by the worker processes of databaseWiki.benchmarkReaders.
+    \param pages :list = titles of the pages to be looked up
+    \return int = number of lookups done
+    """
+    return readerDb.lookupPages(pages)
+
+def startupWorker(eager, nInstances):
+    """
+    \brief The function executed by the worker processes of databaseWiki.measureStartup.
+    \param eager :bool = if True every instance loads the model in its constructor, with its own copy
+    \param nInstances :int = number of databases created
+    \return (float, float, float) = (seconds to create the instances, seconds of the first access, peak memory increase in MB)
+    """
+    databaseWiki.MODELS.clear()
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.time()
+    instances, models = [], []
+    for _ in range(nInstances):
+        db = databaseWiki()
+        if eager:
+            databaseWiki.MODELS.pop(os.path.abspath(db.PATH), None)
+            if len(db.invertedIndex) == 0:
+                db.loadDocuments()
+            models.append(db.model())
+        instances.append(db)
+    startup = time.time() - start
+    start = time.time()
+    for db in instances:
+        len(db.invertedIndex)
+    access = time.time() - start
+    peak = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base) / 1024.0
+    for db in instances:
+        db.pool.close()
+        db.db.close()
+    return startup, access, peak
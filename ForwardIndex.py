@@ -0,0 +1,91 @@
+import os
+import numpy as np
+from CsrIndex import CsrIndex
+
+class ForwardIndex:
+    """
+     \author Biasini Mirko s181753, Carmignani Vittorio s181755, Joao Alemao s182312
+     \version 1.0
+     \brief Library to read the words of a document from memory-mapped arrays
+     \details The forward index is the transpose of the arrays of a CsrIndex and it is written in the same directory: for
+     every document (the ids of the CsrIndex) the slice offsets[d]:offsets[d+1] of the arrays terms (positions of the words
+     in the CsrIndex, int32) and tfs (float32) are its words. The IDF is not stored, so the index does not depend on the
+     number of documents and remains valid when a delta is appended to the CsrIndex: the weights are the TF times the
+     current IDF (see CsrIndex.idfAt) and the ids of the words in the vocabulary are in the array vocabulary. It is written
+     from the arrays of the CsrIndex with a counting sort, a block of postings at a time, so the memory used does not depend
+     on the size of the index.
+    """
+
+    ##Files of the index: name -> dtype
+    FILES = {"forwardOffsets": np.int64, "forwardTerms": np.int32, "forwardTfs": np.float32, "forwardVocabulary": np.int32}
+    ##Number of postings moved at a time by #write
+    BLOCK_SIZE = 1 << 22
+
+    def __init__(self, path):
+        """
+        \brief Default constructor, it maps the arrays saved by #write.
+        \param path :str = directory of the CsrIndex
+        """
+        ##type:str = directory of the index
+        self.path = path
+        for name, dtype in self.FILES.items():
+            setattr(self, name, CsrIndex.mapArray(os.path.join(path, name + ".bin"), dtype))
+
+    @staticmethod
+    def exists(path):
+        """
+        \brief The function returns True if the forward index has been written in path.
+        \param path :str = directory of the CsrIndex
+        \return bool = True if all the files of the forward index exist
+        """
+        return all(os.path.exists(os.path.join(path, name + ".bin")) for name in ForwardIndex.FILES)
+
+    @classmethod
+    def write(cls, index, termIds):
+        """
+        \brief The function writes the forward index of a CsrIndex in its directory.
+        \details The postings are counted by document, then moved block by block to their position in the output files,
+        which are memory-mapped. Inside a document the words are in the order of the CsrIndex.
+        \param index :CsrIndex = inverted index
+        \param termIds :numpy.array = id in the vocabulary of every word of the index, in the order of the index
+        """
+        np.asarray(termIds, dtype=np.int32).tofile(os.path.join(index.path, "forwardVocabulary.bin"))
+        nDocs = len(index.titleOrder)
+        counts = np.bincount(index.docs, minlength=nDocs) if len(index.docs) > 0 else np.zeros(nDocs, dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        offsets.tofile(os.path.join(index.path, "forwardOffsets.bin"))
+        total = int(offsets[-1])
+        if total == 0:
+            for name in ("forwardTerms", "forwardTfs"):
+                open(os.path.join(index.path, name + ".bin"), 'wb').close()
+            return
+        terms = np.memmap(os.path.join(index.path, "forwardTerms.bin"), dtype=np.int32, mode='w+', shape=(total,))
+        tfs = np.memmap(os.path.join(index.path, "forwardTfs.bin"), dtype=np.float32, mode='w+', shape=(total,))
+        following = offsets[:-1].copy()
+        for start in range(0, total, cls.BLOCK_SIZE):
+            end = min(start + cls.BLOCK_SIZE, total)
+            docs = np.asarray(index.docs[start:end], dtype=np.int64)
+            words = np.searchsorted(index.offsets, np.arange(start, end), side='right') - 1
+            order = np.argsort(docs, kind='stable')
+            docs = docs[order]
+            first = np.searchsorted(docs, docs, side='left')
+            positions = following[docs] + (np.arange(len(docs)) - first)
+            terms[positions] = words[order]
+            tfs[positions] = index.tfs[start:end][order]
+            unique, n = np.unique(docs, return_counts=True)
+            following[unique] += n
+        terms.flush()
+        tfs.flush()
+        del terms, tfs
+
+    def vector(self, doc):
+        """
+        \brief The function returns the words of a document, without copying them.
+        \param doc :int = id of the document in the CsrIndex
+        \return (numpy.array, numpy.array) = (positions of the words in the CsrIndex, TF)
+        """
+        start, end = self.forwardOffsets[doc], self.forwardOffsets[doc + 1]
+        return self.forwardTerms[start:end], self.forwardTfs[start:end]
+
+    def __len__(self):
+        return len(self.forwardOffsets) - 1
@@ -0,0 +1,184 @@
+import os
+import multiprocessing
+import numpy as np
+import scipy.sparse
+
+class NeighbourGraph:
+    """
+     \author Biasini Mirko s181753, Carmignani Vittorio s181755, Joao Alemao s182312
+     \version 1.0
+     \brief Library to find the most similar pages of every page, without computing the whole similarity matrix
+     \details The rows of the TF-IDF matrix are normalised, so the cosine similarities of a block of pages with all the pages
+     are one sparse product. The blocks are computed one at a time (or by a pool of forked processes), and only the k most
+     similar pages of every page (and, if a threshold is given, only the ones at least as similar) are kept and written in
+     a file of the block. The memory used depends on the size of a block, not on the square of the number of pages, and the
+     blocks already written are skipped, so an interrupted #build can be resumed. At the end the blocks are merged in one
+     sparse matrix (pages x pages), the kNN graph.
+    """
+
+    ##Name of the file of a block, formatted with its first row
+    BLOCK_NAME = "block_%09d.npz"
+    ##Name of the file of the parameters of the blocks written in the directory
+    PARAMS_NAME = "params.txt"
+    ##Name of the file of the merged graph
+    GRAPH_NAME = "graph.npz"
+
+    def __init__(self, path, matrix, k = 10, threshold = None, blockSize = 512):
+        """
+        \brief Default constructor.
+        \param path :str = directory of the blocks and of the graph
+        \param matrix :scipy.sparse.csr_matrix = pages x words, rows normalised (e.g. TfidfMatrix.matrix)
+        \param k :int (default=10) = number of neighbours kept for every page
+        \param threshold :float (default=None) = if not None only the neighbours with at least this similarity are kept
+        \param blockSize :int (default=512) = number of pages of a block
+        """
+        ##type:str = directory of the blocks and of the graph
+        self.path = path
+        ##type:scipy.sparse.csr_matrix = pages x words, rows normalised
+        self.matrix = matrix
+        ##type:scipy.sparse.csr_matrix = transpose of #matrix, words x pages
+        self.transposed = matrix.T.tocsr()
+        ##type:int = number of neighbours kept for every page
+        self.k = k
+        ##type:float = minimum similarity of a neighbour, None for no limit
+        self.threshold = threshold
+        ##type:int = number of pages of a block
+        self.blockSize = blockSize
+
+    def blocks(self):
+        """
+        \brief The function returns the blocks of rows.
+        \return list = (first row, end) of every block
+        """
+        n = self.matrix.shape[0]
+        return [(start, min(start + self.blockSize, n)) for start in range(0, n, self.blockSize)]
+
+    def params(self):
+        """
+        \brief The function returns the parameters which the blocks depend on, as written in #PARAMS_NAME.
+        \return str = parameters
+        """
+        return "pages=%d words=%d nnz=%d k=%d threshold=%r blockSize=%d" % (self.matrix.shape + (self.matrix.nnz, self.k, self.threshold, self.blockSize))
+
+    def prepare(self):
+        """
+        \brief The function creates the directory and deletes the blocks written with different parameters, which cannot be resumed.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        name = os.path.join(self.path, self.PARAMS_NAME)
+        if os.path.exists(name):
+            with open(name, 'r') as f:
+                if f.read() == self.params():
+                    return
+        for f in os.listdir(self.path):
+            if f.startswith("block_") or f == self.GRAPH_NAME:
+                os.remove(os.path.join(self.path, f))
+        with open(name, 'w') as f:
+            f.write(self.params())
+
+    def computeBlock(self, start, end):
+        """
+        \brief The function computes the neighbours of the pages of a block.
+        \details The page itself is not a neighbour. The neighbours of every page are sorted by decreasing similarity.
+        \param start :int = first row of the block
+        \param end :int = end of the block
+        \return (numpy.array, numpy.array, numpy.array) = (start of the neighbours of every page and end of the last one,
+        rows of the neighbours, similarities), as the arrays of a csr_matrix
+        """
+        similarities = (self.matrix[start:end] @ self.transposed).tocsr()
+        indptr, indices, data = [0], [], []
+        for i in range(end - start):
+            columns = similarities.indices[similarities.indptr[i]:similarities.indptr[i + 1]]
+            values = similarities.data[similarities.indptr[i]:similarities.indptr[i + 1]]
+            keep = columns != start + i
+            if self.threshold is not None:
+                keep &= values >= self.threshold
+            columns, values = columns[keep], values[keep]
+            if len(values) > self.k:
+                best = np.argpartition(-values, self.k - 1)[:self.k]
+                columns, values = columns[best], values[best]
+            order = np.lexsort((columns, -values))
+            indices.append(columns[order])
+            data.append(values[order])
+            indptr.append(indptr[-1] + len(order))
+        return (np.array(indptr, dtype=np.int64), np.concatenate(indices).astype(np.int32) if indices else np.zeros(0, dtype=np.int32),
+                np.concatenate(data).astype(np.float32) if data else np.zeros(0, dtype=np.float32))
+
+    def writeBlock(self, start, end):
+        """
+        \brief The function computes a block and writes it; the file appears only when it is complete.
+        \param start :int = first row of the block
+        \param end :int = end of the block
+        \return int = first row of the block
+        """
+        indptr, indices, data = self.computeBlock(start, end)
+        name = os.path.join(self.path, self.BLOCK_NAME % start)
+        with open(name + ".tmp", 'wb') as handle:
+            np.savez(handle, indptr=indptr, indices=indices, data=data)
+        os.replace(name + ".tmp", name)
+        return start
+
+    def build(self, processes = 1):
+        """
+        \brief The function computes the blocks not written yet and merges all of them in the graph (see #merge).
+        \param processes :int (default=1) = number of forked processes computing the blocks, 1 to compute them in this process
+        \return scipy.sparse.csr_matrix = kNN graph, pages x pages, values = cosine similarities
+        """
+        self.prepare()
+        pending = [b for b in self.blocks() if not os.path.exists(os.path.join(self.path, self.BLOCK_NAME % b[0]))]
+        if processes > 1 and len(pending) > 1:
+            with multiprocessing.get_context("fork").Pool(processes, initializer=initGraph, initargs=(self,)) as workers:
+                for start in workers.imap_unordered(blockWorker, pending):
+                    pass
+        else:
+            for start, end in pending:
+                self.writeBlock(start, end)
+        return self.merge()
+
+    def merge(self):
+        """
+        \brief The function merges the blocks in one sparse matrix and saves it in #GRAPH_NAME.
+        \return scipy.sparse.csr_matrix = kNN graph, pages x pages, values = cosine similarities
+        """
+        n = self.matrix.shape[0]
+        indptr, indices, data = [np.zeros(1, dtype=np.int64)], [], []
+        for start, end in self.blocks():
+            with np.load(os.path.join(self.path, self.BLOCK_NAME % start)) as f:
+                indptr.append(f["indptr"][1:] + indptr[-1][-1])
+                indices.append(f["indices"])
+                data.append(f["data"])
+        graph = scipy.sparse.csr_matrix((np.concatenate(data) if data else np.zeros(0, dtype=np.float32),
+                                         np.concatenate(indices) if indices else np.zeros(0, dtype=np.int32),
+                                         np.concatenate(indptr)), shape=(n, n))
+        scipy.sparse.save_npz(os.path.join(self.path, self.GRAPH_NAME), graph)
+        return graph
+
+    @classmethod
+    def load(cls, path):
+        """
+        \brief The function reads the graph saved by #merge.
+        \param path :str = directory of the graph
+        \return scipy.sparse.csr_matrix = kNN graph, None if it has not been built
+        """
+        name = os.path.join(path, cls.GRAPH_NAME)
+        return scipy.sparse.load_npz(name) if os.path.exists(name) else None
+
+
+##type:NeighbourGraph = graph computed by the worker processes of NeighbourGraph.build
+workerGraph = None
+
+def initGraph(graph):
+    """
+    \brief Initializer of the worker processes of NeighbourGraph.build: the forked process shares the matrices of the parent.
+    \param graph :NeighbourGraph = graph of the parent process
+    """
+    global workerGraph
+    workerGraph = graph
+
+def blockWorker(block):
+    """
+    \brief The function executed by the worker processes of NeighbourGraph.build.
+    \param block :tuple = (first row, end) of the block
+    \return int = first row of the block
+    """
+    return workerGraph.writeBlock(*block)
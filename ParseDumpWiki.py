@@ -1,8 +1,17 @@
 import xml.etree.ElementTree as etree
 import re
+import os
+import bz2
+import bisect
+import hashlib
+import multiprocessing
+import itertools
+import resource
+import xml.parsers.expat as expat
 import pandas as pd
 import numpy as np
 from DatabaseWiki import databaseWiki
+from WikiTextStripper import WikiTextStripper
 import mwparserfromhell as parse
 from tqdm import tqdm
 
@@ -18,17 +27,35 @@ class ParseDumpWiki:
 
     ##Path in which the dump is located
     DUMP_PATH = 'Wikipedia/enwiki-latest-pages-articles.xml'
+    ##Path of the index of the dump, used only when #DUMP_PATH is a multistream bz2 dump (pages-articles-multistream.xml.bz2)
+    INDEX_PATH = 'Wikipedia/enwiki-latest-pages-articles-multistream-index.txt.bz2'
     ##type:int = number of tag=page parsed, which comprends every type of page
     totalCount = 0
     ##type:int = number of actual pages parsed
     pagesCount = 0
 
-    def __init__(self):
+    ##type:bool = if True the dump is read by #iterPagesStreaming (expat), otherwise by #iterPages (ElementTree)
+    STREAMING = True
+    ##type:bool = if True the text is stripped with WikiTextStripper, otherwise with mwparserfromhell
+    FAST_STRIP = True
+    ##type:int = size in bytes of the chunks in which the dump is split by #parseParallel
+    CHUNK_SIZE = 64 * 1024 * 1024
+
+    def __init__(self, openDatabase = True, db = None):
         """
         \brief Default constructor, all parameters are initialized.
+        \param openDatabase :bool (default=True) = if False no database is opened and the frequency distributions are
+        kept in #documents (it is used by the workers of #parseParallel).
+        \param db :databaseWiki (default=None) = database to be used, if None a new one is opened.
         """
         ##type:databaseWiki = access to the database
-        self.db = databaseWiki()
+        self.db = db if db is not None or not openDatabase else databaseWiki()
+        ##type:dict = keys = documents title, values = freqDist of the document. Used only when #db is None
+        self.documents = dict()
+        ##type:dict = keys = normalized page title, values = offset of the bz2 stream which contains the page. Loaded by #loadIndex
+        self.index = None
+        ##type:list = sorted offsets of the bz2 streams listed in #index
+        self.streams = None
         ##type:set = pairs (title of category, title of page) to be saved in #db
         self.listCatPag= set()
         ##type:set =  categories' title to be saved in #db
@@ -37,6 +64,8 @@ class ParseDumpWiki:
         self.listPag = set()
         ##type:set = pairs (title of category, title of sub_category) to be saved in #db
         self.listCatSub = set()
+        ##type:set = pairs (title of page, hash of its text) to be saved in #db
+        self.listHash = set()
     
     @staticmethod
     def strip_tag_name(t):
@@ -57,12 +86,19 @@ class ParseDumpWiki:
         \param textCategories :str  = raw text which comprends the keywords [[Category:....|...]
         \param title :str  = title of the page 
         """
-        res = re.findall(r"\[\[Category:(.*?)[\||\]\]]",textCategories)
         self.listPag.add(title)
-        for r in res:
-            ct = self.normName(r)
+        for ct in self.findCategories(textCategories):
             self.listCat.add(ct)
             self.listCatPag.add((ct,title))
+
+    @classmethod
+    def findCategories(cls,textCategories):
+        """
+        \brief The function returns the normalized names of the categories of a page.
+        \param textCategories :str  = raw text which comprends the keywords [[Category:....|...]
+        \return list = categories' name
+        """
+        return [cls.normName(r) for r in re.findall(r"\[\[Category:(.*?)[\||\]\]]",textCategories)]
     
     @staticmethod
     def normName(name):
@@ -93,14 +129,17 @@ class ParseDumpWiki:
     def saveData(self):
         """
         \brief This function call the function insertCatPagList() passing the following values:
-        #listCatPag, #listCat, #listPag, #listCatSub (in order to save and insert the data in the database). Then,
+        #listCatPag, #listCat, #listPag, #listCatSub, #listHash (in order to save and insert the data in the database). Then,
         the variable are initialized to set().
+        \return float = rows inserted per second
         """
-        self.db.inserCatPagList(self.listCatPag,self.listCat,self.listPag,self.listCatSub)
+        rate = self.db.inserCatPagList(self.listCatPag,self.listCat,self.listPag,self.listCatSub,self.listHash)
         self.listCatPag= set()
         self.listCat= set()
         self.listPag = set()
         self.listCatSub = set()
+        self.listHash = set()
+        return rate
 
     def saveText(self,text,title):
         """
@@ -108,31 +147,37 @@ class ParseDumpWiki:
         \param text :str = raw text to be cleaned by the Wikipedia tags and saved.
         \param title :str = title of the page which contain text.
         """
-        wiki = parse.parse(text)
-        self.db.saveDocument(text=wiki.strip_code().strip(),title=title)
+        if self.FAST_STRIP:
+            text = WikiTextStripper.strip(text).strip()
+        else:
+            text = parse.parse(text).strip_code().strip()
+        if self.db is None:
+            self.documents[title] = databaseWiki.transformDocument(text)
+        else:
+            self.db.saveDocument(text=text,title=title)
 
-    def parse(self, maxNumberPages = 100000):
+    def iterPages(self, events):
         """
-        \brief The function parse the DUMP file and save the relative information. Each time the database is re-created.
-        \details The function call the function createDatabase. Parsing the DUMP file, 
-        are skipped all the pages which have: 'redirect' tag, number of template different from 14 (category) or 0 (page), no text, 
-        no categories. For those pages aligned with the above requirements, the following functions are called: #insertCatSub, #normName, #insertCategoryPage 
-        #saveText. The parse stops when it has analyzed #maxNumberPages.
-        \param maxNumberPages :int = valid pages to be analyzed
+        \brief The function reads the events of an xml parser and returns the pages found one by one.
+        \param events :iterator = pairs (event, element) as returned by etree.iterparse
+        \return iterator = tuples (title, isCategoryPage, isValid, text), one for each tag page
         """
-        self.db.createDatabase()
-
         title = None
         isCategoryPage = False
         isValid = True
+        text = None
+        root = None
 
-        for event, elem in etree.iterparse(self.DUMP_PATH, events=('start', 'end')):
+        for event, elem in events:
             tname = self.strip_tag_name(elem.tag)
             if event == 'start':
+                if root is None:
+                    root = elem
                 if tname == 'page':
                     title = None
                     isCategoryPage = False
                     isValid = True
+                    text = None
             else:
                 if tname == 'title':
                     title = self.normName(elem.text)
@@ -145,31 +190,516 @@ class ParseDumpWiki:
                     isValid = False
                 elif isValid and tname == 'text':
                     text = elem.text
-                    if(text is not None):
-                        c = text.find('[[Category:')
-                        if(c!=-1):
-                            if (not isCategoryPage):
-                                self.saveText(text[:c],title)
-                                self.insertCategoryPage(text[c:],title)
-                            else:
-                                self.insertCatSub(text[c:],title)
                 elif tname == 'page':
-                    self.totalCount += 1
-                    if isValid:
-                        self.pagesCount += 1
-                    if self.pagesCount%10000 == 0:
-                        self.saveData()
-                        print(self.pagesCount)
-                        if(self.pagesCount==maxNumberPages):
-                            break
+                    yield title, isCategoryPage, isValid, text
+                    root.clear()
                 elem.clear()
 
+    def iterPagesStreaming(self, blocks):
+        """
+        \brief The function parses the xml with expat and returns the pages found one by one, using constant memory.
+        \details No tree is built: only the character data of the tags title, ns and text (this last one only for valid
+        pages) is buffered, every other tag is skipped.
+        \param blocks :iterator = blocks of bytes of the xml document
+        \return iterator = tuples (title, isCategoryPage, isValid, text), one for each tag page
+        """
+        pages = []
+        page = dict()
+        buf = []
+        collecting = [None]
+
+        def start(name, attrs):
+            if name == 'page':
+                page.clear()
+                page.update(title=None, isCategoryPage=False, isValid=True, text=None)
+            elif name in ('title', 'ns') or (name == 'text' and page.get('isValid')):
+                collecting[0] = name
+                del buf[:]
+            elif name == 'redirect':
+                page['isValid'] = False
+
+        def end(name):
+            if name == collecting[0]:
+                collecting[0] = None
+                value = ''.join(buf)
+                if name == 'title':
+                    page['title'] = self.normName(value)
+                elif name == 'ns':
+                    if value == "14":
+                        page['isCategoryPage'] = True
+                    elif value != "0":
+                        page['isValid'] = False
+                elif page['isValid']:
+                    page['text'] = value
+            elif name == 'page':
+                pages.append((page['title'], page['isCategoryPage'], page['isValid'], page['text']))
+
+        def characters(data):
+            if collecting[0] is not None:
+                buf.append(data)
+
+        parser = expat.ParserCreate()
+        parser.buffer_text = True
+        parser.StartElementHandler = start
+        parser.EndElementHandler = end
+        parser.CharacterDataHandler = characters
+        for block in blocks:
+            parser.Parse(block, False)
+            for p in pages:
+                yield p
+            del pages[:]
+        parser.Parse(b'', True)
+        for p in pages:
+            yield p
+
+    def readPages(self, path = None, blockSize = 1024 * 1024):
+        """
+        \brief The function returns the pages of the dump one by one, using #iterPagesStreaming if #STREAMING is True or #iterPages otherwise.
+        \param path :str (default=None) = path of the xml (or bz2) file, if None #DUMP_PATH is used
+        \param blockSize :int (default=1MB) = number of bytes read at each step by the streaming parser
+        \return iterator = tuples (title, isCategoryPage, isValid, text)
+        """
+        with self.openDump(path) as dump:
+            if self.STREAMING:
+                pages = self.iterPagesStreaming(iter(lambda: dump.read(blockSize), b''))
+            else:
+                pages = self.iterPages(etree.iterparse(dump, events=('start', 'end')))
+            for page in pages:
+                yield page
+
+    def readChunkPages(self, path, start, end):
+        """
+        \brief The function returns the pages of the byte range [start, end) of the dump, see #readRange.
+        \param path :str = path of the dump file
+        \param start :int = offset of the first tag page of the range (of its stream for a bz2 dump)
+        \param end :int = offset in which the range ends
+        \return iterator = tuples (title, isCategoryPage, isValid, text)
+        """
+        if self.STREAMING:
+            return self.iterPagesStreaming(itertools.chain([b'<chunk>'], self.readRange(path, start, end), [b'</chunk>']))
+        return self.iterPages(self.iterChunk(path, start, end))
+
+    @staticmethod
+    def getRSS():
+        """
+        \brief The function returns the resident memory of the process.
+        \return float = resident set size in MB (peak resident size where /proc is not available)
+        """
+        try:
+            with open('/proc/self/statm') as f:
+                return int(f.read().split()[1]) * resource.getpagesize() / 1024.0 ** 2
+        except IOError:
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+    def memoryReport(self, maxNumberPages = None, every = 10000):
+        """
+        \brief The function reads the dump without saving anything and prints the resident memory of the process every
+        #every pages, in order to check that the parser runs in constant memory.
+        \param maxNumberPages :int (default=None) = number of tag page after which the scan stops, if None the whole dump is read.
+        \param every :int (default=10000) = number of tag page between two samples
+        \return list = pairs (tag page read, resident memory in MB)
+        """
+        rows = [(0, self.getRSS())]
+        n = 0
+        for page in self.readPages():
+            n += 1
+            if n % every == 0:
+                rows.append((n, self.getRSS()))
+            if n == maxNumberPages:
+                break
+        if n % every != 0:
+            rows.append((n, self.getRSS()))
+        databaseWiki.printResults(title="Memory (%s parser)" % ("expat" if self.STREAMING else "ElementTree"),
+                                  columns=["Pages", "RSS (MB)"], rows=[(p, "%0.1f" % m) for p, m in rows])
+        return rows
+
+    def openDump(self, path = None):
+        """
+        \brief The function opens the dump in binary mode. A bz2 dump is decompressed on the fly.
+        \param path :str (default=None) = path of the xml (or bz2) file, if None #DUMP_PATH is used
+        \return file = the opened dump
+        """
+        path = path or self.DUMP_PATH
+        if path.endswith('.bz2'):
+            return bz2.open(path, 'rb')
+        return open(path, 'rb')
+
+    def loadIndex(self):
+        """
+        \brief The function reads #INDEX_PATH (lines "offset:page id:title") and fills #index and #streams.
+        """
+        self.index = dict()
+        streams = set()
+        with bz2.open(self.INDEX_PATH, 'rt', encoding='utf-8') as f:
+            for line in f:
+                offset, _, title = line.rstrip('\n').split(':', 2)
+                offset = int(offset)
+                self.index[self.normName(title)] = offset
+                streams.add(offset)
+        self.streams = sorted(streams)
+
+    @staticmethod
+    def streamEnd(f, offset, blockSize = 64 * 1024):
+        """
+        \brief The function returns the offset in which the bz2 stream starting at offset ends.
+        \param f :file = compressed dump opened in binary mode
+        \param offset :int = offset of the stream
+        \param blockSize :int (default=64KB) = number of bytes read at each step
+        \return int = offset of the first byte after the stream
+        """
+        f.seek(offset)
+        dec = bz2.BZ2Decompressor()
+        read = 0
+        while not dec.eof:
+            block = f.read(blockSize)
+            if not block:
+                break
+            read += len(block)
+            dec.decompress(block)
+        return offset + read - len(dec.unused_data)
+
+    def getPage(self, title):
+        """
+        \brief The function reads a single page from a multistream bz2 dump, decompressing only the stream which contains it.
+        \param title :str = title of the page
+        \return tuple = (title, isCategoryPage, isValid, text) as returned by #iterPages, None if the page is not found
+        """
+        if self.index is None:
+            self.loadIndex()
+        title = self.normName(title)
+        offset = self.index.get(title)
+        if offset is None:
+            return None
+        i = bisect.bisect_right(self.streams, offset)
+        if i < len(self.streams):
+            end = self.streams[i]
+        else:
+            with open(self.DUMP_PATH, 'rb') as f:
+                end = self.streamEnd(f, offset)
+        for page in self.readChunkPages(self.DUMP_PATH, offset, end):
+            if page[0] == title:
+                return page
+        return None
+
+    def processPage(self, title, isCategoryPage, isValid, text):
+        """
+        \brief The function updates the counters and, if the page is valid, saves its text and its categories.
+        \param title :str = normalized title of the page
+        \param isCategoryPage :bool = True if the page belongs to the namespace 14 (category)
+        \param isValid :bool = False if the page is a redirect or does not belong to the namespaces 0 or 14
+        \param text :str = raw text of the page
+        """
+        self.totalCount += 1
+        if not isValid:
+            return
+        self.pagesCount += 1
+        if(text is not None):
+            c = text.find('[[Category:')
+            if(c!=-1):
+                self.listHash.add((title, self.textHash(text)))
+                if (not isCategoryPage):
+                    self.saveText(text[:c],title)
+                    self.insertCategoryPage(text[c:],title)
+                else:
+                    self.insertCatSub(text[c:],title)
+
+    @staticmethod
+    def textHash(text):
+        """
+        \brief The function returns the hash of the raw text of a page, used to find the pages changed between two dumps.
+        \param text :str = raw text of the page
+        \return str = hexadecimal sha1 of the text
+        """
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    def update(self, path, deleted = (), fullDump = False):
+        """
+        \brief The function applies to the database the pages added, changed or deleted in a newer dump or in an adds/changes file.
+        \details The pages whose text has the same hash saved by the previous parse are skipped, so only the pages actually
+        changed are stripped and transformed. The old rows of a changed page are removed before the new ones are saved, and
+        its new frequency distribution is returned instead of being added to databaseWiki.documents (see databaseWiki.pending),
+        which is not read. The inverted index and the centroids are not modified: the returned values must be passed to
+        databaseWiki.updateInvertedIndex and Categorization.updateCentroids (see Categorization.refresh).
+        \param path :str = path of the xml (or bz2) file with the new version of the pages
+        \param deleted :list (default=()) = titles of the pages deleted, an adds/changes file does not contain them
+        \param fullDump :bool (default=False) = True if path is a complete dump: the saved pages which are not in it are deleted
+        \return (dict, set) = (keys: document's title values: new freqDist, None if the page has been deleted, categories' name whose pages changed)
+        """
+        stored = self.db.getHashes() if fullDump else None
+        current = dict()
+        seen = set()
+        changes = dict()
+        categories = set()
+        self.db.pending = changes
+        try:
+            for title, isCategoryPage, isValid, text in self.readPages(path):
+                seen.add(title)
+                c = text.find('[[Category:') if isValid and text is not None else -1
+                newHash = self.textHash(text) if c != -1 else None
+                if title in current:
+                    oldHash = current[title]
+                    self.saveData()
+                elif stored is not None:
+                    oldHash = stored.get(title)
+                else:
+                    oldHash = self.db.getHash(title)
+                current[title] = newHash
+                if newHash == oldHash:
+                    continue
+                if oldHash is not None:
+                    self.removePage(title, changes, categories)
+                if newHash is not None:
+                    self.processPage(title, isCategoryPage, isValid, text)
+                    if not isCategoryPage:
+                        categories.update(self.findCategories(text[c:]))
+                if len(self.listHash) >= 10000:
+                    self.saveData()
+            self.saveData()
+        finally:
+            self.db.pending = None
+        if fullDump:
+            deleted = set(deleted).union(set(stored) - seen)
+        for title in deleted:
+            title = self.normName(title)
+            if current.get(title) is None and self.db.getHash(title) is not None:
+                self.removePage(title, changes, categories)
+        return changes, categories
+
+    def removePage(self, title, changes, categories):
+        """
+        \brief The function deletes a page (or a category page) saved in the database, used by #update.
+        \param title :str = normalized title of the page
+        \param changes :dict = changed documents, the page is added to it as deleted (its new version, if any, replaces it)
+        \param categories :set = changed categories, the categories of the page are added to it
+        """
+        if title.startswith('Category:'):
+            self.db.removeCategoryPage(title)
+            return
+        categories.update(self.db.removePage(title))
+        changes[title] = None
+
+    def parse(self, maxNumberPages = 100000, bulkLoad = True, memoryBudget = None):
+        """
+        \brief The function parse the DUMP file and save the relative information. Each time the database is re-created.
+        \details The function call the function createDatabase. Parsing the DUMP file, 
+        are skipped all the pages which have: 'redirect' tag, number of template different from 14 (category) or 0 (page), no text, 
+        no categories. For those pages aligned with the above requirements, the following functions are called: #insertCatSub, #normName, #insertCategoryPage 
+        #saveText. The parse stops when it has analyzed #maxNumberPages.
+        \param maxNumberPages :int = valid pages to be analyzed
+        \param bulkLoad :bool (default=True) = if True the rows are saved with databaseWiki.beginBulkLoad/endBulkLoad
+        \param memoryBudget :int (default=None) = if not None the inverted index is built during the parse in the SPIMI mode,
+        using at most memoryBudget MB (see databaseWiki.useSpimi)
+        """
+        self.db.createDatabase()
+        if bulkLoad:
+            self.db.beginBulkLoad()
+        if memoryBudget is not None:
+            self.db.useSpimi(memoryBudget)
+
+        flushed = self.pagesCount
+        for page in self.readPages():
+            self.processPage(*page)
+            if self.pagesCount != flushed and self.pagesCount%10000 == 0:
+                flushed = self.pagesCount
+                rate = self.saveData()
+                print("%d (%d rows/s)" % (self.pagesCount, rate))
+                if(self.pagesCount==maxNumberPages):
+                    break
+
         self.saveData()
+        if bulkLoad:
+            self.db.endBulkLoad()
         self.db.close()
 
+    def findChunks(self, chunkSize):
+        """
+        \brief The function splits #DUMP_PATH in byte ranges which start with a tag page and end before the next one.
+        A multistream bz2 dump is split at the boundaries of its streams, using #streams.
+        \param chunkSize :int = approximate size in bytes of each range (compressed bytes for a bz2 dump)
+        \return list = pairs (start, end) of byte offsets
+        """
+        if self.DUMP_PATH.endswith('.bz2'):
+            if self.streams is None:
+                self.loadIndex()
+            starts = []
+            for offset in self.streams:
+                if not starts or offset - starts[-1] >= chunkSize:
+                    starts.append(offset)
+            with open(self.DUMP_PATH, 'rb') as f:
+                end = self.streamEnd(f, self.streams[-1]) if starts else 0
+            return list(zip(starts, starts[1:] + [end]))
+
+        path = self.DUMP_PATH
+        size = os.path.getsize(path)
+        starts = []
+        with open(path, 'rb') as f:
+            pos = 0
+            while pos < size:
+                start = ParseDumpWiki.findTag(f, pos, b'<page>')
+                if start == -1:
+                    break
+                starts.append(start)
+                pos = start + chunkSize
+            f.seek(max(0, size - 1024 * 1024))
+            tail = f.read()
+        end = tail.rfind(b'</page>')
+        end = size - len(tail) + end + len(b'</page>') if end != -1 else size
+        return list(zip(starts, starts[1:] + [end]))
+
+    @staticmethod
+    def findTag(f, pos, tag, blockSize = 1024 * 1024):
+        """
+        \brief The function returns the offset of the first occurrence of tag after the offset pos.
+        \param f :file = file opened in binary mode
+        \param pos :int = offset from which the search starts
+        \param tag :bytes = tag to be found
+        \param blockSize :int (default=1MB) = number of bytes read at each step
+        \return int = offset of the tag, -1 if it is not found
+        """
+        f.seek(pos)
+        carry = b''
+        while True:
+            block = f.read(blockSize)
+            if not block:
+                return -1
+            buf = carry + block
+            idx = buf.find(tag)
+            if idx != -1:
+                return pos - len(carry) + idx
+            carry = buf[-(len(tag) - 1):]
+            pos += len(block)
+
+    @staticmethod
+    def readRange(path, start, end, blockSize = 1024 * 1024):
+        """
+        \brief The function reads the byte range [start, end) of the dump. If the dump is a multistream bz2 file the range must
+        contain whole streams, which are decompressed one after the other.
+        \param path :str = path of the dump file
+        \param start :int = offset in which the range starts
+        \param end :int = offset in which the range ends
+        \param blockSize :int (default=1MB) = number of bytes read at each step
+        \return iterator = blocks of (decompressed) bytes
+        """
+        compressed = path.endswith('.bz2')
+        dec = bz2.BZ2Decompressor()
+        with open(path, 'rb') as f:
+            f.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                block = f.read(min(blockSize, remaining))
+                if not block:
+                    break
+                remaining -= len(block)
+                if not compressed:
+                    yield block
+                    continue
+                while block:
+                    data = dec.decompress(block)
+                    if data:
+                        yield data
+                    if dec.eof:
+                        block = dec.unused_data
+                        dec = bz2.BZ2Decompressor()
+                    else:
+                        block = b''
+
+    @staticmethod
+    def iterChunk(path, start, end, blockSize = 1024 * 1024):
+        """
+        \brief The function parses the byte range [start, end) of the dump and returns the xml events. The range is
+        wrapped in a fake root so that it is a well formed document.
+        \param path :str = path of the dump file
+        \param start :int = offset of the first tag page of the range (of its stream for a bz2 dump)
+        \param end :int = offset in which the range ends
+        \param blockSize :int (default=1MB) = number of bytes fed to the parser at each step
+        \return iterator = pairs (event, element) as returned by etree.iterparse
+        """
+        parser = etree.XMLPullParser(events=('start', 'end'))
+        parser.feed(b'<chunk>')
+        for block in ParseDumpWiki.readRange(path, start, end, blockSize):
+            parser.feed(block)
+            for event in parser.read_events():
+                yield event
+        parser.feed(b'</chunk>')
+        for event in parser.read_events():
+            yield event
+        parser.close()
+
+    def parseParallel(self, nWorkers = None, chunkSize = None, bulkLoad = True, memoryBudget = None):
+        """
+        \brief The function parses the whole DUMP file using a pool of processes. Each time the database is re-created.
+        \details The dump is split by #findChunks in ranges aligned to the tag page (or to the streams of a multistream bz2 dump). Every worker parses a range with
+        #parseChunk and returns its sets of categories/pages and the frequency distributions of its documents, which are merged
+        in the database and in the dictionary of documents as soon as they arrive. The pickles are saved by databaseWiki.close.
+        \param nWorkers :int (default=None) = number of processes, if None the number of cores is used.
+        \param chunkSize :int (default=None) = size in bytes of the ranges, if None #CHUNK_SIZE is used.
+        \param bulkLoad :bool (default=True) = if True the rows are saved with databaseWiki.beginBulkLoad/endBulkLoad
+        \param memoryBudget :int (default=None) = if not None the inverted index is built in the SPIMI mode (see #parse)
+        """
+        self.db.createDatabase()
+        if bulkLoad:
+            self.db.beginBulkLoad()
+        if memoryBudget is not None:
+            self.db.useSpimi(memoryBudget)
+        chunks = self.findChunks(chunkSize or self.CHUNK_SIZE)
+        with multiprocessing.Pool(nWorkers) as pool:
+            for result in tqdm(pool.imap_unordered(parseChunk, [(self.DUMP_PATH, s, e) for s, e in chunks]), total=len(chunks)):
+                self.mergeChunk(*result)
+        if bulkLoad:
+            self.db.endBulkLoad()
+        self.db.close()
+
+    def mergeChunk(self, listCatPag, listCat, listPag, listCatSub, listHash, documents, totalCount, pagesCount):
+        """
+        \brief The function saves in the database the results of a chunk parsed by #parseChunk.
+        \param listCatPag :set = pairs (title of category, title of page)
+        \param listCat :set = categories' title
+        \param listPag :set = pages' title
+        \param listCatSub :set = pairs (title of category, title of sub_category)
+        \param listHash :set = pairs (title of page, hash of its text)
+        \param documents :dict = keys = documents title, values = freqDist of the document
+        \param totalCount :int = number of tag page parsed in the chunk
+        \param pagesCount :int = number of valid pages parsed in the chunk
+        """
+        self.db.inserCatPagList(listCatPag, listCat, listPag, listCatSub, listHash)
+        for title, freqDist in documents.items():
+            self.db.addDocument(title, freqDist)
+        self.totalCount += totalCount
+        self.pagesCount += pagesCount
+
+    def compareStrippers(self, nPages = 1000):
+        """
+        \brief The function compares WikiTextStripper with mwparserfromhell on the first nPages articles of the dump and
+        prints the similarity of the indexed tokens and the time spent by both.
+        \param nPages :int (default=1000) = number of articles in the sample
+        \return dict = results of WikiTextStripper.compare
+        """
+        texts = []
+        for title, isCategoryPage, isValid, text in self.readPages():
+            if isValid and not isCategoryPage and text is not None and text.find('[[Category:') != -1:
+                texts.append(text[:text.find('[[Category:')])
+                if len(texts) == nPages:
+                    break
+        res = WikiTextStripper.compare(texts)
+        print("Pages: {:,}, fallbacks to mwparserfromhell: {:,}".format(res["pages"], res["fallbacks"]))
+        print("Token similarity: mean %0.4f, min %0.4f" % (res["similarity"], res["minSimilarity"]))
+        print("mwparserfromhell: %0.2fs, WikiTextStripper: %0.2fs, speedup %0.1fx" % (res["timeParser"], res["timeFast"], res["speedup"]))
+        return res
+
     def printStats(self):
         """
         \brief The function print the number of total tags page and actual pages scanned.
         """
         print("Total pages: {:,}".format(self.totalCount))
         print("Template pages: {:,}".format(self.pagesCount))
+
+def parseChunk(chunk):
+    """
+    \brief Worker of ParseDumpWiki.parseParallel: it parses a range of the dump without accessing the database.
+    \param chunk :tuple = (path of the dump, start offset, end offset)
+    \return tuple = (listCatPag, listCat, listPag, listCatSub, listHash, documents, totalCount, pagesCount) to be passed to ParseDumpWiki.mergeChunk
+    """
+    p = ParseDumpWiki(openDatabase=False)
+    for page in p.readChunkPages(*chunk):
+        p.processPage(*page)
+    return p.listCatPag, p.listCat, p.listPag, p.listCatSub, p.listHash, p.documents, p.totalCount, p.pagesCount
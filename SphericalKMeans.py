@@ -0,0 +1,206 @@
+import os
+import multiprocessing
+import numpy as np
+import scipy.sparse
+
+class SphericalKMeans:
+    """
+     \author Biasini Mirko s181753, Carmignani Vittorio s181755, Joao Alemao s182312
+     \version 1.0
+     \brief Library to cluster the pages by cosine similarity with mini-batch spherical k-means
+     \details The pages are the rows of the normalised TF-IDF matrix and a page belongs to the centre with the highest cosine
+     similarity. The initial centres are chosen with k-means++ on a sample of the pages, then they are updated with random
+     mini-batches of pages (mini-batch k-means): a centre which has already received count pages moves towards the sum s of
+     the new pages of the batch as count * c + s, then it is normalised. The centres are dense, but a step touches only the
+     words of the batch: the centres are kept scaled (c = centers[i] / norms[i]) and their lengths are updated from the
+     non-zero entries of s. The batch of every step is drawn from a generator seeded with the step, so a run resumed from a
+     saved state (see #save) continues exactly as it would have done. The time of a step does not depend on the number of
+     pages, and the final assignment is linear in it.
+    """
+
+    def __init__(self, nClusters, batchSize = 1024, seed = 0):
+        """
+        \brief Default constructor.
+        \param nClusters :int = number of clusters
+        \param batchSize :int (default=1024) = number of pages of a mini-batch
+        \param seed :int (default=0) = seed of the initial centres and of the mini-batches
+        """
+        ##type:int = number of clusters
+        self.nClusters = nClusters
+        ##type:int = number of pages of a mini-batch
+        self.batchSize = batchSize
+        ##type:int = seed of the initial centres and of the mini-batches
+        self.seed = seed
+        ##type:numpy.array = centres, clusters x words (float32), scaled by #norms; None before #initialize
+        self.centers = None
+        ##type:numpy.array = lengths of the rows of #centers (float64)
+        self.norms = None
+        ##type:numpy.array = number of pages which have updated every centre
+        self.counts = None
+        ##type:int = number of mini-batches done
+        self.step = 0
+
+    def initialize(self, matrix, sampleSize = 20):
+        """
+        \brief The function chooses the initial centres with k-means++ among sampleSize * nClusters random non-empty pages.
+        \details Every new centre is a page of the sample drawn with probability proportional to its cosine distance from the
+        closest centre already chosen.
+        \param matrix :scipy.sparse.csr_matrix = pages x words, rows normalised
+        \param sampleSize :int (default=20) = size of the sample, in number of clusters
+        """
+        nonEmpty = np.flatnonzero(np.diff(matrix.indptr) > 0)
+        if len(nonEmpty) < self.nClusters:
+            raise ValueError("%d non-empty pages, less than the %d clusters" % (len(nonEmpty), self.nClusters))
+        random = np.random.RandomState(self.seed)
+        sample = matrix[np.sort(random.choice(nonEmpty, min(len(nonEmpty), sampleSize * self.nClusters), replace=False))]
+        chosen = [random.randint(sample.shape[0])]
+        distances = 1.0 - np.asarray(sample @ sample[chosen[0]].T.toarray()).ravel()
+        for i in range(1, self.nClusters):
+            distances = np.maximum(distances, 0.0)
+            distances[chosen] = 0.0
+            total = distances.sum()
+            nxt = random.choice(sample.shape[0], p=distances / total) if total > 0 else \
+                random.choice(np.setdiff1d(np.arange(sample.shape[0]), chosen))
+            chosen.append(nxt)
+            distances = np.minimum(distances, 1.0 - np.asarray(sample @ sample[nxt].T.toarray()).ravel())
+        self.centers = sample[chosen].toarray().astype(np.float32)
+        self.norms = np.sqrt((self.centers.astype(np.float64) ** 2).sum(axis=1))
+        self.counts = np.ones(self.nClusters, dtype=np.int64)
+        self.step = 0
+
+    def similarities(self, rows):
+        """
+        \brief The function computes the cosine similarity of some pages with all the centres.
+        \param rows :scipy.sparse.csr_matrix = pages x words, rows normalised
+        \return numpy.array = pages x clusters
+        """
+        return np.asarray(rows @ self.centers.T) / self.norms
+
+    def partialFit(self, rows):
+        """
+        \brief The function moves the centres towards the pages of a mini-batch assigned to them.
+        \param rows :scipy.sparse.csr_matrix = pages of the mini-batch, rows normalised
+        """
+        labels = self.similarities(rows).argmax(axis=1)
+        incidence = scipy.sparse.csr_matrix((np.ones(len(labels)), (labels, np.arange(len(labels)))), shape=(self.nClusters, rows.shape[0]))
+        sums = (incidence @ rows).tocoo()
+        sums.sum_duplicates()
+        #count * c + s = (count / norm) * (centers + (norm / count) * s)
+        scale = self.norms / self.counts
+        added = scale[sums.row] * sums.data
+        dot = np.bincount(sums.row, weights=self.centers[sums.row, sums.col] * added, minlength=self.nClusters)
+        square = np.bincount(sums.row, weights=added ** 2, minlength=self.nClusters)
+        self.centers[sums.row, sums.col] += added.astype(np.float32)
+        self.norms = np.sqrt(np.maximum(self.norms ** 2 + 2 * dot + square, 0.0))
+        self.counts += np.bincount(labels, minlength=self.nClusters)
+        self.step += 1
+
+    def fit(self, matrix, nSteps, path = None, saveEvery = 100):
+        """
+        \brief The function runs the mini-batches up to step nSteps, starting from the current state.
+        \param matrix :scipy.sparse.csr_matrix = pages x words, rows normalised
+        \param nSteps :int = total number of mini-batches
+        \param path :str (default=None) = if not None the state is saved there every saveEvery steps and at the end (see #save)
+        \param saveEvery :int (default=100) = number of steps between two saves
+        """
+        if self.centers is None:
+            self.initialize(matrix)
+        while self.step < nSteps:
+            batch = np.random.RandomState(self.seed + 1 + self.step).randint(0, matrix.shape[0], min(self.batchSize, matrix.shape[0]))
+            self.partialFit(matrix[batch])
+            if path is not None and self.step % saveEvery == 0:
+                self.save(path)
+        if path is not None:
+            self.save(path)
+
+    def predict(self, matrix, blockSize = 4096, processes = 1):
+        """
+        \brief The function assigns every page to the centre with the highest cosine similarity.
+        \param matrix :scipy.sparse.csr_matrix = pages x words, rows normalised
+        \param blockSize :int (default=4096) = number of pages scored at a time
+        \param processes :int (default=1) = number of forked processes scoring the blocks
+        \return (numpy.array, numpy.array) = (cluster of every page, cosine similarity with its centre); the empty pages are in cluster -1
+        """
+        blocks = [(start, min(start + blockSize, matrix.shape[0])) for start in range(0, matrix.shape[0], blockSize)]
+        if processes > 1 and len(blocks) > 1:
+            with multiprocessing.get_context("fork").Pool(processes, initializer=initClustering, initargs=(self, matrix)) as workers:
+                results = workers.map(assignWorker, blocks)
+        else:
+            results = [self.assign(matrix[start:end]) for start, end in blocks]
+        if not results:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        return np.concatenate([labels for labels, best in results]), np.concatenate([best for labels, best in results])
+
+    def assign(self, rows):
+        """
+        \brief The function assigns some pages to their centres (see #predict).
+        \param rows :scipy.sparse.csr_matrix = pages x words, rows normalised
+        \return (numpy.array, numpy.array) = (cluster of every page, cosine similarity with its centre)
+        """
+        similarities = self.similarities(rows)
+        labels = similarities.argmax(axis=1)
+        best = similarities[np.arange(len(labels)), labels]
+        labels[np.diff(rows.indptr) == 0] = -1
+        return labels, best
+
+    def normalizedCenters(self):
+        """
+        \brief The function returns the centres with length 1.
+        \return numpy.array = clusters x words (float32)
+        """
+        norms = self.norms.copy()
+        norms[norms == 0] = 1.0
+        return (self.centers / norms[:, None]).astype(np.float32)
+
+    def save(self, path, labels = None):
+        """
+        \brief The function saves the state in a .npz file, with the centres normalised; the file is replaced only when it is complete.
+        \param path :str = path of the file
+        \param labels :numpy.array (default=None) = if not None the clusters of the pages (see #predict) are saved too
+        """
+        state = dict(centers=self.normalizedCenters(), counts=self.counts,
+                     params=np.array([self.nClusters, self.batchSize, self.seed, self.step], dtype=np.int64))
+        if labels is not None:
+            state["labels"] = labels
+        with open(path + ".tmp", 'wb') as handle:
+            np.savez(handle, **state)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        \brief The function reads a state saved by #save.
+        \param path :str = path of the file
+        \return (SphericalKMeans, numpy.array) = (clustering, clusters of the pages saved with it or None)
+        """
+        with np.load(path) as f:
+            nClusters, batchSize, seed, step = f["params"].tolist()
+            kmeans = cls(nClusters, batchSize, seed)
+            kmeans.centers = f["centers"]
+            kmeans.counts = f["counts"]
+            kmeans.step = step
+            labels = f["labels"] if "labels" in f.files else None
+        kmeans.norms = np.sqrt((kmeans.centers.astype(np.float64) ** 2).sum(axis=1))
+        return kmeans, labels
+
+
+##type:(SphericalKMeans, scipy.sparse.csr_matrix) = clustering and pages of the worker processes of SphericalKMeans.predict
+workerClustering = None
+
+def initClustering(kmeans, matrix):
+    """
+    \brief Initializer of the worker processes of SphericalKMeans.predict: the forked process shares the centres and the pages of the parent.
+    \param kmeans :SphericalKMeans = clustering of the parent process
+    \param matrix :scipy.sparse.csr_matrix = pages
+    """
+    global workerClustering
+    workerClustering = (kmeans, matrix)
+
+def assignWorker(block):
+    """
+    \brief The function executed by the worker processes of SphericalKMeans.predict.
+    \param block :tuple = (first page, end) of the block
+    \return (numpy.array, numpy.array) = (cluster of every page, cosine similarity with its centre)
+    """
+    kmeans, matrix = workerClustering
+    return kmeans.assign(matrix[block[0]:block[1]])
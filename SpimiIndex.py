@@ -0,0 +1,155 @@
+import os
+import math
+import heapq
+import pickle
+
+class SpimiIndex:
+    """
+     \author Biasini Mirko s181753, Carmignani Vittorio s181755, Joao Alemao s182312
+     \version 1.0
+     \brief Library to build the inverted index with bounded memory
+     \details The class implements the single-pass in-memory indexing (SPIMI): the postings of the documents are added
+     to an in-memory block (keys = word, values = list of (document title, TF)) without any global sort. When the block
+     exceeds the memory budget its words are sorted and it is written to disk as a shard: for every word a header (word,
+     number of postings) followed by its postings. At the end the shards are merged with a k-way merge on the headers, the
+     IDF of each word is computed from the numbers of postings, and the postings are read from one shard at a time, while
+     they are consumed.
+    """
+
+    ##Approximate number of bytes used by a posting in the block (list slot, tuple and float)
+    POSTING_SIZE = 100
+    ##Approximate number of bytes used by a new word in the block (dict slot, string and list)
+    WORD_SIZE = 150
+
+    def __init__(self, path, memoryBudget = 1024):
+        """
+        \brief Default constructor, it creates the directory of the shards if it does not exist.
+        \param path :str = directory in which the shards are written
+        \param memoryBudget :int (default=1024) = memory in MB that the block can use before being flushed
+        """
+        ##type:str = directory of the shards
+        self.path = path
+        ##type:int = memory in bytes that the block can use
+        self.memoryBudget = memoryBudget * 1024 * 1024
+        ##type:dict = keys = word, values = list of (document title, TF)
+        self.block = dict()
+        ##type:int = estimated bytes used by #block
+        self.blockSize = 0
+        ##type:list = paths of the shards written
+        self.shards = []
+        ##type:int = number of documents added
+        self.nDocuments = 0
+        if not os.path.exists(path):
+            os.makedirs(path)
+
+    def addDocument(self, title, freqDist):
+        """
+        \brief The function adds the postings of a document to the block, flushing it if the budget is exceeded.
+        \param title :str = title of the document
+        \param freqDist :dict = keys: words values: frequencies
+        """
+        tot_lenght = float(sum(freqDist.values()))
+        for word, tf in freqDist.items():
+            try:
+                self.block[word].append((title, tf / tot_lenght))
+            except KeyError as k:
+                self.block[word] = [(title, tf / tot_lenght)]
+                self.blockSize += self.WORD_SIZE
+        self.blockSize += self.POSTING_SIZE * len(freqDist)
+        self.nDocuments += 1
+        if self.blockSize >= self.memoryBudget:
+            self.flush()
+
+    def flush(self):
+        """
+        \brief The function writes the block in a new shard, sorted by word, and empties it.
+        """
+        if len(self.block) == 0:
+            return
+        name = os.path.join(self.path, "shard_%05d.bin" % len(self.shards))
+        with open(name, 'wb') as handle:
+            for word in sorted(self.block):
+                pickle.dump((word, len(self.block[word])), handle, protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump(self.block[word], handle, protocol=pickle.HIGHEST_PROTOCOL)
+        self.shards.append(name)
+        self.block = dict()
+        self.blockSize = 0
+
+    @staticmethod
+    def iterRecords(path):
+        """
+        \brief The function reads one by one the records written in the merged index of the previous versions.
+        \param path :str = path of the file
+        \return iterator = records in the order in which they have been written
+        """
+        with open(path, 'rb') as handle:
+            while True:
+                try:
+                    yield pickle.load(handle)
+                except EOFError:
+                    return
+
+    def merge(self):
+        """
+        \brief The function merges the shards (the block is flushed first) and returns the inverted index word by word.
+        \details The postings of a word are an iterator which reads them from its shards one at a time, so the memory used does
+        not depend on the number of documents of the most frequent words. It has to be consumed before the next word is
+        requested: what is left of it is skipped.
+        \return iterator = tuples (word, IDF, iterator of (document title, TF)) sorted by word
+        """
+        self.flush()
+        N_DOCS = float(self.nDocuments)
+        handles = [open(s, 'rb') for s in self.shards]
+        try:
+            heap = []
+            for i, handle in enumerate(handles):
+                self.pushHeader(heap, handles, i)
+            while heap:
+                word, sources, df = heap[0][0], [], 0
+                while heap and heap[0][0] == word:
+                    w, i, n = heapq.heappop(heap)
+                    sources.append(i)
+                    df += n
+                postings = self.iterPostings(heap, handles, sources)
+                yield word, math.log(N_DOCS / df), postings
+                for posting in postings:
+                    pass
+        finally:
+            for handle in handles:
+                handle.close()
+
+    @staticmethod
+    def pushHeader(heap, handles, i):
+        """
+        \brief The function reads the header of the next word of a shard and pushes it in the heap of the merge.
+        \param heap :list = heap of (word, shard, number of postings)
+        \param handles :list = open files of the shards
+        \param i :int = shard
+        """
+        try:
+            word, n = pickle.load(handles[i])
+        except EOFError:
+            return
+        heapq.heappush(heap, (word, i, n))
+
+    def iterPostings(self, heap, handles, sources):
+        """
+        \brief The function reads the postings of a word from its shards, one shard at a time, then it pushes their next headers.
+        \param heap :list = heap of the merge
+        \param handles :list = open files of the shards
+        \param sources :list = shards which contain the word, in order
+        \return iterator = (document title, TF)
+        """
+        for i in sources:
+            for posting in pickle.load(handles[i]):
+                yield posting
+            self.pushHeader(heap, handles, i)
+
+    def clear(self):
+        """
+        \brief The function deletes the shards and resets the number of documents, after they have been merged.
+        """
+        for s in self.shards:
+            os.remove(s)
+        self.shards = []
+        self.nDocuments = 0
@@ -0,0 +1,154 @@
+import numpy as np
+import scipy.sparse
+from CsrIndex import CsrIndex
+
+class TfidfMatrix:
+    """
+     \author Biasini Mirko s181753, Carmignani Vittorio s181755, Joao Alemao s182312
+     \version 1.0
+     \brief Library to represent all the pages as one sparse TF-IDF matrix
+     \details The matrix is a scipy.sparse CSR matrix (documents x words) of float32, whose rows are normalised to length 1,
+     so the cosine similarity of two pages is the dot product of their rows. The lengths of the rows before the normalisation
+     are kept, so the TF-IDF weights can be recovered (see #raw). The columns are the ids of the words in the vocabulary
+     (see Vocabulary). The matrix is saved in a .npz file together with the lengths, the titles of the rows and the words of
+     the columns, both as utf-8 blobs with their offsets.
+    """
+
+    def __init__(self, matrix, norms, titles, terms):
+        """
+        \brief Default constructor.
+        \param matrix :scipy.sparse.csr_matrix = TF-IDF matrix, documents x words, rows normalised
+        \param norms :numpy.array = lengths of the rows before the normalisation
+        \param titles :list = titles of the documents, indexed by row
+        \param terms :list = words, indexed by column
+        """
+        ##type:scipy.sparse.csr_matrix = TF-IDF matrix, rows normalised
+        self.matrix = matrix
+        ##type:numpy.array = lengths of the rows before the normalisation
+        self.norms = norms
+        ##type:list = titles of the documents, indexed by row
+        self.titles = titles
+        ##type:list = words, indexed by column
+        self.terms = terms
+        ##type:dict = keys = title, values = row
+        self.rows = {t: i for i, t in enumerate(titles)}
+
+    @classmethod
+    def build(cls, invertedIndex, vocabulary, idf = True):
+        """
+        \brief The function builds the matrix from the inverted index. A CsrIndex is read directly from its arrays, with its delta merged (see CsrIndex.matrixArrays).
+        \param invertedIndex :dict or CsrIndex = inverted index (see databaseWiki.invertedIndex)
+        \param vocabulary :Vocabulary = ids of the words
+        \param idf :bool (default=True) = False to build the matrix of the TF, without the IDF (see CategorySums)
+        \return TfidfMatrix = matrix, with the documents in the order in which they appear in the index
+        """
+        if isinstance(invertedIndex, CsrIndex):
+            positions, rows, tfs, titles = invertedIndex.matrixArrays()
+            columns = np.array([vocabulary[w] for w in invertedIndex.termList()], dtype=np.int64)[positions]
+            data = tfs * invertedIndex.idfArray().astype(np.float32)[positions] if idf else tfs
+        else:
+            ids = dict()
+            rows, columns, data = [], [], []
+            for w, (weight, docs) in invertedIndex.items():
+                i = vocabulary[w]
+                weight = weight if idf else 1.0
+                for doc, tf in docs.items():
+                    try:
+                        rows.append(ids[doc])
+                    except KeyError as k:
+                        ids[doc] = len(ids)
+                        rows.append(ids[doc])
+                    columns.append(i)
+                    data.append(tf * weight)
+            titles = list(ids)
+        matrix = scipy.sparse.csr_matrix((np.asarray(data, dtype=np.float32), (rows, columns)),
+                                         shape=(len(titles), len(vocabulary)), dtype=np.float32)
+        matrix.eliminate_zeros()
+        norms = cls.rowNorms(matrix)
+        return cls(cls.normalize(matrix, norms), norms, titles, list(vocabulary.terms))
+
+    @staticmethod
+    def rowNorms(matrix):
+        """
+        \brief The function returns the lengths of the rows of a sparse matrix.
+        \param matrix :scipy.sparse.csr_matrix = matrix
+        \return numpy.array = lengths (float64)
+        """
+        return np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1), dtype=np.float64).ravel())
+
+    @classmethod
+    def normalize(cls, matrix, norms = None):
+        """
+        \brief The function normalises the rows of a sparse matrix to length 1 (the empty rows are left empty).
+        \param matrix :scipy.sparse.csr_matrix = matrix
+        \param norms :numpy.array (default=None) = lengths of the rows, if None they are computed
+        \return scipy.sparse.csr_matrix = matrix normalised, float32
+        """
+        norms = cls.rowNorms(matrix) if norms is None else norms.copy()
+        norms[norms == 0] = 1.0
+        return scipy.sparse.csr_matrix(scipy.sparse.diags(1.0 / norms) @ matrix, dtype=np.float32)
+
+    def raw(self):
+        """
+        \brief The function returns the matrix with the TF-IDF weights, i.e. not normalised.
+        \return scipy.sparse.csr_matrix = TF-IDF matrix, documents x words
+        """
+        return scipy.sparse.csr_matrix(scipy.sparse.diags(self.norms) @ self.matrix, dtype=np.float32)
+
+    @staticmethod
+    def encode(strings):
+        """
+        \brief The function concatenates utf-8 strings in a blob.
+        \param strings :list = strings
+        \return (numpy.array, numpy.array) = (blob, start of every string and end of the last one)
+        """
+        encoded = [s.encode('utf-8') for s in strings]
+        blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return blob, np.cumsum([0] + [len(e) for e in encoded], dtype=np.int64)
+
+    @staticmethod
+    def decode(blob, offsets):
+        """
+        \brief The function splits a blob written by #encode.
+        \param blob :numpy.array = utf-8 strings concatenated
+        \param offsets :numpy.array = start of every string and end of the last one
+        \return list = strings
+        """
+        data = blob.tobytes()
+        offsets = offsets.tolist()
+        return [data[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1)]
+
+    def save(self, path):
+        """
+        \brief The function saves the matrix, the lengths of the rows, the titles and the words in a .npz file.
+        \param path :str = path of the file
+        """
+        titles, titleOffsets = self.encode(self.titles)
+        terms, termOffsets = self.encode(self.terms)
+        with open(path, 'wb') as handle:
+            np.savez(handle, data=self.matrix.data, indices=self.matrix.indices, indptr=self.matrix.indptr,
+                     shape=np.array(self.matrix.shape), norms=self.norms, titles=titles, titleOffsets=titleOffsets, terms=terms,
+                     termOffsets=termOffsets)
+
+    @classmethod
+    def load(cls, path):
+        """
+        \brief The function reads a matrix saved by #save.
+        \param path :str = path of the file
+        \return TfidfMatrix = matrix
+        """
+        with np.load(path) as f:
+            matrix = scipy.sparse.csr_matrix((f["data"], f["indices"], f["indptr"]), shape=tuple(f["shape"]))
+            return cls(matrix, f["norms"], cls.decode(f["titles"], f["titleOffsets"]), cls.decode(f["terms"], f["termOffsets"]))
+
+    def row(self, title):
+        """
+        \brief The function returns the row of a document.
+        \param title :str = title of the document
+        \return scipy.sparse.csr_matrix = row (1 x words), None if the document is not in the matrix
+        """
+        i = self.rows.get(title)
+        return None if i is None else self.matrix[i]
+
+    def __len__(self):
+        return self.matrix.shape[0]
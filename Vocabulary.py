@@ -0,0 +1,87 @@
+import os
+
+class Vocabulary:
+    """
+     \author Biasini Mirko s181753, Carmignani Vittorio s181755, Joao Alemao s182312
+     \version 1.0
+     \brief Library to give every word a stable integer id
+     \details The ids are the positions of the words in the vectors of the pages and of the centroids. A word keeps its id
+     for ever: the ids of the new words are appended, and the file (one word per line, in order of id) is only appended
+     by #save, so the ids do not change when the inverted index is rebuilt.
+    """
+
+    def __init__(self, path):
+        """
+        \brief Default constructor, it reads the words saved in path, if the file exists.
+        \param path :str = path of the file of the vocabulary
+        """
+        ##type:str = path of the file of the vocabulary
+        self.path = path
+        ##type:list = words, indexed by id
+        self.terms = []
+        ##type:dict = keys = word, values = id
+        self.ids = dict()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    self.add(line.rstrip('\n'))
+        ##type:int = number of words already written in the file
+        self.saved = len(self.terms)
+
+    def add(self, word):
+        """
+        \brief The function returns the id of a word, giving it a new id if it is not in the vocabulary.
+        \param word :str = word
+        \return int = id of the word
+        """
+        try:
+            return self.ids[word]
+        except KeyError as k:
+            self.ids[word] = len(self.terms)
+            self.terms.append(word)
+            return self.ids[word]
+
+    def update(self, words):
+        """
+        \brief The function adds the words which are not in the vocabulary yet, in the order in which they are given.
+        \param words :iterable = words
+        """
+        for word in words:
+            self.add(word)
+
+    def get(self, word, default = None):
+        """
+        \brief The function returns the id of a word.
+        \param word :str = word
+        \param default :object (default=None) = value returned if the word is not in the vocabulary
+        \return int = id of the word, default if it is not present
+        """
+        return self.ids.get(word, default)
+
+    def term(self, i):
+        """
+        \brief The function returns the word with the given id.
+        \param i :int = id of the word
+        \return str = word
+        """
+        return self.terms[i]
+
+    def __getitem__(self, word):
+        return self.ids[word]
+
+    def __contains__(self, word):
+        return word in self.ids
+
+    def __len__(self):
+        return len(self.terms)
+
+    def save(self):
+        """
+        \brief The function appends to the file the words added since the last save.
+        """
+        if self.saved == len(self.terms) and os.path.exists(self.path):
+            return
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for word in self.terms[self.saved:]:
+                f.write(word + '\n')
+        self.saved = len(self.terms)
@@ -0,0 +1,184 @@
+import re
+import html
+import time
+import mwparserfromhell as parse
+from DatabaseWiki import databaseWiki
+
+class WikiTextStripper:
+    """
+     \author Biasini Mirko s181753, Carmignani Vittorio s181755, Joao Alemao s182312
+     \version 1.0
+     \brief Library to transform the wikitext of a page into plain text
+     \details The class contains a fast replacement of mwparserfromhell's strip_code() based on compiled regular expressions
+     and a small state machine for the nested structures (templates and links). It follows the same rules of strip_code():
+     templates are removed, links are replaced by their text, the contents of tags and table cells are kept. When the
+     input is pathological (unbalanced or too deeply nested markup) the text is stripped with mwparserfromhell.
+    """
+
+    ##Maximum nesting level of templates and links handled by the fast path
+    MAX_DEPTH = 20
+    ##HTML comments (an unterminated comment hides the rest of the text)
+    COMMENT = re.compile(r'<!--.*?(?:-->|\Z)', re.S)
+    ##Tags whose contents are not visible (mwparserfromhell.definitions.INVISIBLE_TAGS)
+    INVISIBLE_TAG = re.compile(r'<(categorytree|gallery|graph|imagemap|inputbox|math|score|section|templatedata|timeline)\b[^>]*?(?:/>|>.*?</\1\s*>)', re.S | re.I)
+    ##Opening and closing of templates, template parameters and parser functions
+    BRACES = re.compile(r'\{\{|\}\}')
+    ##Innermost wikilink: [[title]] or [[title|text]]
+    WIKILINK = re.compile(r'\[\[([^\[\]]*)\]\]')
+    ##External link with brackets: [url text]
+    EXTERNAL_LINK = re.compile(r'\[(?:https?:|ftp:|mailto:|//)[^\s\]]*\s*([^\]]*)\]', re.I)
+    ##Lines of a table which contain only markup: start, end and row separator
+    TABLE_MARKUP = re.compile(r'^[ \t]*(?:\{\||\|\}|\|-).*$', re.M)
+    ##Lines of a table which contain cells or a caption
+    TABLE_CELLS = re.compile(r'^[ \t]*(?:\|\+?|!)(.*)$', re.M)
+    ##Separators of the cells on the same line
+    CELL_SEPARATOR = re.compile(r'\|\||!!')
+    ##Attributes of a cell: style="..." | content
+    CELL_ATTRIBUTES = re.compile(r'^[^|\[\]{}]*=[^|\[\]{}]*\|(?!\|)')
+    ##Headings: == title ==
+    HEADING = re.compile(r'^(=+)[ \t]*(.*?)[ \t]*\1[ \t]*$', re.M)
+    ##Bold and italic markup
+    QUOTES = re.compile(r"'{2,}")
+    ##Markup of lists and indentation at the beginning of a line
+    LIST = re.compile(r'^[*#:;]+[ \t]*', re.M)
+    ##HTML tags (open, close and self-closing): the tag is removed, its contents are kept
+    TAG = re.compile(r'</?[A-Za-z][A-Za-z0-9]*(?:\s[^<>]*)?/?>')
+    ##Horizontal rules and behaviour switches
+    SWITCHES = re.compile(r'^-{4,}[ \t]*$|__[A-Z]+__', re.M)
+    ##More than one empty line
+    EMPTY_LINES = re.compile(r'\n{3,}')
+
+    @classmethod
+    def strip(cls, text):
+        """
+        \brief The function returns the plain text of the wikitext passed as parameter.
+        \param text :str = raw wikitext
+        \return str = plain text
+        """
+        try:
+            return cls.fastStrip(text)
+        except ValueError:
+            return parse.parse(text).strip_code()
+
+    @classmethod
+    def fastStrip(cls, text):
+        """
+        \brief The function strips the wikitext using only regular expressions and the brace state machine.
+        \param text :str = raw wikitext
+        \return str = plain text
+        \exception ValueError if the markup is unbalanced or nested more than #MAX_DEPTH levels.
+        """
+        text = cls.COMMENT.sub('', text)
+        text = cls.INVISIBLE_TAG.sub('', text)
+        text = cls.removeTemplates(text)
+        for _ in range(cls.MAX_DEPTH):
+            text, n = cls.WIKILINK.subn(cls.linkText, text)
+            if n == 0:
+                break
+        else:
+            raise ValueError("wikilinks nested too deeply")
+        text = cls.EXTERNAL_LINK.sub(r'\1', text)
+        text = cls.TABLE_MARKUP.sub('', text)
+        text = cls.TABLE_CELLS.sub(cls.cellsText, text)
+        text = cls.HEADING.sub(r'\2', text)
+        text = cls.QUOTES.sub('', text)
+        text = cls.LIST.sub('', text)
+        text = cls.TAG.sub('', text)
+        text = cls.SWITCHES.sub('', text)
+        text = html.unescape(text)
+        return cls.EMPTY_LINES.sub('\n\n', text)
+
+    @classmethod
+    def removeTemplates(cls, text):
+        """
+        \brief The function removes the templates ({{...}}), also nested, from the text.
+        \param text :str = raw wikitext
+        \return str = text without templates
+        \exception ValueError if the braces are unbalanced or nested more than #MAX_DEPTH levels.
+        """
+        res = []
+        depth = 0
+        last = 0
+        for m in cls.BRACES.finditer(text):
+            if m.group() == '{{':
+                if depth == 0:
+                    res.append(text[last:m.start()])
+                depth += 1
+                if depth > cls.MAX_DEPTH:
+                    raise ValueError("templates nested too deeply")
+            elif depth > 0:
+                depth -= 1
+                if depth == 0:
+                    last = m.end()
+        if depth != 0:
+            raise ValueError("unbalanced templates")
+        res.append(text[last:])
+        return ''.join(res)
+
+    @staticmethod
+    def linkText(m):
+        """
+        \brief The function returns the visible text of a wikilink: the text after the first pipe, or the title.
+        \param m :re.Match = match of #WIKILINK
+        \return str = visible text
+        """
+        link = m.group(1)
+        idx = link.find('|')
+        return link if idx == -1 else link[idx + 1:]
+
+    @classmethod
+    def cellsText(cls, m):
+        """
+        \brief The function returns the contents of the cells of a table line, without their attributes.
+        \param m :re.Match = match of #TABLE_CELLS
+        \return str = contents of the cells separated by spaces
+        """
+        return ' '.join(cls.CELL_ATTRIBUTES.sub('', cell) for cell in cls.CELL_SEPARATOR.split(m.group(1)))
+
+    @staticmethod
+    def similarity(a, b):
+        """
+        \brief The function returns the weighted Jaccard similarity of two frequency distributions.
+        \param a :dict = keys: words values: frequencies
+        \param b :dict = keys: words values: frequencies
+        \return float = sum of the minimum frequencies / sum of the maximum frequencies (1.0 if both are empty)
+        """
+        words = set(a).union(b)
+        if len(words) == 0:
+            return 1.0
+        num = sum(min(a.get(w, 0), b.get(w, 0)) for w in words)
+        den = sum(max(a.get(w, 0), b.get(w, 0)) for w in words)
+        return num / float(den)
+
+    @classmethod
+    def compare(cls, texts):
+        """
+        \brief The function strips the texts with mwparserfromhell and with #strip and compares the results.
+        \details The closeness is measured on the tokens which are actually indexed, i.e. on the frequency distributions
+        returned by databaseWiki.transformDocument.
+        \param texts :list = raw wikitexts of the sample
+        \return dict = keys: "pages", "fallbacks", "similarity" (mean weighted Jaccard), "minSimilarity", "timeParser",
+        "timeFast" (seconds spent stripping), "speedup"
+        """
+        reference, fast = [], []
+        start = time.time()
+        for text in texts:
+            reference.append(parse.parse(text).strip_code().strip())
+        timeParser = time.time() - start
+        fallbacks = 0
+        start = time.time()
+        for text in texts:
+            try:
+                fast.append(cls.fastStrip(text).strip())
+            except ValueError:
+                fallbacks += 1
+                fast.append(parse.parse(text).strip_code().strip())
+        timeFast = time.time() - start
+        sims = [cls.similarity(databaseWiki.transformDocument(r), databaseWiki.transformDocument(f)) for r, f in zip(reference, fast)]
+        return {"pages": len(texts),
+                "fallbacks": fallbacks,
+                "similarity": sum(sims) / max(len(sims), 1),
+                "minSimilarity": min(sims) if sims else 1.0,
+                "timeParser": timeParser,
+                "timeFast": timeFast,
+                "speedup": timeParser / timeFast if timeFast > 0 else float('inf')}
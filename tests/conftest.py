@@ -0,0 +1,49 @@
+import os
+import sys
+import math
+import random
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Vocabulary import Vocabulary
+
+
+def invertedIndex(documents):
+    #the inverted index of databaseWiki.createInvertedIndex: keys = word, values = [IDF, dict = keys = title, value = TF]
+    index = dict()
+    for doc, freqDist in documents.items():
+        tot_lenght = float(sum(freqDist.values()))
+        for word, tf in freqDist.items():
+            index.setdefault(word, [None, dict()])[1][doc] = tf / tot_lenght
+    for word, pair in index.items():
+        pair[0] = math.log(len(documents) / float(len(pair[1])))
+    return index
+
+
+@pytest.fixture
+def documents():
+    #200 random documents of 5-30 words, drawn with a skewed distribution from 300 words
+    rnd = random.Random(7)
+    words = ["w%d" % i for i in range(300)]
+    return {"P%d" % i: {words[int(300 * rnd.random() ** 2)]: rnd.randint(1, 5) for _ in range(rnd.randint(5, 30))}
+            for i in range(200)}
+
+
+@pytest.fixture
+def buildIndex():
+    return invertedIndex
+
+
+@pytest.fixture
+def pageCat(documents):
+    #every document belongs to 1-3 of 20 categories
+    rnd = random.Random(11)
+    return {p: rnd.sample(["C%d" % i for i in range(20)], rnd.randint(1, 3)) for p in documents}
+
+
+@pytest.fixture
+def vocabulary(tmp_path, documents):
+    vocabulary = Vocabulary(str(tmp_path / "vocabulary.txt"))
+    vocabulary.update(sorted(invertedIndex(documents)))
+    return vocabulary
@@ -0,0 +1,94 @@
+import math
+import numpy as np
+import pytest
+import scipy.sparse
+
+from TfidfMatrix import TfidfMatrix
+from CentroidMatrix import CentroidMatrix
+from CentroidIndex import CentroidIndex
+from CentroidSums import CentroidSums
+
+
+def postingsCentroids(index, vocabulary, pageCat, lenCategories):
+    #the centroids walking every posting, as Categorization.getAllCentroidsPostings, normalised
+    centroids = {c: {} for c in lenCategories}
+    for w, (idf, docs) in index.items():
+        for doc, tf in docs.items():
+            for cat in pageCat.get(doc, ()):
+                if cat in centroids:
+                    centroids[cat][vocabulary[w]] = centroids[cat].get(vocabulary[w], 0) + tf * idf / lenCategories[cat]
+    for cat, centre in centroids.items():
+        norm = math.sqrt(sum(v * v for v in centre.values())) or 1.0
+        centroids[cat] = {i: v / norm for i, v in centre.items()}
+    return centroids
+
+
+def lengths(pageCat):
+    lenCategories = dict()
+    for cats in pageCat.values():
+        for c in cats:
+            lenCategories[c] = lenCategories.get(c, 0) + 1
+    return {c: float(n) for c, n in lenCategories.items()}
+
+
+def test_sparse_centroids_match_postings(documents, pageCat, vocabulary, buildIndex):
+    index = buildIndex(documents)
+    tfidf = TfidfMatrix.build(index, vocabulary)
+    lenCategories = lengths(pageCat)
+    centroids = CentroidMatrix.build(tfidf, pageCat, lenCategories)
+    expected = postingsCentroids(index, vocabulary, pageCat, lenCategories)
+    assert sorted(centroids.categories) == sorted(expected)
+    for cat, centre in expected.items():
+        row = centroids.matrix[centroids.rows[cat]].toarray().ravel()
+        dense = np.zeros(len(row))
+        dense[list(centre)] = list(centre.values())
+        assert np.allclose(row, dense, atol=1e-6)
+
+
+def randomCentroids(nCategories, nTerms, seed):
+    random = np.random.RandomState(seed)
+    matrix = scipy.sparse.random(nCategories, nTerms, density=0.05, random_state=random, dtype=np.float32).tocsr()
+    #identical rows, to check the order of the ties
+    matrix = scipy.sparse.vstack([matrix, matrix[:10]]).tocsr()
+    return CentroidMatrix(TfidfMatrix.normalize(matrix), ["C%04d" % i for i in range(matrix.shape[0])])
+
+
+@pytest.mark.parametrize("k", [1, 5, 20])
+def test_centroid_index_matches_exhaustive(k):
+    centroids = randomCentroids(700, 400, 3)
+    index = CentroidIndex(centroids)
+    random = np.random.RandomState(5)
+    queries = TfidfMatrix.normalize(scipy.sparse.random(40, 400, density=0.03, random_state=random, dtype=np.float32).tocsr())
+    #a page equal to a duplicated centroid: the two copies tie
+    queries = scipy.sparse.vstack([queries, centroids.matrix[3]]).tocsr()
+    exhaustive = centroids.top(queries, k)
+    for i, expected in enumerate(exhaustive):
+        row = queries[i]
+        indexed = index.top(row.indices, row.data, k)
+        assert [c for c, s in indexed] == [c for c, s in expected]
+        assert np.allclose([s for c, s in indexed], [s for c, s in expected], atol=1e-6)
+
+
+def test_ties_are_ordered_by_id():
+    matrix = scipy.sparse.csr_matrix(np.array([[1, 0], [0, 1], [1, 0], [1, 0]], dtype=np.float32))
+    centroids = CentroidMatrix(matrix, ["a", "b", "c", "d"])
+    query = scipy.sparse.csr_matrix(np.array([[1, 0]], dtype=np.float32))
+    assert centroids.top(query, 2) == [[("a", 1.0), ("c", 1.0)]]
+    assert CentroidIndex(centroids).top([0], [1.0], 2) == [("a", 1.0), ("c", 1.0)]
+    assert CentroidIndex(centroids).top([1, 0], [0.0, 0.0], 2) == [("a", 0.0), ("b", 0.0)]
+
+
+def test_centroid_sums_without_match_rebuild(documents, pageCat, vocabulary, buildIndex):
+    tfidf = TfidfMatrix.build(buildIndex(documents), vocabulary)
+    lenCategories = lengths(pageCat)
+    sums = CentroidSums(tfidf, pageCat, lenCategories)
+    held = sorted(documents)[::4]
+    centroids = sums.without(held)
+    rest = {p: cats for p, cats in pageCat.items() if p not in held}
+    expected = CentroidMatrix.build(tfidf, rest, lengths(rest))
+    for cat in centroids.categories:
+        row = centroids.matrix[centroids.rows[cat]].toarray().ravel()
+        if cat in expected.rows:
+            assert np.allclose(row, expected.matrix[expected.rows[cat]].toarray().ravel(), atol=1e-6)
+        else:
+            assert not row.any()
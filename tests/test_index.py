@@ -0,0 +1,80 @@
+import random
+import numpy as np
+
+from CsrIndex import CsrIndex
+from ForwardIndex import ForwardIndex
+from TfidfMatrix import TfidfMatrix
+
+
+def writeIndex(path, index):
+    CsrIndex.write(path, ((w, idf, docs.items()) for w, (idf, docs) in index.items()))
+    return CsrIndex(path)
+
+
+def assertSameIndex(csr, expected):
+    assert sorted(w for w in csr if len(csr[w][1]) > 0) == sorted(expected)
+    for w, (idf, docs) in expected.items():
+        got, postings = csr[w]
+        assert abs(got - idf) < 1e-9
+        assert dict(postings.items()).keys() == docs.keys()
+        assert all(abs(postings[d] - tf) < 1e-6 for d, tf in docs.items())
+
+
+def test_csr_index_matches_dict(tmp_path, documents, buildIndex):
+    index = buildIndex(documents)
+    csr = writeIndex(str(tmp_path / "inverted.csr"), index)
+    assertSameIndex(csr, index)
+    assert csr.docId("missing") == -1 and "missing" not in csr
+
+
+def test_forward_index_matches_postings(tmp_path, documents, vocabulary, buildIndex):
+    index = buildIndex(documents)
+    csr = writeIndex(str(tmp_path / "inverted.csr"), index)
+    ForwardIndex.write(csr, [vocabulary[w] for w in csr.termList()])
+    forward = ForwardIndex(csr.path)
+    assert len(forward) == len(documents)
+    for title, freqDist in documents.items():
+        positions, tfs = forward.vector(csr.docId(title))
+        weights = tfs * csr.idfAt(positions).astype(np.float32)
+        vector = dict(zip(forward.forwardVocabulary[positions].tolist(), weights.tolist()))
+        expected = {vocabulary[w]: index[w][1][title] * index[w][0] for w in freqDist}
+        assert vector.keys() == expected.keys()
+        assert np.allclose([vector[i] for i in expected], list(expected.values()), rtol=1e-5, atol=1e-7)
+
+
+def test_delta_matches_rebuilt_index(tmp_path, documents, vocabulary, buildIndex):
+    csr = writeIndex(str(tmp_path / "inverted.csr"), buildIndex(documents))
+    rnd = random.Random(3)
+    documents = dict(documents)
+    for step in range(3):
+        changes = dict()
+        for title in rnd.sample(sorted(documents), 6):
+            changes[title] = {"w%d" % rnd.randint(0, 320): rnd.randint(1, 4) for _ in range(12)}
+        for title in rnd.sample(sorted(set(documents) - set(changes)), 3):
+            changes[title] = None
+        for j in range(4):
+            changes["N%d_%d" % (step, j)] = {"w%d" % rnd.randint(0, 340): rnd.randint(1, 4) for _ in range(12)}
+        counts = dict()
+        for title, new in changes.items():
+            for w in documents.get(title) or ():
+                counts[w] = counts.get(w, 0) - 1
+            for w in new or ():
+                counts[w] = counts.get(w, 0) + 1
+            if new is None:
+                documents.pop(title)
+            else:
+                documents[title] = new
+        csr.appendDelta(changes, {w: csr.documentFrequency(w) + n for w, n in counts.items() if n != 0})
+        assert csr.documentCount() == csr.nDocs == len(documents)
+        assertSameIndex(csr, buildIndex(documents))
+    #the segments are read again when the index is opened
+    reopened = CsrIndex(csr.path)
+    assert reopened.nDocs == len(documents)
+    expected = buildIndex(documents)
+    assertSameIndex(reopened, expected)
+    vocabulary.update(sorted(expected))
+    matrix = TfidfMatrix.build(reopened, vocabulary)
+    assert sorted(matrix.titles) == sorted(t for t, f in documents.items() if f)
+    reference = TfidfMatrix.build(expected, vocabulary)
+    for title in reference.titles:
+        assert np.allclose(matrix.row(title).toarray(), reference.row(title).toarray(), atol=1e-6)
@@ -0,0 +1,133 @@
+import os
+import random
+import numpy as np
+import pytest
+
+from conftest import invertedIndex
+
+try:
+    from DatabaseWiki import databaseWiki
+    from Categorization import Categorization
+except LookupError:
+    #the NLTK stopwords are read when DatabaseWiki is imported
+    databaseWiki = None
+
+pytestmark = pytest.mark.skipif(databaseWiki is None, reason="the NLTK stopwords are not installed")
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    monkeypatch.setattr(databaseWiki, "PATH", str(tmp_path) + "/")
+    monkeypatch.setattr(databaseWiki, "MODELS", dict())
+    monkeypatch.setattr(Categorization, "PATH", str(tmp_path) + "/")
+    return tmp_path
+
+
+def assertSameIndex(index, expected):
+    assert sorted(w for w in index if len(index[w][1]) > 0) == sorted(expected)
+    for w, (idf, docs) in expected.items():
+        got, postings = index[w]
+        assert abs(got - idf) < 1e-9
+        assert dict(postings.items()).keys() == docs.keys()
+        assert all(abs(postings[d] - tf) < 1e-6 for d, tf in docs.items())
+
+
+#without the SPIMI mode a parse does not build the index: the first update builds it from the documents
+@pytest.mark.parametrize("memoryBudget,build", [(None, True), (None, False), (1, True)])
+def test_update_matches_rebuilt_index(database, documents, memoryBudget, build):
+    db = databaseWiki()
+    if memoryBudget is not None:
+        db.useSpimi(memoryBudget)
+    for title, freqDist in documents.items():
+        db.addDocument(title, freqDist)
+    if build:
+        db.createInvertedIndex()
+    db.close()
+    #the SPIMI mode does not write the documents: the updates must not need them
+    assert os.path.exists(str(database / databaseWiki.DICT_NAME)) == (memoryBudget is None)
+
+    rnd = random.Random(3)
+    documents = dict(documents)
+    for step in range(3):
+        databaseWiki.MODELS.clear()
+        db = databaseWiki()
+        changes = dict()
+        for title in rnd.sample(sorted(documents), 6):
+            changes[title] = {"w%d" % rnd.randint(0, 320): rnd.randint(1, 4) for _ in range(12)}
+        for title in rnd.sample(sorted(set(documents) - set(changes)), 3):
+            changes[title] = None
+        for j in range(4):
+            changes["N%d_%d" % (step, j)] = {"w%d" % rnd.randint(0, 340): rnd.randint(1, 4) for _ in range(12)}
+        db.updateInvertedIndex(changes)
+        assert not db.isLoaded("documents") or (step == 0 and not build)
+        for title, new in changes.items():
+            if new is None:
+                documents.pop(title)
+            else:
+                documents[title] = new
+        expected = invertedIndex(documents)
+        assert db.invertedIndex.documentCount() == len(documents)
+        assertSameIndex(db.invertedIndex, expected)
+        vocabulary = db.vocabulary
+        for title in changes:
+            vector = db.getDocumentVector(title)
+            assert vector == {} if changes[title] is None else \
+                sorted(vector) == sorted(vocabulary[w] for w in documents[title])
+        db.close()
+
+    databaseWiki.MODELS.clear()
+    db = databaseWiki()
+    assertSameIndex(db.invertedIndex, expected)
+    assert db.compactInvertedIndex(force=True)
+    assert db.invertedIndex.nDocs is None
+    assertSameIndex(db.invertedIndex, expected)
+    if memoryBudget is None:
+        databaseWiki.MODELS.clear()
+        assert databaseWiki().readDocuments() == documents
+    db.close()
+
+
+def test_update_centroids_match_rebuilt_centroids(database, documents, pageCat):
+    db = databaseWiki()
+    db.createDatabase(integerIds = False)
+    for title, freqDist in documents.items():
+        db.addDocument(title, freqDist)
+        for cat in pageCat[title]:
+            db.insertCatPag(cat, title)
+    db.createInvertedIndex()
+    db.close()
+    databaseWiki.MODELS.clear()
+    Categorization().getCentroidMatrix(withPrint = False)
+
+    rnd = random.Random(5)
+    for step in range(3):
+        databaseWiki.MODELS.clear()
+        categorization = Categorization()
+        db = categorization.db
+        changes = dict()
+        for title in rnd.sample(sorted(documents), 3):
+            changes[title] = {"w%d" % rnd.randint(0, 320): rnd.randint(1, 4) for _ in range(12)}
+        for title in rnd.sample(sorted(set(documents) - set(changes)), 1):
+            changes[title] = None
+        for j in range(2):
+            title = "N%d_%d" % (step, j)
+            changes[title] = {"w%d" % rnd.randint(0, 340): rnd.randint(1, 4) for _ in range(12)}
+            db.insertCatPag("C%d" % rnd.randint(0, 19), title)
+        for title, new in changes.items():
+            if new is None:
+                documents.pop(title)
+            else:
+                documents[title] = new
+        db.updateInvertedIndex(changes)
+        categories = set(c for title in changes for c in db.getCategoriesGivenPage(title))
+        updated = categorization.updateCentroids(categories)
+        #all the centroids, also the ones which have not been recomputed, use the current IDF
+        expected = categorization.getCentroidMatrix(withPrint = False, saveFile = False)
+        assert categories < set(expected.categories)
+        assert updated.categories == expected.categories
+        assert np.abs(updated.matrix.toarray() - expected.matrix.toarray()).max() < 1e-5
+        db.close()
+
+    databaseWiki.MODELS.clear()
+    saved = Categorization().readFile("centroids.pickle")
+    assert sorted(saved) == expected.categories